@@ -0,0 +1,158 @@
+"""
+Builds several projects of the map web app in one go, outside of Blender:
+
+    python __batch.py projects/ other_project.json --template template.blend --workers 2
+
+Configuration files are given directly or as directories (all *.json files in them).
+First the tiles of all projects are resolved and their union is downloaded and converted once
+(prefetch_projects in py/prefetch.py), then Blender is started in the background for each project
+with __runner.py, which finds every tile in the tile cache, saves the .blend file and exports to Mitsuba.
+Each Blender run writes the status of its project into the configuration file when it is done.
+The template must lie next to the py/ folder, as __runner.py loads its scripts from there.
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from __prefetch import _scripts_folder, load_scripts, read_runner_settings
+
+
+def collect_configurations(paths):
+    """Returns the configuration files of the given files and directories (*.json, sorted), without duplicates."""
+    configurations = []
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+        for file in files:
+            file = os.path.abspath(file)
+            if file not in configurations:
+                configurations.append(file)
+    return configurations
+
+
+def build_project(blender_path, template_path, runner_path, config_path, tmp_path, keep_cache, log_path):
+    """
+    Runs __runner.py for one configuration in a background Blender process, its output goes to log_path.
+    Returns (exit code, seconds).
+    """
+    command = [
+        blender_path, "-b", template_path, "--python-exit-code", "1", "--python", runner_path,
+        "--", "--config", config_path, "--tmp-path", tmp_path
+    ]
+    if keep_cache:
+        command.append("--keep-cache")
+
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - started
+
+
+def main():
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Prefetch the tiles of several projects once and build each project in Blender.")
+    parser.add_argument("configurations", nargs="+", help="configuration files or directories of configuration files")
+    parser.add_argument("--template", required=True, help=".blend file each project is built from")
+    parser.add_argument("--runner", default=os.path.join(root_dir, "__runner.py"), help="file the settings are read from")
+    parser.add_argument("--tmp-path", help="overrides TMP_PATH of the runner file")
+    parser.add_argument("--blender", help="overrides BATCH_BLENDER_PATH of the runner file")
+    parser.add_argument("--workers", type=int, help="overrides BATCH_WORKERS of the runner file")
+    parser.add_argument("--skip-prefetch", action="store_true", help="start Blender right away, e.g. after __prefetch.py")
+    args = parser.parse_args()
+
+    settings = read_runner_settings(args.runner)
+    if args.tmp_path:
+        settings["TMP_PATH"] = args.tmp_path
+    tmp_path = os.path.abspath(settings["TMP_PATH"])
+    blender_path = args.blender or settings.get("BATCH_BLENDER_PATH", "blender")
+    workers = max(1, args.workers or settings.get("BATCH_WORKERS", 1))
+    template_path = os.path.abspath(args.template)
+    runner_path = os.path.abspath(args.runner)
+    ns = load_scripts(settings, os.path.join(root_dir, _scripts_folder))
+
+    config_paths = collect_configurations(args.configurations)
+    if not config_paths:
+        print("No configuration files found.")
+        return 1
+    projects = [ns["read_configuration"](config_path) for config_path in config_paths]
+
+    # Every project is saved next to the template under its name
+    names = [project["PROJECT_NAME"] for project in projects]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        print(f"Projects with the same name overwrite each other's output: {', '.join(duplicates)}")
+
+    ns["print_header"](f"BATCH (PHASE I: PREFETCH {len(projects)} PROJECTS)...")
+    dirs = ns["setup_structure"](tmp_path)
+    ns["open_tile_cache"](dirs["manifest"])
+
+    # Local files of the tiles of all projects, kept by the final cache trim
+    used_tiles = None
+    if not args.skip_prefetch:
+        try:
+            all_project_files = ns["prefetch_projects"](dirs, projects)
+            used_tiles = [path for project_files in all_project_files for path in project_files["used_tiles"]]
+            prefetch_time = datetime.now().isoformat()
+            for config_path in config_paths:
+                ns["write_configuration_status"](config_path, lastPrefetch=prefetch_time)
+        except Exception:
+            # The Blender runs resolve and download whatever is missing themselves
+            traceback.print_exc()
+            print("Prefetch failed, the projects download their tiles themselves.")
+
+    # The Blender runs do not trim the cache when the tiles of all projects were prefetched (a run would only keep
+    # its own tiles and evict those of later projects) or when several projects run at the same time.
+    # The cache is then trimmed once after all projects are built.
+    keep_cache = used_tiles is not None or workers > 1
+    ns["print_header"](f"BATCH (PHASE II: BUILD {len(projects)} PROJECTS, {workers} AT A TIME)...")
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for config_path, project in zip(config_paths, projects):
+            log_path = os.path.join(os.path.dirname(config_path), f"{project['PROJECT_NAME']}_blender.log")
+            print(f"Building {project['PROJECT_NAME']} (log: {log_path})")
+            futures[executor.submit(
+                build_project, blender_path, template_path, runner_path, config_path, tmp_path, keep_cache, log_path
+            )] = (config_path, project, log_path)
+
+        for future in as_completed(futures):
+            config_path, project, log_path = futures[future]
+            try:
+                exit_code, seconds = future.result()
+            except OSError as e:
+                exit_code, seconds = None, 0.0
+                print(f"Could not start Blender ({blender_path}): {e}")
+            results[config_path] = exit_code
+            if exit_code == 0:
+                print(f"  {project['PROJECT_NAME']} finished in {seconds:.1f} s")
+                ns["write_configuration_status"](config_path, lastBlenderError=None)
+            else:
+                print(f"  {project['PROJECT_NAME']} FAILED (exit code {exit_code}), see {log_path}")
+                ns["write_configuration_status"](
+                    config_path, lastBlenderError=f"{datetime.now().isoformat()}: exit code {exit_code}, see {log_path}"
+                )
+
+    if keep_cache and used_tiles is None:
+        print("Tiles were not prefetched, the tile cache is trimmed by the next run.")
+    elif keep_cache:
+        ns["enforce_cache_budget"](
+            settings["CACHE_DISK_BUDGET_GB"] * 1024**3 if settings.get("CACHE_DISK_BUDGET_GB") else None,
+            keep_paths=used_tiles
+        )
+
+    ns["print_header"]("BATCH FINISHED.")
+    failed = [config_path for config_path, exit_code in results.items() if exit_code != 0]
+    print(f"{len(results) - len(failed)} of {len(results)} project(s) built.")
+    for config_path in failed:
+        print(f"  Failed: {config_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Runs phase I of the importer (tile resolution, downloads, DGM5 extraction and the LoD2 conversion
+to CityJSON) without Blender, for one or more configuration files written by the map web app.
+
+The settings are read from __runner.py, so both use the same TMP_PATH and tile cache.
+A later run of __runner.py in Blender finds all files in the cache and goes straight to the import.
+
+Usage:
+    python __prefetch.py project_a.json [project_b.json ...] [--tmp-path PATH] [--runner PATH]
+"""
+import argparse
+import ast
+import os
+import sys
+import traceback
+
+_scripts_folder = "py"
+_scripts = (
+    "global_helpers.py",
+    "tile_cache.py",
+    "opengeodata.py",
+    "cityjson.py",
+    "citygml_stream.py",
+    "tracing.py",
+    "pipeline.py",
+    "prefetch.py"
+)
+
+
+def read_runner_settings(runner_path):
+    """
+    Returns the UPPERCASE settings assigned at the top level of __runner.py as a dict.
+    The file is parsed, not executed, because it imports bpy.
+    """
+    with open(runner_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=runner_path)
+
+    settings = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+            continue
+        name = node.targets[0].id
+        if not name.isupper():
+            continue
+        expression = compile(ast.Expression(node.value), runner_path, "eval")
+        settings[name] = eval(expression, {"__builtins__": {}}, dict(settings))
+    return settings
+
+
+def load_scripts(settings, scripts_dir, scripts=_scripts):
+    """Executes the (Blender-free) scripts into one namespace, the same way __runner.py does inside Blender."""
+    namespace = {"__name__": "__prefetch__", **settings}
+    for filename in scripts:
+        script_path = os.path.join(scripts_dir, filename)
+        with open(script_path, "r", encoding="utf-8") as f:
+            exec(compile(f.read(), script_path, "exec"), namespace)
+    return namespace
+
+
+def main():
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Download and convert the tiles of projects without Blender.")
+    parser.add_argument("configurations", nargs="+", help="configuration files written by the map web app")
+    parser.add_argument("--runner", default=os.path.join(root_dir, "__runner.py"), help="file the settings are read from")
+    parser.add_argument("--tmp-path", help="overrides TMP_PATH of the runner file")
+    args = parser.parse_args()
+
+    settings = read_runner_settings(args.runner)
+    if args.tmp_path:
+        settings["TMP_PATH"] = args.tmp_path
+    ns = load_scripts(settings, os.path.join(root_dir, _scripts_folder))
+
+    ns["print_header"]("PREFETCH (PHASE 0: SETUP)...")
+    dirs = ns["setup_structure"](settings["TMP_PATH"])
+    ns["open_tile_cache"](dirs["manifest"])
+
+    used_tiles = []
+    failed = []
+    for config_path in args.configurations:
+        project = ns["read_configuration"](config_path)
+        # Functions read REPLACE_EXISTING_FILES as a global, like in Blender
+        ns["REPLACE_EXISTING_FILES"] = project["REPLACE_EXISTING_FILES"]
+
+        ns["print_header"](f"PREFETCH (PHASE I: {project['PROJECT_NAME']})...")
+        ns["start_trace"]()
+        ns["trace_phase"]("Prefetch")
+        try:
+            project_files = ns["prefetch_project"](
+                dirs, project["LATITUDE_FROM"], project["LONGITUDE_FROM"], project["LATITUDE_TO"], project["LONGITUDE_TO"],
+                project["IMPORT_TERRAIN"], project["IMPORT_BUILDINGS"], project["IMPORT_TREES"],
+                project["TERRAIN_HIGH_RESOLUTION"], keep_paths=used_tiles
+            )
+        except Exception:
+            traceback.print_exc()
+            failed.append(config_path)
+            continue
+
+        # Tiles of earlier projects must not be evicted by the cache budget of later ones
+        used_tiles.extend(project_files["used_tiles"])
+        summary = None
+        if settings.get("TRACE_REPORT"):
+            summary, report_path, _ = ns["write_trace_files"](
+                os.path.dirname(os.path.abspath(config_path)), f"{project['PROJECT_NAME']}_prefetch"
+            )
+            print(f"Prefetch took {summary['totalSeconds']:.1f} s, report: {report_path}")
+        ns["write_configuration_status"](config_path, lastPrefetch=ns["datetime"].now().isoformat(), lastPrefetchSummary=summary)
+
+    ns["print_header"]("PREFETCH FINISHED.")
+    if failed:
+        print("Prefetch failed for:")
+        for config_path in failed:
+            print(f"  {config_path}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
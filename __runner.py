@@ -1,13 +1,17 @@
+import importlib.util
 import subprocess, sys
 import bpy
-subprocess.check_call([sys.executable, "-m", "pip", "install", "pyproj"])
-subprocess.check_call([sys.executable, "-m", "pip", "install", "tqdm"])
-subprocess.check_call([sys.executable, "-m", "pip", "install", "geopandas"])
-subprocess.check_call([sys.executable, "-m", "pip", "install", "fiona"])
+
+# Only missing packages are installed, so repeated runs (e.g. by __batch.py) do not call pip every time
+for _package in ("pyproj", "tqdm", "geopandas", "fiona", "pyogrio", "pyarrow", "tifffile", "imagecodecs", "psutil"):
+    if importlib.util.find_spec(_package) is None:
+        subprocess.check_call([sys.executable, "-m", "pip", "install", _package])
 
 print("Enabling Blender GIS Add-ons")
 for name in ["BlenderGIS-master", "Up3date-main"]:
-    if (bpy.ops.preferences.addon_enable(module=name) == {'FINISHED'}):
+    if name in bpy.context.preferences.addons:
+        print(f"{name} is already enabled.")
+    elif (bpy.ops.preferences.addon_enable(module=name) == {'FINISHED'}):
         print(f"{name} enabled successfully.")
     else:
         print(f"Could not enable {name} \n Please ensure {name} is installed correctly.")
@@ -20,10 +24,18 @@ _scripts = (
     "belder_import.py",
     "blender_helper.py",
     "cityjson.py",
+    "citygml_stream.py",
+    "cityjson_mesh.py",
     "global_helpers.py",
+    "tile_cache.py",
     "opengeodata.py",
     "fix_grid_mesh.py",
+    "terrain.py",
+    "gpkg_remote.py",
     "trees.py",
+    "tracing.py",
+    "pipeline.py",
+    "prefetch.py",
     "main.py"
 )
 
@@ -45,10 +57,12 @@ IMPORT_BUILDINGS = False
 IMPORT_TREES = False
 
 TERRAIN_HIGH_RESOLUTION = True
-#TERRAIN_MESH_SIMPLIFICATION = 0.5  # percentage to cut down the vertex count of the terrain mesh (0.0 - 1.0)  ### TODO: currently not used
+TERRAIN_ENGINE = "mosaic"  # DGM1 import: "mosaic" (NumPy, one grid mesh) or "blendergis" (BlenderGIS import + fix_terrain_mesh)
+TERRAIN_MESH_SIMPLIFICATION = None  # maximum vertical error of the terrain mesh in metres (None = full grid), not used by the "blendergis" engine
 
 REPLACE_EXISTING_FILES = False
 CLEAN_BLENDER = True
+CLEAN_BLENDER_MODE = "purge"  # "purge" removes all data of the open file, "fresh" loads an empty file instead (background runs only, "purge" otherwise)
 
 SAVE_AS_COPY = True
 
@@ -60,10 +74,69 @@ DOWNLOAD_LINKS = {
     "dgm5": "https://geoservices.bayern.de/services/poly2metalink/metalink/dgm5xyz",
     "lod2": "https://geoservices.bayern.de/services/poly2metalink/metalink/lod2"
 }
+# Bavarian 1 km tile grid, used to resolve tiles without requesting a metalink
+# {east}/{north} are the kilometre coordinates (UTM32) of the lower left tile corner
+TILE_GRIDS = {
+    "dgm1": {"tile_size": 1000, "name": "{east}_{north}.tif", "url": "https://download1.bayernwolke.de/a/dgm/dgm1/{name}"},
+    "dgm5": {"tile_size": 1000, "name": "{east}_{north}.zip", "url": "https://download1.bayernwolke.de/a/dgm/dgm5/{name}"},
+    "lod2": {"tile_size": 1000, "name": "{east}_{north}.gml", "url": "https://download1.bayernwolke.de/a/lod2/citygml/{name}"}
+}
+OFFLINE_TILE_RESOLUTION = False                 # never request metalinks, resolve all tiles from TILE_GRIDS
 DOWNLOAD_LINK_TREES = ["https://geodaten.bayern.de/odd/m/8/baeume3d/data/123007_baeume.gpkg"] 
+TREE_REPRESENTATION = "cubes"                   # "cubes" (one mesh with a cube per tree) or "instances" (tree points + geometry nodes instancing)
+TREE_REALIZE_ON_EXPORT = True                   # "instances": realize the tree instances while exporting to Mitsuba
+TREE_READER = "arrow"                           # "arrow" (pyogrio, streamed in batches) or "geopandas" (whole layer at once)
+TREE_BATCH_SIZE = 65536                         # features per batch of the "arrow" reader
+TREE_REMOTE_READ = False                        # read only the trees of the area from the remote GeoPackages (HTTP Range requests) instead of downloading them
+REMOTE_GPKG_BLOCK_SIZE = 4096                   # bytes per Range request block of the remote reader
+REMOTE_GPKG_CACHE_BLOCKS = 16384                # blocks kept in memory by the remote reader
 TMP_PATH = "C:\\Users\\USER\\Documents\\opengeodata2blender\\temp\\"
 JAVA_PATH = "C:\\Users\\USER\\Documents\\opengeodata2blender\\toolchain\\jdk-25.0.1\\"
 CITYGMLTOOLS_PATH = "C:\\Users\\USER\\Documents\\opengeodata2blender\\toolchain\\citygml-tools-2.4.0\\citygml-tools.bat"  # Path to CityGMLTools jar file, if needed for further processing
+CLIP_BUILDINGS_TO_AREA = True                   # drop buildings outside the area (+10 m) from the CityJSON before importing
+SCENE_INDEX_CELL_SIZE = 100                     # metres, grid cell size of the spatial index over the imported objects
+CITYJSON_IMPORTER = "up3date"                   # "up3date" (Up3date add-on) or "builtin" (bulk NumPy importer, no EMPTY objects)
+CITYJSON_IMPORT_MODE = "building"               # builtin importer: "building" = one object per building, "tile" = one object per tile
+CITYJSON_CONVERTER = "citygml-tools"           # "citygml-tools" or "native" (built-in converter, no Java required)
+CITYGML_WORKERS = None                          # parallel citygml-tools invocations (None = number of CPUs); the native converter is sequential
+CITYGML_BATCH_SIZE = 8                          # GML files converted per citygml-tools invocation
+
+CACHE_DISK_BUDGET_GB = 100                      # least recently used tiles in TMP_PATH are evicted above this size (None = unlimited)
+
+PIPELINED_IMPORT = True                         # overlap downloads, GML conversion and the building import instead of running them one after the other
+PIPELINE_QUEUE_SIZE = 8                         # tiles waiting between two pipeline stages at most
+PIPELINE_BATCH_WAIT = 5                         # seconds a pipeline step waits for more tiles to fill a batch (e.g. one citygml-tools call)
+PIPELINE_LOG_INTERVAL = 10                      # seconds between two log lines with the pipeline queue depths
+TRACE_REPORT = True                             # write a timing report and a Chrome/Perfetto trace of the run next to the .blend file
+
+DOWNLOAD_WORKERS = 8                            # number of parallel download threads
+DOWNLOAD_MAX_PER_HOST = 4                       # default number of simultaneous connections per host
+DOWNLOAD_HOST_LIMITS = {}                       # per-host overrides, e.g. {"download1.bayernwolke.de": 6}
+DOWNLOAD_TIMEOUT = 60                           # seconds to wait for a server response
+DOWNLOAD_RETRIES = 3                            # times an interrupted download is resumed before giving up
+DOWNLOAD_MIN_CHUNK_SIZE = 64 * 1024             # bytes, the chunk size grows while the connection keeps up
+DOWNLOAD_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+BATCH_WORKERS = 1                               # __batch.py: Blender processes building projects at the same time
+BATCH_BLENDER_PATH = "blender"                  # __batch.py: Blender executable started for each project
+
+
+# Arguments after "--" when Blender runs this file from the command line, as __batch.py does:
+# blender -b template.blend --python __runner.py -- --config project.json [--tmp-path PATH] [--keep-cache]
+if "--" in sys.argv:
+    import argparse
+    _parser = argparse.ArgumentParser(prog="__runner.py")
+    _parser.add_argument("--config", help="configuration file of the project, replaces CONFIGURATION_FILEPATH")
+    _parser.add_argument("--tmp-path", help="replaces TMP_PATH")
+    _parser.add_argument("--keep-cache", action="store_true", help="do not evict tiles, other projects may still need them")
+    _args = _parser.parse_args(sys.argv[sys.argv.index("--") + 1:])
+    if _args.config:
+        USE_CONFIGURATION_FILE = True
+        CONFIGURATION_FILEPATH = _args.config
+    if _args.tmp_path:
+        TMP_PATH = _args.tmp_path
+    if _args.keep_cache:
+        CACHE_DISK_BUDGET_GB = None
 
 
 
@@ -0,0 +1,222 @@
+"""
+Local stand-in for geoservices.bayern.de and the tile download servers, used by the benchmark suite.
+
+POST /services/poly2metalink/metalink/<dataset> with an EWKT polygon as body answers with a
+Metalink 4 file listing the tiles of the dataset that intersect the polygon (with size and sha-256),
+GET /files/<dataset>/<name> serves a tile, including HTTP Range requests.
+Bandwidth and latency can be limited to make the network stage behave more like the real servers.
+"""
+import hashlib
+import http.server
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+
+# Datasets of the metalink service and the dataset folder (see synthetic.generate_dataset) they are served from
+METALINK_DATASETS = {"dgm1": "dgm1", "dgm5xyz": "dgm5", "lod2": "lod2"}
+METALINK_PATH = "/services/poly2metalink/metalink/"
+FILES_PATH = "/files/"
+
+
+class GeoservicesStub:
+    """
+    Serves the dataset folders below data_dir on a free port of 127.0.0.1 in a background thread.
+    bandwidth (bytes/s per connection) and latency (seconds per request) throttle the responses.
+    For tests of the download engine, ignore_range answers Range requests with the whole file (200)
+    and drop_after closes the connection after that many bytes of the first GET of each file.
+    max_active is the highest number of file requests served at the same time.
+    """
+
+    def __init__(self, data_dir, bandwidth=None, latency=0.0, tile_size=1000, ignore_range=False, drop_after=None):
+        self.data_dir = data_dir
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.tile_size = tile_size
+        self.ignore_range = ignore_range
+        self.drop_after = drop_after
+        self.requests = 0
+        self.bytes_sent = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self._dropped = set()
+
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                stub._count()
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+                dataset = self.path[len(METALINK_PATH):] if self.path.startswith(METALINK_PATH) else None
+                if dataset not in METALINK_DATASETS:
+                    self.send_error(404)
+                    return
+                data = stub.metalink(METALINK_DATASETS[dataset], body, f"http://{self.headers['Host']}").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/metalink4+xml")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                stub._send(self.wfile, data)
+
+            def do_GET(self):
+                self._serve_file(head=False)
+
+            def do_HEAD(self):
+                self._serve_file(head=True)
+
+            def _serve_file(self, head):
+                stub._count()
+                path = stub.file_path(self.path)
+                if path is None:
+                    self.send_error(404)
+                    return
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+                if match and not stub.ignore_range:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Last-Modified", self.date_time_string(int(os.path.getmtime(path))))
+                self.end_headers()
+                if head:
+                    return
+                remaining = end - start + 1
+                drop_after = stub._drop_after(path)
+                if drop_after is not None:
+                    remaining = min(remaining, drop_after)
+                    self.close_connection = True
+                with stub._serving(), open(path, "rb") as f:
+                    f.seek(start)
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 256 * 1024))
+                        if not chunk:
+                            break
+                        stub._send(self.wfile, chunk)
+                        remaining -= len(chunk)
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="geoservices-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def metalink_url(self, dataset):
+        return f"{self.url}{METALINK_PATH}{dataset}"
+
+    def file_url(self, folder, name):
+        return f"{self.url}{FILES_PATH}{folder}/{name}"
+
+    def file_path(self, url_path):
+        """Returns the local file for a /files/<folder>/<name> path, or None."""
+        if not url_path.startswith(FILES_PATH):
+            return None
+        folder, _, name = url_path[len(FILES_PATH):].partition("/")
+        if not folder or "/" in name or name.startswith("."):
+            return None
+        path = os.path.join(self.data_dir, folder, name)
+        return path if os.path.isfile(path) else None
+
+    def _count(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+
+    def _drop_after(self, path):
+        """Returns the number of bytes after which the response for path is cut off, only once per file."""
+        with self._lock:
+            if self.drop_after is None or path in self._dropped:
+                return None
+            self._dropped.add(path)
+            return self.drop_after
+
+    @contextmanager
+    def _serving(self):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _send(self, wfile, data):
+        wfile.write(data)
+        with self._lock:
+            self.bytes_sent += len(data)
+        if self.bandwidth:
+            time.sleep(len(data) / self.bandwidth)
+
+    def _sha256(self, path):
+        key = (path, os.path.getmtime(path))
+        if key not in self._hashes:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            self._hashes[key] = hasher.hexdigest()
+        return self._hashes[key]
+
+    def metalink(self, folder, ewkt, base_url):
+        """Builds the Metalink 4 response for the tiles of a dataset folder that intersect an EWKT polygon (EPSG:4326)."""
+        from pyproj import Transformer
+
+        numbers = [float(v) for v in re.findall(r"-?\d+(?:\.\d+)?", ewkt.split(";", 1)[-1])]
+        transformer = Transformer.from_crs("EPSG:4326", "EPSG:25832", always_xy=True)
+        xs, ys = transformer.transform(numbers[0::2], numbers[1::2])
+        min_east, max_east = int(min(xs) // self.tile_size), int(max(xs) // self.tile_size)
+        min_north, max_north = int(min(ys) // self.tile_size), int(max(ys) // self.tile_size)
+
+        entries = []
+        folder_dir = os.path.join(self.data_dir, folder)
+        for name in sorted(os.listdir(folder_dir)) if os.path.isdir(folder_dir) else []:
+            match = re.match(r"(\d+)_(\d+)\.", name)
+            if not match:
+                continue
+            east, north = int(match.group(1)), int(match.group(2))
+            if not (min_east <= east <= max_east and min_north <= north <= max_north):
+                continue
+            path = os.path.join(folder_dir, name)
+            entries.append(
+                f'<file name="{escape(name)}"><size>{os.path.getsize(path)}</size>'
+                f'<hash type="sha-256">{self._sha256(path)}</hash>'
+                f'<url>{escape(base_url + FILES_PATH + folder + "/" + name)}</url></file>'
+            )
+        return '<?xml version="1.0" encoding="UTF-8"?><metalink xmlns="urn:ietf:params:xml:ns:metalink">' + "".join(entries) + "</metalink>"
@@ -0,0 +1,295 @@
+"""
+Benchmark suite for the importer. Synthetic tiles (synthetic.py) of square areas of scale x scale
+tiles are served by a local stand-in of geoservices.bayern.de (geoservices_stub.py), and every stage
+of the importer is timed on them. Results are stored in bench/results/ and compared with the previous
+run of the same kind, so slowdowns show up as regressions.
+
+Without Blender only the stages that need no bpy are timed (metalinks, downloads, conversion, reading):
+    python bench/run_bench.py --scales 1,2,3
+
+Inside Blender the import stages are timed as well:
+    blender -b --factory-startup --python bench/run_bench.py -- --scales 1,2,3
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from __prefetch import _scripts as PREFETCH_SCRIPTS, _scripts_folder, load_scripts, read_runner_settings
+from geoservices_stub import GeoservicesStub
+import synthetic
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# Scripts loaded in addition to the ones __prefetch.py uses, without and with Blender
+PYTHON_SCRIPTS = ("terrain.py", "gpkg_remote.py", "trees.py")
+BLENDER_SCRIPTS = (
+    "belder_import.py",
+    "blender_helper.py",
+    "cityjson_mesh.py",
+    "fix_grid_mesh.py"
+)
+
+# Lower left tile of the synthetic areas, in kilometres (UTM32)
+ORIGIN_EAST = 510
+ORIGIN_NORTH = 5535
+
+# Settings of __runner.py that are replaced for a reproducible run without external tools
+BENCH_SETTINGS = {
+    "REPLACE_EXISTING_FILES": False,
+    "OFFLINE_TILE_RESOLUTION": False,
+    "CITYJSON_CONVERTER": "native",
+    "CITYJSON_IMPORTER": "builtin",
+    "CITYJSON_IMPORT_MODE": "building",
+    "CLIP_BUILDINGS_TO_AREA": True,
+    "CACHE_DISK_BUDGET_GB": None,
+    "TREE_REMOTE_READ": False,
+    "TREE_REPRESENTATION": "cubes",
+    "TRACE_REPORT": False
+}
+
+
+def bench_area(scale):
+    """Returns the tiles, the UTM32 bounding box (1 m inside the tile borders) and the EWKT polygon of an area."""
+    from pyproj import Transformer
+
+    tiles = [(ORIGIN_EAST + i, ORIGIN_NORTH + j) for j in range(scale) for i in range(scale)]
+    bbox = (
+        ORIGIN_EAST * 1000 + 1, ORIGIN_NORTH * 1000 + 1,
+        (ORIGIN_EAST + scale) * 1000 - 1, (ORIGIN_NORTH + scale) * 1000 - 1
+    )
+    transformer = Transformer.from_crs("EPSG:25832", "EPSG:4326", always_xy=True)
+    lon_from, lat_from = transformer.transform(bbox[0], bbox[1])
+    lon_to, lat_to = transformer.transform(bbox[2], bbox[3])
+    ewkt = (f"SRID=4326;POLYGON(({lon_from} {lat_from},{lon_from} {lat_to},{lon_to} {lat_to},"
+            f"{lon_to} {lat_from},{lon_from} {lat_from}))")
+    return tiles, bbox, ewkt
+
+
+def timed(stages, ns, stage, function, *args, **kwargs):
+    """Calls function, stores its wall time and the process RSS afterwards under stages[stage] and returns its result."""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - started
+    rss = ns["process_rss"]()
+    stages[stage] = {"seconds": seconds, "rss_mb": round(rss / 1024**2, 1) if rss else None}
+    print(f"    {stage:<40} {seconds:9.3f} s")
+    return result
+
+
+def run_stages(ns, stub, scale, dataset, tmp_path):
+    """Runs all stages once for an area of scale x scale tiles, with an empty TMP_PATH. Returns {stage: timing}."""
+    tiles, bbox, ewkt = bench_area(scale)
+    stages = {}
+
+    dirs = ns["setup_structure"](tmp_path)
+    ns["open_tile_cache"](dirs["manifest"])
+
+    metalinks = {}
+    for dataset_name, datatype in (("dgm1", "dgm1"), ("dgm5xyz", "dgm5"), ("lod2", "lod2")):
+        metalinks[datatype] = timed(stages, ns, f"download_metalink[{datatype}]", ns["download_metalink"],
+                                    stub.metalink_url(dataset_name), ewkt, dirs["metalink"], datatype)
+    files = {}
+    for datatype, metalink in metalinks.items():
+        files[datatype] = timed(stages, ns, f"parse_metalink[{datatype}]", ns["parse_metalink"], metalink)
+    files["tree"] = ns["gen_tree_download_list"]([stub.file_url("tree", os.path.basename(dataset["tree"][0]))])
+
+    for datatype, folder in (("dgm1", "dgm1"), ("dgm5", "dgm5"), ("lod2", "lod2_gml"), ("tree", "tree")):
+        timed(stages, ns, f"download_meta_files[{datatype}]", ns["download_meta_files"], files[datatype], dirs[folder])
+
+    timed(stages, ns, "extract_ascii_grids", ns["extract_ascii_grids"], files["dgm5"], dirs["dgm5"])
+    timed(stages, ns, "convert_to_cityjson", ns["convert_to_cityjson"], files["lod2"], dirs["lod2_json"])
+    timed(stages, ns, "clip_cityjson_files", ns["clip_cityjson_files"], files["lod2"], *bbox, dirs["lod2_clipped"])
+
+    def read_and_mosaic(paths):
+        return ns["mosaic_dem_tiles"]([ns["read_geotiff_dem"](path) for path in paths])
+
+    dgm1_paths = [file_info["local"] for file_info in files["dgm1"]]
+    dgm5_paths = [file_info["local"] for file_info in files["dgm5"]]
+    timed(stages, ns, "read_geotiff_dem+mosaic_dem_tiles", read_and_mosaic, dgm1_paths)
+    timed(stages, ns, "load_ascii_grids", ns["load_ascii_grids"], dgm5_paths)
+    timed(stages, ns, "load_tree_layers", ns["load_tree_layers"], files["tree"][0]["local"], bbox)
+
+    if bpy is None:
+        return stages
+
+    # Scene origin in the middle of the area, buildings are kept in its inner half
+    frame = ns["CoordinateFrame"]((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+    half = (bbox[2] - bbox[0]) / 4
+
+    timed(stages, ns, "clean_scene", ns["clean_scene"])
+    timed(stages, ns, "batch_import_ascii_grid", ns["batch_import_ascii_grid"], files["dgm5"], frame)
+    timed(stages, ns, "batch_import_geotiff_mosaic", ns["batch_import_geotiff_mosaic"], files["dgm1"], frame)
+
+    # fix_terrain_mesh joins tile meshes as BlenderGIS creates them; one DGM5 mesh per tile keeps it affordable
+    for path in dgm5_paths:
+        heights, x, y, dx, dy = ns["load_ascii_grids"]([path])
+        local_x, local_y = frame.utm32_to_local(x, y, dtype=np.float64)
+        ns["create_grid_mesh"](os.path.basename(path), heights, local_x, local_y, dx, dy, collection_name="BenchTiles")
+    timed(stages, ns, "fix_terrain_mesh", ns["fix_terrain_mesh"], "BenchTiles")
+
+    timed(stages, ns, "import_trees", ns["import_trees"], files["tree"], bbox, frame)
+    # The unclipped CityJSON tiles of the dataset, so there are buildings to delete afterwards
+    lod2_json = [{"name": os.path.basename(path), "local": path} for path in dataset["lod2_json"]]
+    timed(stages, ns, "batch_import_cityjson", ns["batch_import_cityjson"], lod2_json, frame)
+    timed(stages, ns, "delete_all_objects_outside_range", ns["delete_all_objects_outside_range"], -half, half, -half, half)
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_result(results_dir, mode, exclude=None):
+    """Returns the path of the newest stored result of the given mode ("python" or "blender"), or None."""
+    if not os.path.isdir(results_dir):
+        return None
+    candidates = sorted(
+        os.path.join(results_dir, name) for name in os.listdir(results_dir)
+        if name.endswith(f"_{mode}.json") and os.path.join(results_dir, name) != exclude
+    )
+    return candidates[-1] if candidates else None
+
+
+def compare_results(previous, current, tolerance, min_seconds):
+    """
+    Prints the stage times of two results side by side and returns the list of regressions:
+    stages that got slower by more than tolerance (relative) and min_seconds (absolute).
+    """
+    regressions = []
+    previous_scales = {entry["scale"]: entry for entry in previous["scales"]}
+    print(f"\nComparison with {previous['meta'].get('commit')} from {previous['meta'].get('date')}:")
+    for entry in current["scales"]:
+        before = previous_scales.get(entry["scale"])
+        if before is None or before["parameters"] != entry["parameters"]:
+            print(f"  scale {entry['scale']}: no comparable earlier result")
+            continue
+        print(f"  scale {entry['scale']} ({entry['tiles']} tile(s)):")
+        for stage, timing in entry["stages"].items():
+            if stage not in before["stages"]:
+                continue
+            old, new = before["stages"][stage]["seconds"], timing["seconds"]
+            ratio = new / old if old > 0 else float("inf")
+            flag = ""
+            if ratio > 1 + tolerance and new - old > min_seconds:
+                flag = "  REGRESSION"
+                regressions.append((entry["scale"], stage, old, new))
+            elif ratio < 1 - tolerance and old - new > min_seconds:
+                flag = "  faster"
+            print(f"    {stage:<40} {old:9.3f} s -> {new:9.3f} s ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Times the importer stages on synthetic data.")
+    parser.add_argument("--scales", default="1,2,3", help="comma separated area sizes in tiles per side")
+    parser.add_argument("--buildings", type=int, default=500, help="buildings per LoD2 tile")
+    parser.add_argument("--trees", type=int, default=5000, help="trees per tile in the tree GeoPackage")
+    parser.add_argument("--dgm1-resolution", type=float, default=1.0, help="metres per DGM1 pixel (1 = real tiles)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scale, the fastest time of each stage is kept")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes/s per connection of the stand-in server")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency per request of the stand-in server")
+    parser.add_argument("--data-dir", default=os.path.join(BENCH_DIR, "data"), help="where the synthetic tiles are kept")
+    parser.add_argument("--results-dir", default=os.path.join(BENCH_DIR, "results"), help="where results are stored")
+    parser.add_argument("--compare", help="result file to compare with (default: the newest one of the same kind)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="absolute slowdown below which nothing is reported")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if a regression is found")
+    args = parser.parse_args(argv)
+
+    mode = "blender" if bpy is not None else "python"
+    settings = read_runner_settings(os.path.join(ROOT_DIR, "__runner.py"))
+    settings.update(BENCH_SETTINGS)
+    scripts = PREFETCH_SCRIPTS + PYTHON_SCRIPTS + (BLENDER_SCRIPTS if bpy is not None else ())
+    ns = load_scripts(settings, os.path.join(ROOT_DIR, _scripts_folder), scripts)
+
+    result = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "mode": mode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "blender": bpy.app.version_string if bpy is not None else None,
+            "cpus": os.cpu_count()
+        },
+        "scales": []
+    }
+
+    for scale in (int(value) for value in args.scales.split(",")):
+        parameters = {
+            "buildings": args.buildings, "trees": args.trees, "dgm1_resolution": args.dgm1_resolution,
+            "bandwidth": args.bandwidth, "latency": args.latency
+        }
+        tiles, _, _ = bench_area(scale)
+        data_dir = os.path.join(args.data_dir, f"{scale}x{scale}_{args.buildings}b_{args.trees}t_{args.dgm1_resolution:g}m")
+        print(f"\nScale {scale} ({len(tiles)} tile(s)): generating data in {data_dir}...")
+        dataset = synthetic.generate_dataset(data_dir, tiles, args.buildings, args.trees, args.dgm1_resolution)
+
+        best = {}
+        with GeoservicesStub(data_dir, bandwidth=args.bandwidth, latency=args.latency) as stub:
+            for run in range(args.repeat):
+                print(f"  Run {run + 1} of {args.repeat}:")
+                tmp_path = tempfile.mkdtemp(prefix="opengeodata2blender_bench_")
+                try:
+                    stages = run_stages(ns, stub, scale, dataset, tmp_path)
+                finally:
+                    ns["open_tile_cache"](":memory:")
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                for stage, timing in stages.items():
+                    if stage not in best or timing["seconds"] < best[stage]["seconds"]:
+                        best[stage] = timing
+
+        result["scales"].append({
+            "scale": scale,
+            "tiles": len(tiles),
+            "parameters": parameters,
+            "stages": {stage: {"seconds": round(t["seconds"], 4), "rss_mb": t["rss_mb"]} for stage, t in best.items()}
+        })
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    result_path = os.path.join(
+        args.results_dir, f"{datetime.now():%Y%m%d-%H%M%S}_{result['meta']['commit'] or 'unknown'}_{mode}.json"
+    )
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {result_path}")
+
+    previous_path = args.compare or latest_result(args.results_dir, mode, exclude=result_path)
+    if previous_path is None:
+        return 0
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    regressions = compare_results(previous, result, args.tolerance, args.min_seconds)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) found.")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    # Blender passes its own arguments, the ones of the script follow "--"
+    arguments = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    exit_code = main(arguments)
+    if bpy is None:
+        sys.exit(exit_code)
@@ -0,0 +1,224 @@
+"""
+Generators for synthetic opengeodata tiles, used by the benchmark suite (run_bench.py).
+Tiles follow the Bavarian 1 km grid and file naming of TILE_GRIDS in __runner.py ({east}_{north}),
+so the importer handles them exactly like real downloads.
+"""
+import json
+import os
+import zipfile
+
+import numpy as np
+
+
+TILE_SIZE = 1000
+
+# GeoTIFF tags written to the DGM1 tiles, the same ones terrain.py reads
+GEOTIFF_MODEL_PIXEL_SCALE = 33550
+GEOTIFF_MODEL_TIEPOINT = 33922
+
+
+def synthetic_heights(x, y):
+    """Smooth rolling terrain between about 250 and 350 m, continuous across tile borders."""
+    return (300.0
+            + 30.0 * np.sin(x / 731.0) * np.cos(y / 587.0)
+            + 8.0 * np.sin(x / 97.0 + y / 131.0)
+            + 1.5 * np.cos(x / 13.0) * np.sin(y / 17.0))
+
+
+def tile_name(east, north, extension):
+    """File name of a tile, east/north are the kilometre coordinates of its lower left corner."""
+    return f"{east}_{north}.{extension}"
+
+
+def write_dgm1_tile(output_dir, east, north, resolution=1.0):
+    """
+    Writes a DGM1 GeoTIFF tile (float32, north-up, pixel-is-area) covering one kilometre square.
+    Returns the path of the tile.
+    """
+    import tifffile
+
+    size = int(round(TILE_SIZE / resolution))
+    x = east * TILE_SIZE + (np.arange(size) + 0.5) * resolution
+    y = (north + 1) * TILE_SIZE - (np.arange(size) + 0.5) * resolution
+    heights = synthetic_heights(x[None, :], y[:, None]).astype(np.float32)
+
+    path = os.path.join(output_dir, tile_name(east, north, "tif"))
+    tifffile.imwrite(path, heights, extratags=[
+        (GEOTIFF_MODEL_PIXEL_SCALE, "d", 3, (resolution, resolution, 0.0)),
+        (GEOTIFF_MODEL_TIEPOINT, "d", 6, (0.0, 0.0, 0.0, east * TILE_SIZE, (north + 1) * TILE_SIZE, 0.0))
+    ])
+    return path
+
+
+def write_dgm5_tile(output_dir, east, north, spacing=5.0):
+    """
+    Writes a DGM5 tile as a ZIP with one "x y z" ASCII grid, named like the ZIP, as the real download.
+    Returns the path of the ZIP.
+    """
+    coordinates = np.arange(TILE_SIZE // spacing) * spacing
+    x, y = np.meshgrid(east * TILE_SIZE + coordinates, north * TILE_SIZE + coordinates)
+    points = np.column_stack([x.ravel(), y.ravel(), synthetic_heights(x, y).ravel()])
+
+    path = os.path.join(output_dir, tile_name(east, north, "zip"))
+    text = "\n".join(f"{px:.2f} {py:.2f} {pz:.2f}" for px, py, pz in points)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(tile_name(east, north, "txt"), text + "\n")
+    return path
+
+
+def synthetic_buildings(east, north, count, seed=0):
+    """
+    Yields (id, footprint corners, ground height, eaves height, ridge height) of count gable roof
+    buildings placed on a regular raster over the tile, with random sizes.
+    """
+    rng = np.random.default_rng(seed + east * 7919 + north)
+    per_row = max(1, int(np.ceil(np.sqrt(count))))
+    cell = TILE_SIZE / per_row
+    for i in range(count):
+        row, col = divmod(i, per_row)
+        width, depth = rng.uniform(0.2, 0.6, 2) * cell
+        x0 = east * TILE_SIZE + col * cell + (cell - width) / 2
+        y0 = north * TILE_SIZE + row * cell + (cell - depth) / 2
+        ground = float(synthetic_heights(x0, y0))
+        eaves = ground + rng.uniform(3.0, 12.0)
+        ridge = eaves + rng.uniform(1.0, 5.0)
+        corners = [(x0, y0), (x0 + width, y0), (x0 + width, y0 + depth), (x0, y0 + depth)]
+        yield f"DEBY_{east}_{north}_{i}", corners, ground, eaves, ridge
+
+
+def building_surfaces(corners, ground, eaves, ridge):
+    """Returns the (surface type, ring) pairs of a gable roof building, rings as lists of (x, y, z)."""
+    (x0, y0), (x1, _), (_, y1), _ = corners
+    ym = (y0 + y1) / 2
+    surfaces = [("GroundSurface", [(x0, y0, ground), (x0, y1, ground), (x1, y1, ground), (x1, y0, ground)])]
+    surfaces.append(("WallSurface", [(x0, y0, ground), (x1, y0, ground), (x1, y0, eaves), (x0, y0, eaves)]))
+    surfaces.append(("WallSurface", [(x1, y1, ground), (x0, y1, ground), (x0, y1, eaves), (x1, y1, eaves)]))
+    surfaces.append(("WallSurface", [(x1, y0, ground), (x1, y1, ground), (x1, y1, eaves), (x1, ym, ridge), (x1, y0, eaves)]))
+    surfaces.append(("WallSurface", [(x0, y1, ground), (x0, y0, ground), (x0, y0, eaves), (x0, ym, ridge), (x0, y1, eaves)]))
+    surfaces.append(("RoofSurface", [(x0, y0, eaves), (x1, y0, eaves), (x1, ym, ridge), (x0, ym, ridge)]))
+    surfaces.append(("RoofSurface", [(x1, y1, eaves), (x0, y1, eaves), (x0, ym, ridge), (x1, ym, ridge)]))
+    return surfaces
+
+
+def write_lod2_citygml(output_dir, east, north, buildings, seed=0):
+    """Writes a LoD2 CityGML 2.0 tile with the given number of buildings. Returns the path of the tile."""
+    path = os.path.join(output_dir, tile_name(east, north, "gml"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<core:CityModel xmlns:core="http://www.opengis.net/citygml/2.0" '
+                'xmlns:bldg="http://www.opengis.net/citygml/building/2.0" xmlns:gml="http://www.opengis.net/gml">\n')
+        for building_id, corners, ground, eaves, ridge in synthetic_buildings(east, north, buildings, seed):
+            f.write(f'<core:cityObjectMember><bldg:Building gml:id="{building_id}">'
+                    f'<bldg:function>31001_1000</bldg:function><bldg:roofType>3100</bldg:roofType>'
+                    f'<bldg:measuredHeight uom="m">{ridge - ground:.2f}</bldg:measuredHeight>\n')
+            for surface_type, ring in building_surfaces(corners, ground, eaves, ridge):
+                pos_list = " ".join(f"{x:.3f} {y:.3f} {z:.3f}" for x, y, z in ring + ring[:1])
+                f.write(f'<bldg:boundedBy><bldg:{surface_type}><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember>'
+                        f'<gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">{pos_list}</gml:posList>'
+                        f'</gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface>'
+                        f'</bldg:lod2MultiSurface></bldg:{surface_type}></bldg:boundedBy>\n')
+            f.write('</bldg:Building></core:cityObjectMember>\n')
+        f.write('</core:CityModel>\n')
+    return path
+
+
+def write_lod2_cityjson(output_dir, east, north, buildings, seed=0):
+    """Writes the same buildings as write_lod2_citygml directly as a CityJSON 2.0 tile. Returns the path."""
+    scale = 0.001
+    translate = [east * TILE_SIZE, north * TILE_SIZE, 0.0]
+    vertices = []
+    city_objects = {}
+    for building_id, corners, ground, eaves, ridge in synthetic_buildings(east, north, buildings, seed):
+        boundaries, values, semantic_surfaces = [], [], []
+        for surface_type, ring in building_surfaces(corners, ground, eaves, ridge):
+            indices = []
+            for x, y, z in ring:
+                indices.append(len(vertices))
+                vertices.append([int(round((x - translate[0]) / scale)), int(round((y - translate[1]) / scale)), int(round(z / scale))])
+            boundaries.append([indices])
+            values.append(len(semantic_surfaces))
+            semantic_surfaces.append({"type": surface_type})
+        city_objects[building_id] = {
+            "type": "Building",
+            "attributes": {"function": "31001_1000", "measuredHeight": round(ridge - ground, 2)},
+            "geometry": [{
+                "type": "MultiSurface",
+                "lod": "2",
+                "boundaries": boundaries,
+                "semantics": {"surfaces": semantic_surfaces, "values": values}
+            }]
+        }
+
+    path = os.path.join(output_dir, tile_name(east, north, "json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "type": "CityJSON",
+            "version": "2.0",
+            "transform": {"scale": [scale] * 3, "translate": translate},
+            "metadata": {"referenceSystem": "https://www.opengis.net/def/crs/EPSG/0/25832"},
+            "CityObjects": city_objects,
+            "vertices": vertices
+        }, f, separators=(",", ":"))
+    return path
+
+
+def write_tree_geopackage(path, tiles, trees_per_tile, points_per_tree=1, layer="baeume", seed=0):
+    """
+    Writes a tree GeoPackage like the baeume3d download: one MultiPoint feature per tree
+    with the attributes "baumhoehe" (tree height) and "dgmhoehe" (terrain height).
+    tiles is a list of (east, north). Returns path.
+    """
+    import geopandas as gpd
+    import shapely
+
+    rng = np.random.default_rng(seed)
+    x, y = [], []
+    for east, north in tiles:
+        x.append(east * TILE_SIZE + rng.uniform(0, TILE_SIZE, trees_per_tile))
+        y.append(north * TILE_SIZE + rng.uniform(0, TILE_SIZE, trees_per_tile))
+    x, y = np.concatenate(x), np.concatenate(y)
+
+    # Additional points of a tree scatter around its first point
+    offsets = rng.normal(0, 1.5, (len(x), points_per_tree, 2))
+    offsets[:, 0] = 0
+    coordinates = np.stack([x[:, None] + offsets[..., 0], y[:, None] + offsets[..., 1]], axis=-1)
+    geometries = [shapely.MultiPoint(points) for points in coordinates]
+
+    gdf = gpd.GeoDataFrame({
+        "baumhoehe": rng.uniform(4, 30, len(x)).round(1),
+        "dgmhoehe": synthetic_heights(x, y).round(2)
+    }, geometry=geometries, crs="EPSG:25832")
+    if os.path.exists(path):
+        os.remove(path)
+    gdf.to_file(path, layer=layer, driver="GPKG")
+    return path
+
+
+def generate_dataset(output_dir, tiles, buildings_per_tile, trees_per_tile, dgm1_resolution=1.0):
+    """
+    Writes DGM1, DGM5 and LoD2 (CityGML and CityJSON) tiles and one tree GeoPackage for the given
+    (east, north) tiles into the dataset folders of output_dir. Existing files are kept, so a
+    dataset is only generated once per scale. Returns a dict of dataset folder -> list of paths.
+    """
+    folders = {name: os.path.join(output_dir, name) for name in ("dgm1", "dgm5", "lod2", "lod2_json", "tree")}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+
+    files = {name: [] for name in folders}
+    for east, north in tiles:
+        for name, extension, writer, args in (
+            ("dgm1", "tif", write_dgm1_tile, (dgm1_resolution,)),
+            ("dgm5", "zip", write_dgm5_tile, ()),
+            ("lod2", "gml", write_lod2_citygml, (buildings_per_tile,)),
+            ("lod2_json", "json", write_lod2_cityjson, (buildings_per_tile,))
+        ):
+            path = os.path.join(folders[name], tile_name(east, north, extension))
+            if not os.path.exists(path):
+                writer(folders[name], east, north, *args)
+            files[name].append(path)
+
+    tree_path = os.path.join(folders["tree"], "baeume.gpkg")
+    if not os.path.exists(tree_path):
+        write_tree_geopackage(tree_path, tiles, trees_per_tile)
+    files["tree"].append(tree_path)
+    return files
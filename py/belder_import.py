@@ -3,24 +3,26 @@
 import bpy
 from tqdm import tqdm
 
-def setup_blender_gis(srid, lat, lon, crs_x, crs_y):
+def setup_blender_gis(frame):
 
     print("Setting CRS")
-    bpy.context.scene["SRID"] = srid
-    bpy.context.scene["crs x"] = crs_x
-    bpy.context.scene["crs y"] = crs_y
-    bpy.context.scene["latitude"] = lat
-    bpy.context.scene["longitude"] = lon
+    bpy.context.scene["SRID"] = frame.crs
+    bpy.context.scene["crs x"] = frame.origin_x
+    bpy.context.scene["crs y"] = frame.origin_y
+    bpy.context.scene["latitude"] = frame.origin_lat
+    bpy.context.scene["longitude"] = frame.origin_lon
     
     return True
 
 
-def setup_city_json(crs_x, crs_y):
+def setup_city_json(frame):
     world = bpy.context.scene.world
     if world is None:
         print("No world is assigned to the current scene.\n")
         return False
 
+    crs_x, crs_y = frame.origin_x, frame.origin_y
+
     bpy.context.scene.world["Axis_Origin_X_translation"] = -1 * crs_x
     bpy.context.scene.world["Axis_Origin_Y_translation"] = -1 * crs_y
     bpy.context.scene.world["Axis_Origin_Z_translation"] = 0
@@ -52,11 +54,13 @@ def batch_import_geotiff(files, collection_name="DEMs"):
             # Record objects in scene before import
             objs_before = set(bpy.context.scene.objects)
 
-            bpy.ops.importgis.georaster(
-                filepath=file_info['local'],
-                importMode='DEM_RAW',
-                fillNodata=True
-            )
+            with trace_span("import", "import", file=file_info['name']) as span:
+                bpy.ops.importgis.georaster(
+                    filepath=file_info['local'],
+                    importMode='DEM_RAW',
+                    fillNodata=True
+                )
+                span["vertices"], span["faces"] = count_mesh_elements(set(bpy.context.scene.objects) - objs_before)
 
             # Record objects in scene after import
             objs_after = set(bpy.context.scene.objects)
@@ -79,131 +83,127 @@ def batch_import_geotiff(files, collection_name="DEMs"):
             print(f"     Error: {e}\n")
         
     
-def batch_import_cityjson(files):
+def batch_import_geotiff_mosaic(files, frame, collection_name="DEMs"):
+    """
+    Imports DGM1 GeoTIFF tiles as one continuous terrain mesh without BlenderGIS.
+    The tiles are read into NumPy (terrain.py), mosaicked into a single height grid and
+    turned into one grid mesh, so no joining, remove_doubles or seam fixing is needed.
+    Vertices are placed in the local coordinates of frame.
+    """
+    if not files:
+        print("No GeoTIFF files given. Nothing to import.\n")
+        return
+
+    tiles = []
+    for file_info in tqdm(files, desc="Reading GeoTIFF"):
+        if file_info['local'] is None:
+            continue
+        try:
+            with trace_span("read", "import", file=file_info['name']) as span:
+                tiles.append(read_geotiff_dem(file_info['local']))
+                span["bytes"] = os.path.getsize(file_info['local'])
+        except Exception as e:
+            print(f"  -> Failed to read: {file_info['local']}")
+            print(f"     Error: {e}\n")
+
+    if not tiles:
+        print("No GeoTIFF files could be read. Nothing to import.\n")
+        return
+
+    heights, x, y, dx, dy = mosaic_dem_tiles(tiles)
+    print(f"Terrain grid: {heights.shape[1]} x {heights.shape[0]} points at {dx} x {dy} m")
+
+    with trace_span("mesh", "import", file="Terrain") as span:
+        local_x, local_y = frame.utm32_to_local(x, y, dtype=np.float64)
+        obj = create_grid_mesh("Terrain", heights, local_x, local_y, dx, dy,
+                               collection_name=collection_name, max_error=TERRAIN_MESH_SIMPLIFICATION)
+        span["vertices"], span["faces"] = count_mesh_elements([obj])
+    return obj
+
+
+def batch_import_cityjson(files, frame, remove_empties=True):
+    """
+    Imports CityJSON files with the Up3date add-on, or with the built-in bulk importer
+    (cityjson_mesh.py) if CITYJSON_IMPORTER is "builtin".
+    The built-in importer places vertices in the local coordinates of frame and creates no EMPTY objects;
+    Up3date uses the origin set by setup_city_json.
+    With remove_empties=False the EMPTY objects of Up3date are kept, so a caller importing tile by tile
+    can remove them once with remove_cityjson_empties.
+    """
 
     if not files:
         print("No CityJson files given. Nothing to import.\n")
         return
 
+    if CITYJSON_IMPORTER == "builtin":
+        for file_info in tqdm(files, desc="Importing CityJson"):
+            try:
+                with trace_span("import", "import", file=file_info['name']) as span:
+                    created = import_cityjson_bulk(file_info['local'], frame, mode=CITYJSON_IMPORT_MODE)
+                    span["bytes"] = os.path.getsize(file_info['local'])
+                    span["vertices"], span["faces"] = count_mesh_elements(created)
+                print(f"  -> Imported {len(created)} object(s) from {file_info['name']}.")
+            except Exception as e:
+                print(f"  -> Failed to import: {file_info['local']}")
+                print(f"     Error: {e}\n")
+        return
+
+    # The objects Up3date creates are found with one comparison after all tiles,
+    # so the time per tile does not depend on the number of objects already in the scene
+    objs_before = set(bpy.data.objects) if remove_empties else None
     for file_info in files:
         print(f"Importing CityJson: {file_info['name']}")
         try:
-            bpy.ops.cityjson.import_file(
-                filepath=file_info['local'],
-                clean_scene=False,
-                reuse_materials=True,
-                material_type='SURFACES'
-            )
+            with trace_span("import", "import", file=file_info['name']) as span:
+                bpy.ops.cityjson.import_file(
+                    filepath=file_info['local'],
+                    clean_scene=False,
+                    reuse_materials=True,
+                    material_type='SURFACES'
+                )
+                span["bytes"] = os.path.getsize(file_info['local'])
             print("  -> Successfully imported.\n")
         except Exception as e:
             print(f"  -> Failed to import: {file_info['local']}")
             print(f"     Error: {e}\n")
 
-        clean_empty_objects()
+    if remove_empties:
+        remove_cityjson_empties(objs_before, f"{len(files)} file(s)")
+
+
+def remove_cityjson_empties(objs_before, label):
+    """
+    Removes the EMPTY objects Up3date created since objs_before (a set of bpy.data.objects) was taken,
+    their children are kept in place. Scans the scene once, whatever the number of imported tiles.
+    """
+    with trace_span("empties", "mesh", file=label) as span:
+        created = [obj for obj in bpy.data.objects if obj not in objs_before]
+        span["vertices"], span["faces"] = count_mesh_elements(created)
+        span["removed"] = remove_empty_objects(created)
+    print(f"Removed {span['removed']} EMPTY object(s) of {len(created)} imported object(s).")
 
 
-def batch_import_ascii_grid(files, offset_x=0.0, offset_y=0.0, collection_name="DEMs"):
+def batch_import_ascii_grid(files, frame, collection_name="DEMs"):
+    """
+    Imports DGM5 ASCII grid files as one terrain mesh.
+    The points are parsed in bulk into NumPy arrays and placed into a height grid by index
+    (terrain.py); grid points missing from the files are left as holes.
+    Vertices are placed in the local coordinates of frame.
+    """
 
     if not files:
         print("No ASCII Grid files given. Nothing to import.\n")
         return
 
     print("Loading Points from ASCII Grid files...")
-    pts = []
-    for file_info in tqdm(files):
-        with open(file_info['local'], "r") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) == 3:
-                    x, y, z = map(float, parts)
-                    pts.append((x - offset_x, y - offset_y, z))
-
-
-    pts.sort(key=lambda p: (p[1], p[0]))
-
-    print("Total points loaded:", len(pts))
-    print("Detecting grid spacing...")
-    dx = None
-    first_y = pts[0][1]
-
-    for p in tqdm(pts[1:]):
-        if abs(p[1] - first_y) < 1e-6:
-            dx = abs(p[0] - pts[0][0])
-            if dx > 1e-6:
-                break
-
-    dy = None
-    for p in tqdm(pts):
-        if abs(p[1] - first_y) > 1e-6:
-            dy = abs(p[1] - first_y)
-            break
-
-    print("Detected dx =", dx, " dy =", dy)
-
-    print("Computing grid indices...")
-    min_x = min(p[0] for p in pts)
-    min_y = min(p[1] for p in pts)
-
-    grid = {}
-    max_row = 0
-    max_col = 0
-
-    for (x, y, z) in tqdm(pts):
-        col = round((x - min_x) / dx)
-        row = round((y - min_y) / dy)
-
-        grid[(row, col)] = z
-
-        if row > max_row: max_row = row
-        if col > max_col: max_col = col
-
-    # Step 4: Build vertex list in (row-major order)
-    verts = []
-    index_map = {}   # (row,col) → vertex index
-
-    for r in tqdm(range(max_row + 1)):
-        for c in range(max_col + 1):
-            if (r, c) in grid:
-                z = grid[(r, c)]
-                x = min_x + c * dx
-                y = min_y + r * dy
-                index_map[(r, c)] = len(verts)
-                verts.append((x, y, z))
-            else:
-                index_map[(r, c)] = None  # missing
-
-    # Step 5: Build faces
-    faces = []
-
-    for r in tqdm(range(max_row)):
-        for c in range(max_col):
-
-            v1 = index_map[(r, c)]
-            v2 = index_map[(r, c+1)]
-            v3 = index_map[(r+1, c+1)]
-            v4 = index_map[(r+1, c)]
-
-            # skip holes
-            if None in (v1, v2, v3, v4):
-                continue
-
-            faces.append((v1, v2, v3, v4))
-
-    print("Creating Blender mesh...")
-    mesh = bpy.data.meshes.new("FastGridMesh")
-    mesh.from_pydata(verts, [], faces)
-    mesh.update()
-
-    obj = bpy.data.objects.new("FastGridMesh", mesh)
-    bpy.context.collection.objects.link(obj)
-
-    #Move object to origin
-    obj.location = (0.0, 0.0, 0.0)
-
-    # Move to target collection
-    if collection_name not in bpy.data.collections:
-        dem_collection = bpy.data.collections.new(collection_name)
-        bpy.context.scene.collection.children.link(dem_collection)
-    else:
-        dem_collection = bpy.data.collections[collection_name]
-    dem_collection.objects.link(obj)
\ No newline at end of file
+    paths = [file_info['local'] for file_info in files if file_info['local']]
+    with trace_span("read", "import", file=f"{len(paths)} ASCII grid(s)") as span:
+        heights, x, y, dx, dy = load_ascii_grids(paths)
+        span["bytes"] = sum(os.path.getsize(path) for path in paths)
+
+    with trace_span("mesh", "import", file="FastGridMesh") as span:
+        local_x, local_y = frame.utm32_to_local(x, y, dtype=np.float64)
+        obj = create_grid_mesh("FastGridMesh", heights, local_x, local_y, dx, dy,
+                               collection_name=collection_name, max_error=TERRAIN_MESH_SIMPLIFICATION)
+        span["vertices"], span["faces"] = count_mesh_elements([obj])
+    return obj
@@ -1,31 +1,42 @@
 
 
 import bpy
-from tqdm import tqdm
+import numpy as np
 
 
-def clean_scene():
-    # Collect all objects to delete
-    objects_to_delete = [
-        obj for obj in bpy.data.objects
-    ]
-    
-    chunk_size = 500  # you can tweak this number
-    for i in tqdm(range(0, len(objects_to_delete), chunk_size), desc="Deleting objects"):
-        bpy.ops.object.select_all(action='DESELECT')
-        for obj in objects_to_delete[i:i + chunk_size]:
-            try:
-                obj.select_set(True)
-            except Exception as e:
-                print(f"Failed to remove object {obj.name}: {e}")
-        bpy.ops.object.delete()
-    
-    # Remove all collections except the main one
-    for collection in bpy.data.collections:
-        bpy.data.collections.remove(collection)
-    
-    # Remove all meshes, materials, etc. to really clean it up
-    for datablock in (
+def clean_scene(mode=CLEAN_BLENDER_MODE):
+    """
+    Empties the scene before an import.
+
+    "purge" removes all objects, collections, meshes, materials, images, textures, curves, cameras
+    and lights of the open file with one bpy.data.batch_remove call and then purges everything left
+    without users, without any operator calls. The file stays open with its scene and render settings.
+
+    "fresh" replaces the open file with an empty one (bpy.ops.wm.read_homefile) instead of deleting
+    anything, and adds a world if the empty file has none. Scene settings of the template are lost
+    and bpy.data.filepath is cleared, so paths next to the template must be determined before.
+    Loading a file frees the text block of a script started from the Blender UI and crashes Blender,
+    so "fresh" is only used in background runs (blender -b ... --python) and falls back to "purge" otherwise.
+    """
+    global _scene_index
+    _scene_index = None
+
+    if mode == "fresh" and not bpy.app.background:
+        print('Warning: CLEAN_BLENDER_MODE "fresh" only works in background runs (blender -b), using "purge" instead.')
+        mode = "purge"
+
+    if mode == "fresh":
+        bpy.ops.wm.read_homefile(use_empty=True, load_ui=False)
+        scene = bpy.context.scene
+        if scene.world is None:
+            scene.world = bpy.data.worlds.new("World")
+        print(f"Loaded an empty file with scene '{scene.name}'.")
+        return
+
+    datablocks = []
+    for collection in (
+        bpy.data.objects,
+        bpy.data.collections,
         bpy.data.meshes,
         bpy.data.materials,
         bpy.data.images,
@@ -34,27 +45,146 @@ def clean_scene():
         bpy.data.cameras,
         bpy.data.lights,
     ):
-        for block in tqdm(datablock):
-            datablock.remove(block)
-    
+        datablocks.extend(collection)
+    bpy.data.batch_remove(datablocks)
 
+    # Node groups, actions etc. only used by the removed data
+    purged = bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    print(f"Removed {len(datablocks)} datablocks and purged {purged} orphans.")
 
-def clean_empty_objects():
-    print("Cleaning up EMPTY-type objects...")
 
-    # Collect all EMPTY objects first
-    objects_to_delete = [obj for obj in bpy.data.objects if obj.type == 'EMPTY']
-    
-    total = len(objects_to_delete)
-    print(f"Found {total} empty objects.")
 
-    # Delete objects in chunks to update progress
-    chunk_size = 500 
-    for i in tqdm(range(0, len(objects_to_delete), chunk_size), desc="Deleting objects"):
-        bpy.ops.object.select_all(action='DESELECT')
-        for obj in objects_to_delete[i:i + chunk_size]:
-            obj.select_set(True)
-        bpy.ops.object.delete()
+def create_mesh_from_arrays(name, vertices, face_vertex_indices, face_sizes, material_indices=None):
+    """
+    Creates a mesh datablock directly from NumPy arrays with foreach_set, without from_pydata.
+
+    Args:
+        name (str): Name of the new mesh.
+        vertices (ndarray): (n, 3) vertex coordinates.
+        face_vertex_indices (ndarray): Vertex indices of all faces, concatenated.
+        face_sizes (ndarray): Number of vertices of each face.
+        material_indices (ndarray): Optional material slot index of each face.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+    face_vertex_indices = np.asarray(face_vertex_indices, dtype=np.int32).ravel()
+    face_sizes = np.asarray(face_sizes, dtype=np.int32).ravel()
+    loop_starts = np.zeros(len(face_sizes), dtype=np.int32)
+    if len(face_sizes) > 1:
+        np.cumsum(face_sizes[:-1], out=loop_starts[1:])
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    mesh.loops.add(len(face_vertex_indices))
+    mesh.loops.foreach_set("vertex_index", face_vertex_indices)
+    mesh.polygons.add(len(face_sizes))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    # Since Blender 4.0 the face sizes are derived from the loop starts
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", face_sizes)
+    if material_indices is not None:
+        mesh.polygons.foreach_set("material_index", np.asarray(material_indices, dtype=np.int32).ravel())
+
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def create_grid_mesh(name, heights, origin_x, origin_y, dx, dy, collection_name="DEMs", max_error=None):
+    """
+    Creates a terrain mesh object from a regular height grid (row 0 = southern row, NaN = no data).
+    Every grid point with a height becomes a vertex (in row-major order), every grid cell whose
+    four corners exist becomes a quad. Quads are wound counter-clockwise seen from above,
+    so all normals point up without a normals_make_consistent pass.
+    If max_error is set, the grid is triangulated adaptively instead (see rtin_triangulate in terrain.py),
+    keeping every grid height within max_error metres of the mesh.
+
+    Args:
+        name (str): Name of the mesh and object.
+        heights (ndarray): (rows, cols) heights.
+        origin_x (float): X coordinate of the grid point at row 0, column 0.
+        origin_y (float): Y coordinate of the grid point at row 0, column 0.
+        dx (float): Grid spacing along X.
+        dy (float): Grid spacing along Y.
+        collection_name (str): Collection the object is linked to.
+        max_error (float): Maximum vertical error in metres of the simplified mesh, None for the full grid.
+    """
+    if max_error is not None:
+        rows, cols, triangles = rtin_triangulate(heights, max_error)
+        vertices = np.column_stack([origin_x + cols * dx, origin_y + rows * dy, heights[rows, cols]])
+        print(f"Creating simplified terrain mesh with {len(vertices)} vertices and {len(triangles)} triangles "
+              f"(max. error {max_error} m, full grid: {np.count_nonzero(~np.isnan(heights))} vertices)...")
+        mesh = create_mesh_from_arrays(name, vertices, triangles.ravel(), np.full(len(triangles), 3))
+
+        obj = bpy.data.objects.new(name, mesh)
+        get_or_create_collection(collection_name).objects.link(obj)
+        return obj
+
+    valid = ~np.isnan(heights)
+    vertex_ids = np.full(heights.shape, -1, dtype=np.int64)
+    vertex_ids[valid] = np.arange(np.count_nonzero(valid))
+
+    rows, cols = np.nonzero(valid)
+    vertices = np.column_stack([origin_x + cols * dx, origin_y + rows * dy, heights[valid]])
+
+    # Corners of all cells: (r, c), (r, c+1), (r+1, c+1), (r+1, c)
+    quads = np.stack([vertex_ids[:-1, :-1], vertex_ids[:-1, 1:], vertex_ids[1:, 1:], vertex_ids[1:, :-1]], axis=-1)
+    quads = quads[(quads >= 0).all(axis=-1)]
+
+    print(f"Creating terrain mesh with {len(vertices)} vertices and {len(quads)} faces...")
+    mesh = create_mesh_from_arrays(name, vertices, quads.ravel(), np.full(len(quads), 4))
+
+    obj = bpy.data.objects.new(name, mesh)
+    get_or_create_collection(collection_name).objects.link(obj)
+    return obj
+
+
+def count_mesh_elements(objects):
+    """Returns (vertices, faces) of the meshes used by the given objects, e.g. for a trace span."""
+    meshes = {obj.data for obj in objects if obj.type == 'MESH'}
+    return sum(len(mesh.vertices) for mesh in meshes), sum(len(mesh.polygons) for mesh in meshes)
+
+
+def get_or_create_collection(collection_name):
+    """Returns the collection with the given name, creating it and linking it to the scene if needed."""
+    if collection_name in bpy.data.collections:
+        return bpy.data.collections[collection_name]
+    collection = bpy.data.collections.new(collection_name)
+    bpy.context.scene.collection.children.link(collection)
+    return collection
+
+
+def remove_empty_objects(objects):
+    """
+    Removes the EMPTY objects among objects with one bpy.data.batch_remove call.
+    Objects parented to a removed EMPTY are re-parented to its nearest ancestor that is kept
+    (or none), keeping their world transforms. Children are only looked for in objects, so it
+    must contain all objects created together with the EMPTYs, e.g. by one import.
+    Returns the number of removed objects.
+    """
+    empties = {obj for obj in objects if obj.type == 'EMPTY'}
+    if not empties:
+        return 0
+
+    # bpy.data-only imports leave matrix_world stale until the depsgraph is evaluated
+    bpy.context.view_layer.update()
+    for obj in objects:
+        if obj in empties or obj.parent not in empties:
+            continue
+        matrix_world = obj.matrix_world.copy()
+        parent = obj.parent
+        while parent in empties:
+            parent = parent.parent
+        obj.parent = parent
+        obj.matrix_world = matrix_world
+
+    bpy.data.batch_remove(list(empties))
+    return len(empties)
+
+
+def clean_empty_objects():
+    print("Cleaning up EMPTY-type objects...")
+    removed = remove_empty_objects(list(bpy.data.objects))
+    print(f"Removed {removed} empty objects.")
 
 
 def assign_material_to_collection(collection_name, material_name, color=(1, 1, 1, 1), clean_unused=True):
@@ -69,6 +199,11 @@ def assign_material_to_collection(collection_name, material_name, color=(1, 1, 1
         clean_unused (bool): Whether to remove unused materials after assignment.
     """
 
+    with trace_span("material", "material", collection=collection_name, material=material_name) as span:
+        _assign_material_to_collection(collection_name, material_name, color, clean_unused, span)
+
+
+def _assign_material_to_collection(collection_name, material_name, color, clean_unused, span):
     # --- Get or create collection ---
     collection = bpy.data.collections.get(collection_name)
     if not collection:
@@ -90,6 +225,7 @@ def assign_material_to_collection(collection_name, material_name, color=(1, 1, 1
             mesh = obj.data
             mesh.materials.clear()
             mesh.materials.append(mat)
+    span["objects"] = len(collection.objects)
 
 
     # --- Clean up unused materials ---
@@ -102,9 +238,127 @@ def assign_material_to_collection(collection_name, material_name, color=(1, 1, 1
                 bpy.data.materials.remove(m)
                 removed += 1
 
+# Uniform grid over the XY bounds of the scene's mesh objects, see build_scene_index()
+_scene_index = None
+
+
+def collect_object_bounds():
+    """
+    Reads the world-space XY bounding boxes of all mesh objects in one pass.
+    matrix_world and bound_box are fetched for all objects at once with foreach_get and transformed with NumPy.
+    Returns (object names, (n, 4) array of min_x, min_y, max_x, max_y).
+    """
+    objects = bpy.data.objects
+    count = len(objects)
+    if count == 0:
+        return [], np.zeros((0, 4))
+
+    # Objects created or re-parented through bpy.data have no evaluated matrix_world/bound_box yet;
+    # bpy.ops calls used to do this implicitly
+    bpy.context.view_layer.update()
+
+    matrices = np.empty(count * 16, dtype=np.float32)
+    corners = np.empty(count * 24, dtype=np.float32)
+    objects.foreach_get("matrix_world", matrices)
+    objects.foreach_get("bound_box", corners)
+
+    is_mesh = np.array([obj.type == 'MESH' for obj in objects], dtype=bool)
+    names = [obj.name for obj, mesh in zip(objects, is_mesh) if mesh]
+
+    # foreach_get returns the matrices column-major, so row vectors are multiplied from the left
+    matrices = matrices.reshape(count, 4, 4)[is_mesh].astype(np.float64)
+    corners = corners.reshape(count, 8, 3)[is_mesh].astype(np.float64)
+    world = corners @ matrices[:, :3, :3] + matrices[:, 3:4, :3]
+
+    bounds = np.concatenate([world[:, :, :2].min(axis=1), world[:, :, :2].max(axis=1)], axis=1)
+    return names, bounds
+
+
+def _build_grid(names, bounds, cell_size):
+    """Sorts the objects into all grid cells their bounding box overlaps."""
+    grid = {}
+    if len(names):
+        cells = np.floor(bounds / cell_size).astype(np.int64)
+        span_x = cells[:, 2] - cells[:, 0] + 1
+        span_y = cells[:, 3] - cells[:, 1] + 1
+        counts = span_x * span_y
+
+        # One entry per (object, cell) pair
+        object_ids = np.repeat(np.arange(len(names)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = cells[object_ids, 0] + local % span_x[object_ids]
+        cell_y = cells[object_ids, 1] + local // span_x[object_ids]
+
+        order = np.lexsort((cell_y, cell_x))
+        keys = np.stack([cell_x[order], cell_y[order]], axis=1)
+        unique_keys, starts = np.unique(keys, axis=0, return_index=True)
+        for key, ids in zip(map(tuple, unique_keys), np.split(object_ids[order], starts[1:])):
+            grid[key] = ids
+
+    return {"names": names, "bounds": bounds, "cell_size": cell_size, "grid": grid}
+
+
+def build_scene_index(cell_size=SCENE_INDEX_CELL_SIZE):
+    """
+    (Re)builds the scene-level spatial index of all mesh objects.
+    Later area queries (query_scene_index) only test the objects in the overlapping grid cells
+    instead of rescanning every object in the scene.
+    """
+    global _scene_index
+    names, bounds = collect_object_bounds()
+    _scene_index = _build_grid(names, bounds, cell_size)
+    _scene_index["object_count"] = len(bpy.data.objects)
+    print(f"Indexed {len(names)} mesh objects in {len(_scene_index['grid'])} grid cells of {cell_size} m.")
+    return _scene_index
+
+
+def query_scene_index(min_x, max_x, min_y, max_y):
+    """
+    Returns the mesh objects whose bounding box touches the given X/Y range, using the scene index.
+    The index is built on first use and rebuilt when the number of objects in the scene has changed since,
+    so objects imported later (terrain, trees, further tiles) are found as well.
+    """
+    index = _scene_index
+    if index is None or index["object_count"] != len(bpy.data.objects):
+        index = build_scene_index()
+    if not index["names"]:
+        return []
+
+    cell_size = index["cell_size"]
+    candidates = [
+        index["grid"][(cx, cy)]
+        for cx in range(int(np.floor(min_x / cell_size)), int(np.floor(max_x / cell_size)) + 1)
+        for cy in range(int(np.floor(min_y / cell_size)), int(np.floor(max_y / cell_size)) + 1)
+        if (cx, cy) in index["grid"]
+    ]
+    if not candidates:
+        return []
+
+    ids = np.unique(np.concatenate(candidates))
+    bounds = index["bounds"][ids]
+    hits = ids[(bounds[:, 2] >= min_x) & (bounds[:, 0] <= max_x) & (bounds[:, 3] >= min_y) & (bounds[:, 1] <= max_y)]
+
+    objects = (bpy.data.objects.get(index["names"][i]) for i in hits)
+    return [obj for obj in objects if obj is not None]
+
+
+def remove_objects(objects):
+    """
+    Removes objects with a single bpy.data.batch_remove call instead of select + bpy.ops.object.delete.
+    Meshes that are no longer used by any object are removed as well.
+    """
+    meshes = {obj.data for obj in objects if obj.type == 'MESH' and obj.data is not None}
+    bpy.data.batch_remove(list(objects))
+    orphans = [mesh for mesh in meshes if mesh.users == 0]
+    if orphans:
+        bpy.data.batch_remove(orphans)
+
+
 def delete_all_objects_outside_range(min_x_fromorigin, max_x_fromorigin, min_y_fromorigin, max_y_fromorigin):
     """
     Deletes all objects in the scene that are outside the specified X/Y range.
+    The bounding boxes of all mesh objects are tested at once with NumPy and the objects
+    outside are removed in one batch. The scene index is rebuilt from the remaining objects.
 
     Args:
         min_x (float): Minimum X coordinate.
@@ -112,7 +366,8 @@ def delete_all_objects_outside_range(min_x_fromorigin, max_x_fromorigin, min_y_f
         min_y (float): Minimum Y coordinate.
         max_y (float): Maximum Y coordinate.
     """
-    
+    global _scene_index
+
     min_x = min(min_x_fromorigin, max_x_fromorigin)
     max_x = max(min_x_fromorigin, max_x_fromorigin)
     min_y = min(min_y_fromorigin, max_y_fromorigin)
@@ -127,32 +382,14 @@ def delete_all_objects_outside_range(min_x_fromorigin, max_x_fromorigin, min_y_f
     print(f"Delete objects completely outside range:")
     print(f"   X: {min_x} to {max_x}, Y: {min_y} to {max_y}")
 
-    # Deselect everything first
-    bpy.ops.object.select_all(action='DESELECT')
-
-    # Function to check if an object's bounding box is outside the given range
-    def is_outside_xy_bounds(obj, min_x, max_x, min_y, max_y):
-        world_coords = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
-        xs = [v.x for v in world_coords]
-        ys = [v.y for v in world_coords]
-        
-        return max(xs) < min_x or min(xs) > max_x or max(ys) < min_y or min(ys) > max_y
-
-    # Collect all objects to delete
-    objects_to_delete = [
-        obj for obj in tqdm(bpy.data.objects) if (obj.type == 'MESH' and is_outside_xy_bounds(obj, min_x, max_x, min_y, max_y))
-    ]
+    names, bounds = collect_object_bounds()
+    outside = (bounds[:, 2] < min_x) | (bounds[:, 0] > max_x) | (bounds[:, 3] < min_y) | (bounds[:, 1] > max_y)
+    objects_to_delete = [bpy.data.objects[names[i]] for i in np.flatnonzero(outside)]
 
     print(f"Found {len(objects_to_delete)} objects outside range.")
+    remove_objects(objects_to_delete)
 
-    # Delete objects in chunks to update progress
-    chunk_size = 500
-    for i in tqdm(range(0, len(objects_to_delete), chunk_size), desc="Deleting objects"):
-        bpy.ops.object.select_all(action='DESELECT')
-        for obj in objects_to_delete[i:i + chunk_size]:
-            obj.select_set(True)
-        bpy.ops.object.delete()
+    _scene_index = _build_grid([n for n, o in zip(names, outside) if not o], bounds[~outside], SCENE_INDEX_CELL_SIZE)
+    _scene_index["object_count"] = len(bpy.data.objects)
 
     print("Deletion complete!")
-
-    
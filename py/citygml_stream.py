@@ -0,0 +1,305 @@
+import json
+import math
+import os
+import shutil
+import xml.etree.ElementTree as ET
+
+
+# Thematic surfaces that are carried over as CityJSON semantic surfaces
+CITYGML_SEMANTIC_SURFACES = (
+    "RoofSurface",
+    "WallSurface",
+    "GroundSurface",
+    "ClosureSurface",
+    "OuterCeilingSurface",
+    "OuterFloorSurface"
+)
+
+# Simple building attributes that are copied to the CityJSON "attributes" object, with their type
+CITYGML_BUILDING_ATTRIBUTES = {
+    "function": str,
+    "usage": str,
+    "class": str,
+    "roofType": str,
+    "name": str,
+    "measuredHeight": float,
+    "storeysAboveGround": int,
+    "storeysBelowGround": int,
+    "yearOfConstruction": int
+}
+
+# Generic attributes (gen:*Attribute) and the type of their value
+CITYGML_GENERIC_ATTRIBUTES = {
+    "stringAttribute": str,
+    "intAttribute": int,
+    "doubleAttribute": float
+}
+
+CITYJSON_SCALE = 0.001
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_value(text, value_type):
+    try:
+        return value_type(float(text)) if value_type is int else value_type(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def convert_gml_native(gml_path, output_path):
+    """
+    Converts a LoD2 CityGML tile to CityJSON without citygml-tools.
+    The GML is parsed incrementally; every Building/BuildingPart is written to the output as soon as
+    its closing tag is read and then dropped from the XML tree.
+    Buildings with a lod2Solid get a Solid geometry like citygml-tools writes, built from the
+    boundedBy surfaces (with their semantics); polygons inlined in the lod2Solid are only added
+    if they do not repeat a boundedBy polygon. Buildings without a lod2Solid get a MultiSurface.
+    Vertices are quantized to millimetre integers and de-duplicated within each city object member
+    (a building with its parts). The vertices of a finished member are spooled to a file, so memory
+    depends on the largest building, not on the tile.
+    The output is written to a ".part" file and renamed when complete.
+    Returns the number of converted city objects.
+    """
+    # Vertex pool of the current city object member; base is the number of vertices spooled before it
+    vertex_index = {}
+    vertices = []
+    base = 0
+    translate = None
+
+    # Stack of the buildings / building parts that are currently open
+    objects = []
+    path = []
+    semantic_stack = []
+    lod2_depth = 0
+    solid_depth = 0
+    ring_coords = []
+    polygon_rings = None
+    polygon_id = None
+
+    written = 0
+    part_path = output_path + ".part"
+    spool_path = output_path + ".vertices.part"
+    out = open(part_path, "w", encoding="utf-8")
+    spool = open(spool_path, "w+", encoding="utf-8")
+
+    def add_vertex(x, y, z):
+        nonlocal translate
+        if translate is None:
+            translate = [math.floor(x), math.floor(y), 0.0]
+        key = (
+            int(round((x - translate[0]) / CITYJSON_SCALE)),
+            int(round((y - translate[1]) / CITYJSON_SCALE)),
+            int(round((z - translate[2]) / CITYJSON_SCALE))
+        )
+        index = vertex_index.get(key)
+        if index is None:
+            index = base + len(vertices)
+            vertex_index[key] = index
+            vertices.append(key)
+        return index
+
+    def flush_vertices():
+        nonlocal base
+        for vertex in vertices:
+            spool.write(f"{',' if base else ''}[{vertex[0]},{vertex[1]},{vertex[2]}]")
+            base += 1
+        vertices.clear()
+        vertex_index.clear()
+
+    def object_geometry(current):
+        boundaries = list(current["boundaries"])
+        semantics = list(current["semantics"])
+        # Solid polygons that repeat a boundedBy polygon (same gml:id or same exterior ring) are skipped
+        known_rings = {tuple(sorted(rings[0])) for rings in boundaries}
+        for solid_polygon_id, rings in current["solid"]:
+            if solid_polygon_id in current["polygon_ids"] or tuple(sorted(rings[0])) in known_rings:
+                continue
+            known_rings.add(tuple(sorted(rings[0])))
+            boundaries.append(rings)
+            semantics.append(None)
+        if not boundaries:
+            return None
+
+        surface_types = sorted({t for t in semantics if t is not None})
+        surface_index = {t: i for i, t in enumerate(surface_types)}
+        values = [surface_index.get(t) for t in semantics]
+        if current["has_solid"]:
+            # One exterior shell
+            return {
+                "type": "Solid",
+                "lod": "2",
+                "boundaries": [boundaries],
+                "semantics": {"surfaces": [{"type": t} for t in surface_types], "values": [values]}
+            }
+        return {
+            "type": "MultiSurface",
+            "lod": "2",
+            "boundaries": boundaries,
+            "semantics": {"surfaces": [{"type": t} for t in surface_types], "values": values}
+        }
+
+    def write_header():
+        transform = {"scale": [CITYJSON_SCALE] * 3, "translate": translate or [0.0, 0.0, 0.0]}
+        out.write('{"type":"CityJSON","version":"2.0",')
+        out.write(f'"transform":{json.dumps(transform)},')
+        out.write('"metadata":{"referenceSystem":"https://www.opengis.net/def/crs/EPSG/0/25832"},')
+        out.write('"CityObjects":{')
+
+    def write_object(object_id, city_object):
+        nonlocal written
+        # The header needs the translation, which is known once the first building has been read
+        if written == 0:
+            write_header()
+        else:
+            out.write(",")
+        out.write(json.dumps(object_id))
+        out.write(":")
+        out.write(json.dumps(city_object, separators=(",", ":")))
+        written += 1
+
+    try:
+        context = ET.iterparse(gml_path, events=("start", "end"))
+        root = None
+
+        for event, elem in context:
+            name = _local_name(elem.tag)
+
+            if event == "start":
+                if root is None:
+                    root = elem
+                path.append(name)
+
+                if name in ("Building", "BuildingPart"):
+                    objects.append({
+                        "id": elem.get("{http://www.opengis.net/gml}id") or f"{name}_{written + len(objects)}",
+                        "type": name,
+                        "attributes": {},
+                        "boundaries": [],
+                        "semantics": [],
+                        "polygon_ids": set(),
+                        "solid": [],
+                        "has_solid": False,
+                        "children": []
+                    })
+                elif name in CITYGML_SEMANTIC_SURFACES and objects:
+                    semantic_stack.append(name)
+                elif name.startswith("lod2"):
+                    lod2_depth += 1
+                    if name == "lod2Solid":
+                        solid_depth += 1
+                        if objects:
+                            objects[-1]["has_solid"] = True
+                elif name == "Polygon" and lod2_depth:
+                    polygon_rings = []
+                    polygon_id = elem.get("{http://www.opengis.net/gml}id")
+                elif name == "LinearRing":
+                    ring_coords = []
+                continue
+
+            # end event
+            path.pop()
+
+            if name == "posList" and polygon_rings is not None and elem.text:
+                values = [float(v) for v in elem.text.split()]
+                dim = int(elem.get("srsDimension", 3))
+                ring_coords.extend(values[i:i + 3] for i in range(0, len(values) - dim + 1, dim))
+            elif name == "pos" and polygon_rings is not None and elem.text:
+                ring_coords.append([float(v) for v in elem.text.split()[:3]])
+            elif name == "LinearRing" and polygon_rings is not None:
+                ring = []
+                for x, y, z in ring_coords:
+                    index = add_vertex(x, y, z)
+                    if not ring or ring[-1] != index:
+                        ring.append(index)
+                # CityJSON rings are implicitly closed
+                if len(ring) > 1 and ring[0] == ring[-1]:
+                    ring.pop()
+                if len(ring) >= 3:
+                    polygon_rings.append(ring)
+                elif not polygon_rings:
+                    # A degenerate exterior ring invalidates the whole polygon
+                    polygon_rings.append(None)
+            elif name == "Polygon" and polygon_rings is not None:
+                if polygon_rings and polygon_rings[0] is not None and objects:
+                    rings = [r for r in polygon_rings if r is not None]
+                    if solid_depth:
+                        objects[-1]["solid"].append((polygon_id, rings))
+                    else:
+                        objects[-1]["boundaries"].append(rings)
+                        objects[-1]["semantics"].append(semantic_stack[-1] if semantic_stack else None)
+                        if polygon_id:
+                            objects[-1]["polygon_ids"].add(polygon_id)
+                polygon_rings = None
+            elif name.startswith("lod2"):
+                lod2_depth -= 1
+                if name == "lod2Solid":
+                    solid_depth -= 1
+            elif name in CITYGML_SEMANTIC_SURFACES and semantic_stack:
+                semantic_stack.pop()
+            elif objects and path and path[-1] in ("Building", "BuildingPart") and name in CITYGML_BUILDING_ATTRIBUTES:
+                if elem.text and elem.text.strip():
+                    objects[-1]["attributes"][name] = _parse_value(elem.text.strip(), CITYGML_BUILDING_ATTRIBUTES[name])
+            elif objects and path and path[-1] in ("Building", "BuildingPart") and name in CITYGML_GENERIC_ATTRIBUTES:
+                value_elem = next((c for c in elem if _local_name(c.tag) == "value"), None)
+                if value_elem is not None and value_elem.text and elem.get("name"):
+                    objects[-1]["attributes"][elem.get("name")] = _parse_value(value_elem.text.strip(), CITYGML_GENERIC_ATTRIBUTES[name])
+            elif name in ("Building", "BuildingPart") and objects:
+                current = objects.pop()
+                city_object = {"type": current["type"], "attributes": current["attributes"], "geometry": []}
+                geometry = object_geometry(current)
+                if geometry is not None:
+                    city_object["geometry"].append(geometry)
+                if current["children"]:
+                    city_object["children"] = current["children"]
+                if objects:
+                    city_object["parents"] = [objects[-1]["id"]]
+                    objects[-1]["children"].append(current["id"])
+                write_object(current["id"], city_object)
+                if not objects:
+                    flush_vertices()
+
+            # Drop finished city object members from the tree to keep memory constant
+            if name == "cityObjectMember" and root is not None:
+                root.clear()
+
+        if written == 0:
+            write_header()
+
+        out.write('},"vertices":[')
+        spool.seek(0)
+        shutil.copyfileobj(spool, out)
+        out.write("]}")
+    except BaseException:
+        out.close()
+        spool.close()
+        os.remove(part_path)
+        os.remove(spool_path)
+        raise
+
+    out.close()
+    spool.close()
+    os.remove(spool_path)
+    os.replace(part_path, output_path)
+    return written
+
+
+def convert_gml_files_native(batch, output_dir):
+    """
+    Converts a list of (file_info, abs_input_file) pairs with convert_gml_native.
+    Returns the same result tuples as convert_gml_batch.
+    """
+    results = []
+    for file_info, abs_input_file in batch:
+        output_file = os.path.join(os.path.abspath(output_dir), f"{os.path.splitext(file_info['name'])[0]}.json")
+        with trace_span("convert", "convert", file=file_info["name"]) as span:
+            span["bytes"] = os.path.getsize(abs_input_file)
+            try:
+                convert_gml_native(abs_input_file, output_file)
+                results.append((file_info, abs_input_file, output_file, None))
+            except Exception as e:
+                span["failed"] = True
+                results.append((file_info, abs_input_file, None, f"Native conversion failed: {e}"))
+    return results
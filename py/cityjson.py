@@ -1,15 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-import os
-import shlex
+def move_atomic(src, dst):
+    """
+    Moves src to dst so that dst is either absent or complete, never half-written.
+    Falls back to copy + rename if src and dst are on different file systems.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst + ".part")
+        os.replace(dst + ".part", dst)
+        os.remove(src)
+
+
+def run_citygml_tools(gml_files, java_path, citygmltools_path):
+    """Runs a single 'citygml-tools to-cityjson' invocation for a list of GML files."""
+    # Set up environment for Java
+    env = os.environ.copy()
+    env["JAVA_HOME"] = java_path
+
+    return subprocess.run(
+        [citygmltools_path, "to-cityjson", *gml_files],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+
+def convert_gml_batch(batch, output_dir, java_path, citygmltools_path):
+    """
+    Converts a batch of (file_info, abs_input_file) pairs with one citygml-tools invocation,
+    so the JVM is started once per batch instead of once per file.
+    If the invocation fails, the files are converted one by one to find out which one failed.
+    Returns a list of (file_info, abs_input_file, output_file or None, error message or None).
+    """
+    produced_files = [os.path.splitext(abs_input_file)[0] + ".json" for _, abs_input_file in batch]
+
+    # Remove leftovers of an interrupted run, they may be half-written
+    for produced_file in produced_files:
+        if os.path.exists(produced_file):
+            os.remove(produced_file)
+
+    with trace_span("convert", "convert", file=", ".join(file_info["name"] for file_info, _ in batch)) as span:
+        span["files"] = len(batch)
+        span["bytes"] = sum(os.path.getsize(abs_input_file) for _, abs_input_file in batch)
+        try:
+            result = run_citygml_tools([abs_input_file for _, abs_input_file in batch], java_path, citygmltools_path)
+            error = None if result.returncode == 0 else f"STDERR:\n{result.stderr.strip()}\nSTDOUT:\n{result.stdout.strip()}"
+        except Exception as e:
+            error = f"Failed to run citygml-tools: {e}"
+        span["failed"] = error is not None
+
+    if error is not None and len(batch) > 1:
+        results = []
+        for item in batch:
+            results.extend(convert_gml_batch([item], output_dir, java_path, citygmltools_path))
+        return results
+
+    results = []
+    for (file_info, abs_input_file), produced_file in zip(batch, produced_files):
+        if error is None and os.path.exists(produced_file):
+            abs_output_file_move = os.path.join(os.path.abspath(output_dir), f"{os.path.splitext(file_info['name'])[0]}.json")
+            move_atomic(produced_file, abs_output_file_move)
+            results.append((file_info, abs_input_file, abs_output_file_move, None))
+        else:
+            if os.path.exists(produced_file):
+                os.remove(produced_file)
+            results.append((file_info, abs_input_file, None, error or "citygml-tools did not write an output file"))
+    return results
 
 
 def convert_to_cityjson(files, output_dir, java_path=JAVA_PATH, citygmltools_path=CITYGMLTOOLS_PATH):
     """
-    Converts a GML file to CityJSON using CityGMLTools.
-    Requires JAVA_PATH and CITYGMLTOOLS_PATH to be set.
+    Converts GML files to CityJSON using CityGMLTools, or with the built-in streaming converter
+    from citygml_stream.py if CITYJSON_CONVERTER is "native" (no Java needed).
+    For CityGMLTools, JAVA_PATH and CITYGMLTOOLS_PATH must be set.
+    Up to CITYGML_BATCH_SIZE files are passed to each citygml-tools invocation and
+    CITYGML_WORKERS invocations (default: number of CPUs) run in parallel.
+    The native converter runs the files one after the other on the calling thread: it is pure Python
+    and holds the GIL, so threads would not speed it up, and the exec-loaded scripts cannot be
+    sent to a process pool (in Blender, sys.executable is not a plain Python either).
+    file_info["local"] is only pointed to the CityJSON file if its conversion succeeded.
     """
 
+    pending = []
     for file_info in files:
         gml_file = file_info["local"]
         if gml_file is None:
@@ -17,47 +97,159 @@ def convert_to_cityjson(files, output_dir, java_path=JAVA_PATH, citygmltools_pat
             continue
 
         abs_input_file = os.path.abspath(gml_file)
-        abs_output_file = abs_input_file.replace(".gml", ".json")
-        abs_output_file_move = os.path.join(os.path.abspath(output_dir), f"{os.path.splitext(file_info['name'])[0]}.json")
 
-        # If output file exists and REPLACE_EXISTING_FILES is False, skip conversion
-        if os.path.exists(abs_output_file_move) and not REPLACE_EXISTING_FILES:
-            file_info["local"] = abs_output_file_move
-            print(f"Skipping conversion for existing file: {abs_output_file_move}")
+        # If the tile cache already holds a conversion of this GML and REPLACE_EXISTING_FILES is False, skip conversion
+        cached_json = cache_get_derived(abs_input_file, "cityjson")
+        if cached_json is not None and not REPLACE_EXISTING_FILES:
+            file_info["local"] = cached_json
+            print(f"Skipping conversion for existing file: {cached_json}")
             continue
 
-        # Set up environment for Java
-        env = os.environ.copy()
-        env["JAVA_HOME"] = java_path
+        pending.append((file_info, abs_input_file))
 
-        # Construct the command
-        cmd = f'"{citygmltools_path}" to-cityjson "{abs_input_file}"'
+    if not pending:
+        return files
 
-        print(f"\nRunning CityGMLTools for {file_info['name']}...")
+    if CITYJSON_CONVERTER == "native":
+        print(f"\nConverting {len(pending)} file(s) with the native converter (sequentially)...")
+        for item in pending:
+            report_conversion_results(convert_gml_files_native([item], output_dir))
+        return files
 
-        try:
-            result = subprocess.run(
-                shlex.split(cmd),
-                env=env,
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                print(f"Successfully converted {file_info['name']} to CityJSON")
-            else:
-                print(f"Conversion failed for {file_info['name']}")
-                print(f"STDERR:\n{result.stderr.strip()}")
-                print(f"STDOUT:\n{result.stdout.strip()}")
-        except Exception as e:
-            print(f"Failed to run citygml-tools: {e}")
-        finally:
-            print(f"Moving {abs_output_file} to {abs_output_file_move}...")
-            # Determine if the output file was created
-            if os.path.exists(abs_output_file):
-                try:
-                    os.replace(abs_output_file, abs_output_file_move)
-                    file_info["local"] = abs_output_file_move
-                except Exception as e:
-                    print(f"Failed to move file: {e}")
-
-    return files
\ No newline at end of file
+    workers = min(CITYGML_WORKERS or os.cpu_count() or 1, len(pending))
+    batch_size = max(1, min(CITYGML_BATCH_SIZE, -(-len(pending) // workers)))
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    print(f"\nRunning CityGMLTools for {len(pending)} file(s) in {len(batches)} batch(es) on {workers} worker(s)...")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(convert_gml_batch, batch, output_dir, java_path, citygmltools_path) for batch in batches]
+        for future in as_completed(futures):
+            report_conversion_results(future.result())
+
+    return files
+
+
+def report_conversion_results(results):
+    """Records successful conversions in the tile cache, updates file_info["local"] and prints the outcome per file."""
+    for file_info, abs_input_file, output_file, error in results:
+        if output_file is not None:
+            cache_record_derived(abs_input_file, output_file, "cityjson")
+            file_info["local"] = output_file
+            print(f"Successfully converted {file_info['name']} to CityJSON")
+        else:
+            print(f"Conversion failed for {file_info['name']}")
+            print(error)
+
+
+def _flatten_boundaries(boundaries, out):
+    for item in boundaries:
+        if isinstance(item, list):
+            _flatten_boundaries(item, out)
+        else:
+            out.append(item)
+    return out
+
+
+def _remap_boundaries(boundaries, index_map):
+    return [_remap_boundaries(item, index_map) if isinstance(item, list) else index_map[item] for item in boundaries]
+
+
+def clip_cityjson(input_path, output_path, min_x, min_y, max_x, max_y):
+    """
+    Writes a copy of a CityJSON file that only contains the city objects whose bounding box
+    touches the given UTM32 range (the same test delete_all_objects_outside_range does in Blender).
+    Parents of kept objects are kept as well; unused vertices are dropped and the indices renumbered.
+    Returns (kept objects, total objects).
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    transform = data.get("transform", {"scale": [1, 1, 1], "translate": [0, 0, 0]})
+    # Compare in the integer vertex space of the file instead of transforming every vertex
+    range_min = [(min_x - transform["translate"][0]) / transform["scale"][0], (min_y - transform["translate"][1]) / transform["scale"][1]]
+    range_max = [(max_x - transform["translate"][0]) / transform["scale"][0], (max_y - transform["translate"][1]) / transform["scale"][1]]
+    vertices = data.get("vertices", [])
+
+    city_objects = data.get("CityObjects", {})
+    kept = set()
+    for object_id, city_object in city_objects.items():
+        indices = []
+        for geometry in city_object.get("geometry", []):
+            _flatten_boundaries(geometry.get("boundaries", []), indices)
+        if not indices:
+            continue
+        xs = [vertices[i][0] for i in indices]
+        ys = [vertices[i][1] for i in indices]
+        if max(xs) < range_min[0] or min(xs) > range_max[0] or max(ys) < range_min[1] or min(ys) > range_max[1]:
+            continue
+        kept.add(object_id)
+
+    for object_id in list(kept):
+        parents = list(city_objects[object_id].get("parents", []))
+        while parents:
+            parent_id = parents.pop()
+            if parent_id in city_objects and parent_id not in kept:
+                kept.add(parent_id)
+                parents.extend(city_objects[parent_id].get("parents", []))
+
+    index_map = {}
+    clipped_vertices = []
+    clipped_objects = {}
+    for object_id, city_object in city_objects.items():
+        if object_id not in kept:
+            continue
+        for geometry in city_object.get("geometry", []):
+            for i in _flatten_boundaries(geometry.get("boundaries", []), []):
+                if i not in index_map:
+                    index_map[i] = len(clipped_vertices)
+                    clipped_vertices.append(vertices[i])
+            geometry["boundaries"] = _remap_boundaries(geometry.get("boundaries", []), index_map)
+        for relation in ("children", "parents"):
+            if relation in city_object:
+                city_object[relation] = [r for r in city_object[relation] if r in kept]
+        clipped_objects[object_id] = city_object
+
+    data["CityObjects"] = clipped_objects
+    data["vertices"] = clipped_vertices
+
+    with open(output_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(output_path + ".part", output_path)
+
+    return len(kept), len(city_objects)
+
+
+def clip_cityjson_files(files, min_x, min_y, max_x, max_y, output_dir, margin=10.0):
+    """
+    Clips CityJSON tiles to the requested UTM32 area (plus margin) before they are imported.
+    Clipped files are cached per tile and area in output_dir and recorded in the tile cache,
+    so a re-run over the same area reuses them. file_info["local"] is pointed to the clipped file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    bounds = (min(min_x, max_x) - margin, min(min_y, max_y) - margin, max(min_x, max_x) + margin, max(min_y, max_y) + margin)
+    area_key = hashlib.sha1(",".join(f"{v:.2f}" for v in bounds).encode("utf-8")).hexdigest()[:12]
+
+    for file_info in files:
+        json_file = file_info["local"]
+        if json_file is None or not json_file.endswith(".json"):
+            print(f"Skipping clipping for {file_info['name']} as it was not converted.")
+            continue
+
+        source_file = cache_find_source(json_file)
+        cached_clip = cache_get_derived(source_file, f"clipped_{area_key}") if source_file else None
+        if cached_clip is not None and not REPLACE_EXISTING_FILES:
+            file_info["local"] = cached_clip
+            continue
+
+        clipped_file = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(json_file))[0]}_{area_key}.json")
+        with trace_span("clip", "clip", file=file_info["name"]) as span:
+            kept, total = clip_cityjson(json_file, clipped_file, *bounds)
+            span.update(bytes=os.path.getsize(json_file), objects=kept)
+        print(f"Clipped {file_info['name']}: kept {kept} of {total} city objects")
+        if source_file:
+            cache_record_derived(source_file, clipped_file, f"clipped_{area_key}")
+        file_info["local"] = clipped_file
+
+    return files
@@ -0,0 +1,152 @@
+import json
+import os
+import bpy
+import numpy as np
+from mathutils.geometry import tessellate_polygon
+
+
+# Semantic surface types and the colour of the material they are imported with.
+# The position in this dict is the material slot index of the surface type.
+CITYJSON_SURFACE_MATERIALS = {
+    "WallSurface": (0.8, 0.8, 0.8, 1),
+    "RoofSurface": (0.7, 0.2, 0.2, 1),
+    "GroundSurface": (0.3, 0.3, 0.3, 1),
+    "ClosureSurface": (0.5, 0.5, 0.5, 1),
+    "OuterCeilingSurface": (0.6, 0.6, 0.6, 1),
+    "OuterFloorSurface": (0.6, 0.6, 0.6, 1),
+    "Unclassified": (0.6, 0.6, 0.6, 1)
+}
+CITYJSON_SURFACE_SLOTS = {surface_type: i for i, surface_type in enumerate(CITYJSON_SURFACE_MATERIALS)}
+
+
+def iter_cityjson_surfaces(geometry):
+    """Yields (surface, semantic value) for every surface of a CityJSON geometry, whatever its nesting."""
+    geometry_type = geometry["type"]
+    boundaries = geometry.get("boundaries", [])
+    values = (geometry.get("semantics") or {}).get("values")
+
+    if geometry_type in ("MultiSurface", "CompositeSurface"):
+        for i, surface in enumerate(boundaries):
+            yield surface, values[i] if values else None
+    elif geometry_type == "Solid":
+        for s, shell in enumerate(boundaries):
+            for i, surface in enumerate(shell):
+                yield surface, values[s][i] if values and values[s] else None
+    elif geometry_type in ("MultiSolid", "CompositeSolid"):
+        for d, solid in enumerate(boundaries):
+            for s, shell in enumerate(solid):
+                for i, surface in enumerate(shell):
+                    yield surface, values[d][s][i] if values and values[d] and values[d][s] else None
+
+
+def read_cityjson_faces(city_object, vertices):
+    """
+    Collects the faces of the highest LoD geometry of a city object.
+    Surfaces without holes become n-gons, surfaces with holes are triangulated.
+    Returns (face vertex indices, face sizes, material slot per face) as lists.
+    """
+    geometries = [g for g in city_object.get("geometry", []) if "boundaries" in g]
+    if not geometries:
+        return [], [], []
+    geometry = max(geometries, key=lambda g: str(g.get("lod", "")))
+    semantic_surfaces = (geometry.get("semantics") or {}).get("surfaces", [])
+
+    indices, sizes, slots = [], [], []
+    for surface, value in iter_cityjson_surfaces(geometry):
+        if not surface or len(surface[0]) < 3:
+            continue
+        surface_type = semantic_surfaces[value]["type"] if value is not None else "Unclassified"
+        slot = CITYJSON_SURFACE_SLOTS.get(surface_type, CITYJSON_SURFACE_SLOTS["Unclassified"])
+
+        if len(surface) == 1:
+            indices.extend(surface[0])
+            sizes.append(len(surface[0]))
+            slots.append(slot)
+            continue
+
+        # Polygon with holes, triangulate outer and inner rings together
+        ring_indices = [i for ring in surface for i in ring]
+        triangles = tessellate_polygon([vertices[ring].tolist() for ring in surface])
+        for triangle in triangles:
+            indices.extend(ring_indices[i] for i in triangle)
+            sizes.append(3)
+            slots.append(slot)
+
+    return indices, sizes, slots
+
+
+def get_surface_materials():
+    """Returns the materials for all semantic surface types in slot order, creating missing ones."""
+    materials = []
+    for surface_type, color in CITYJSON_SURFACE_MATERIALS.items():
+        material = bpy.data.materials.get(surface_type)
+        if material is None:
+            material = bpy.data.materials.new(name=surface_type)
+            material.diffuse_color = color
+        materials.append(material)
+    return materials
+
+
+def add_cityjson_object(name, vertices, indices, sizes, slots, collection, materials):
+    """Creates one mesh object from the faces of one or more city objects, keeping only the vertices it uses."""
+    used_vertices, local_indices = np.unique(np.asarray(indices, dtype=np.int64), return_inverse=True)
+    mesh = create_mesh_from_arrays(name, vertices[used_vertices], local_indices, sizes, slots)
+    for material in materials:
+        mesh.materials.append(material)
+
+    obj = bpy.data.objects.new(name, mesh)
+    collection.objects.link(obj)
+    return obj
+
+
+def import_cityjson_bulk(file_path, frame, mode="building", collection_name="LoD2"):
+    """
+    Imports a CityJSON file without the Up3date operator.
+    Vertices are transformed to scene coordinates with NumPy and the meshes are filled with foreach_set.
+    Semantic surface types are stored as material indices (see CITYJSON_SURFACE_MATERIALS).
+    No EMPTY objects are created.
+
+    Args:
+        file_path (str): Path of the CityJSON file.
+        frame (CoordinateFrame): Coordinate frame of the scene.
+        mode (str): "building" creates one object per city object, "tile" merges the whole file into one object.
+        collection_name (str): Collection the objects are linked to.
+    Returns the list of created objects.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    vertices = np.asarray(data.get("vertices", []), dtype=np.float64).reshape(-1, 3)
+    transform = data.get("transform")
+    if transform:
+        vertices = vertices * np.asarray(transform["scale"]) + np.asarray(transform["translate"])
+    vertices = frame.utm32_points_to_local(vertices)
+
+    collection = get_or_create_collection(collection_name)
+    materials = get_surface_materials()
+    created = []
+
+    if mode == "tile":
+        indices, sizes, slots = [], [], []
+        for city_object in data.get("CityObjects", {}).values():
+            object_indices, object_sizes, object_slots = read_cityjson_faces(city_object, vertices)
+            indices.extend(object_indices)
+            sizes.extend(object_sizes)
+            slots.extend(object_slots)
+        if sizes:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            created.append(add_cityjson_object(name, vertices, indices, sizes, slots, collection, materials))
+        return created
+
+    for object_id, city_object in data.get("CityObjects", {}).items():
+        indices, sizes, slots = read_cityjson_faces(city_object, vertices)
+        if not sizes:
+            continue
+        obj = add_cityjson_object(object_id, vertices, indices, sizes, slots, collection, materials)
+        obj["cityjson_type"] = city_object.get("type", "")
+        for key, value in (city_object.get("attributes") or {}).items():
+            if isinstance(value, (int, float, str)):
+                obj[key] = value
+        created.append(obj)
+
+    return created
@@ -1,7 +1,9 @@
 
 
 from pyproj import Transformer
+import numpy as np
 import os
+import threading
 
 
 def print_header(title: str):
@@ -13,62 +15,178 @@ def print_header(title: str):
     
     
     
+WGS84_CRS = "EPSG:4326"
+UTM32_CRS = "EPSG:25832"
+
+# Transformers are slow to create and must not be shared between threads, so they are cached per thread
+_transformers = threading.local()
+
+
+def get_transformer(source_crs, target_crs):
+    """Returns a cached pyproj Transformer (always_xy) from source_crs to target_crs for the calling thread."""
+    cache = getattr(_transformers, "cache", None)
+    if cache is None:
+        cache = _transformers.cache = {}
+    key = (source_crs, target_crs)
+    if key not in cache:
+        cache[key] = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+    return cache[key]
+
+
 def wgs84_to_utm32(lat, lon):
     """
     Convert WGS84 coordinates (latitude, longitude)
     to UTM zone 32N (EPSG:25832).
-    Returns (x, y) in meters.
+    Returns (x, y) in meters. lat and lon may be arrays.
     """
-    transformer = Transformer.from_crs("EPSG:4326", "EPSG:25832", always_xy=True)
-    x, y = transformer.transform(lon, lat)
+    x, y = get_transformer(WGS84_CRS, UTM32_CRS).transform(lon, lat)
     return x, y
 
 
+def wgs84_area_to_utm32(lat_from, lon_from, lat_to, lon_to):
+    """
+    Returns the UTM32 bounding box (min_x, min_y, max_x, max_y) of a WGS84 rectangle,
+    from its four corners transformed in one call.
+    """
+    x, y = wgs84_to_utm32(
+        np.array([lat_from, lat_from, lat_to, lat_to], dtype=np.float64),
+        np.array([lon_from, lon_to, lon_from, lon_to], dtype=np.float64)
+    )
+    return float(x.min()), float(y.min()), float(x.max()), float(y.max())
+
+
+class CoordinateFrame:
+    """
+    The coordinate frames of a scene: WGS84 (latitude/longitude), UTM32 (EPSG:25832) and
+    scene-local coordinates, which are UTM32 minus the UTM32 position of the scene origin.
+    All importers get the frame of the scene instead of separate origin values.
+
+    The transforms take scalars or arrays and compute in float64. Local coordinates are returned
+    as float32 by default, the precision Blender stores vertices in; pass dtype=np.float64 for
+    values that are compared with other coordinates, like area bounds.
+    """
+
+    def __init__(self, origin_x=0.0, origin_y=0.0, origin_lat=None, origin_lon=None):
+        self.crs = UTM32_CRS
+        self.origin_x = float(origin_x)
+        self.origin_y = float(origin_y)
+        if origin_lat is None or origin_lon is None:
+            origin_lat, origin_lon = self.utm32_to_wgs84(self.origin_x, self.origin_y)
+        self.origin_lat = float(origin_lat)
+        self.origin_lon = float(origin_lon)
+
+    @classmethod
+    def from_wgs84(cls, lat, lon):
+        """Returns the frame with its origin at the given WGS84 position."""
+        x, y = wgs84_to_utm32(lat, lon)
+        return cls(x, y, lat, lon)
+
+    def __repr__(self):
+        return f"CoordinateFrame(origin UTM32 X={self.origin_x:.2f}, Y={self.origin_y:.2f})"
+
+    def wgs84_to_utm32(self, lat, lon):
+        return wgs84_to_utm32(lat, lon)
+
+    def utm32_to_wgs84(self, x, y):
+        """Returns (lat, lon)."""
+        lon, lat = get_transformer(UTM32_CRS, WGS84_CRS).transform(x, y)
+        return lat, lon
+
+    def utm32_to_local(self, x, y, dtype=np.float32):
+        local_x = np.asarray(x, dtype=np.float64) - self.origin_x
+        local_y = np.asarray(y, dtype=np.float64) - self.origin_y
+        return local_x.astype(dtype, copy=False), local_y.astype(dtype, copy=False)
+
+    def local_to_utm32(self, x, y):
+        return np.asarray(x, dtype=np.float64) + self.origin_x, np.asarray(y, dtype=np.float64) + self.origin_y
+
+    def wgs84_to_local(self, lat, lon, dtype=np.float32):
+        return self.utm32_to_local(*self.wgs84_to_utm32(lat, lon), dtype=dtype)
+
+    def local_to_wgs84(self, x, y):
+        return self.utm32_to_wgs84(*self.local_to_utm32(x, y))
+
+    def utm32_points_to_local(self, points, dtype=np.float32):
+        """Returns a copy of (n, 2) or (n, 3) UTM32 points in local coordinates; further columns are kept."""
+        points = np.array(points, dtype=np.float64)
+        points[:, 0] -= self.origin_x
+        points[:, 1] -= self.origin_y
+        return points.astype(dtype, copy=False)
+
+    def utm32_bbox_to_local(self, bbox):
+        """Returns a UTM32 bounding box (min_x, min_y, max_x, max_y) in local coordinates, as floats."""
+        min_x, min_y, max_x, max_y = bbox
+        return min_x - self.origin_x, min_y - self.origin_y, max_x - self.origin_x, max_y - self.origin_y
+
+
 def setup_structure(base_dir):
     """
     Creates a folder structure:
     temp/
+        tile_cache.sqlite
+        metalink/
         LoD2/
             gml/
             json/
+            clipped/
         DGM1/
         tree/
+            cache/
         DGM5/
     """
     # Define folder paths
     lod2_dir = os.path.join(base_dir, "LoD2")
     lod2_gml_dir = os.path.join(lod2_dir, "gml")
     lod2_json_dir = os.path.join(lod2_dir, "json")
+    lod2_clipped_dir = os.path.join(lod2_dir, "clipped")
     dgm1_dir = os.path.join(base_dir, "DGM1")
     tree_dir = os.path.join(base_dir, "tree")
+    tree_cache_dir = os.path.join(tree_dir, "cache")
     dgm5_dir = os.path.join(base_dir, "DGM5")
+    metalink_dir = os.path.join(base_dir, "metalink")
 
     # Create all directories if they don't exist
-    for folder in [lod2_dir, lod2_gml_dir, lod2_json_dir, dgm1_dir, tree_dir, dgm5_dir]:
+    for folder in [lod2_dir, lod2_gml_dir, lod2_json_dir, lod2_clipped_dir, dgm1_dir, tree_dir, tree_cache_dir, dgm5_dir, metalink_dir]:
         os.makedirs(folder, exist_ok=True)
 
     return {
         "base": base_dir,
+        "manifest": os.path.join(base_dir, "tile_cache.sqlite"),
+        "metalink": metalink_dir,
         "lod2_gml": lod2_gml_dir,
         "lod2_json": lod2_json_dir,
+        "lod2_clipped": lod2_clipped_dir,
         "dgm1": dgm1_dir,
         "tree": tree_dir,
+        "tree_cache": tree_cache_dir,
         "dgm5": dgm5_dir
     }
 
 def extract_ascii_grids(dgm5_files, output_dir):
     """
     Extract ASCII grid files from downloaded DGM5 ZIP files.
+    Grids already extracted from the same ZIP are looked up in the tile cache instead.
     """
     import zipfile
 
     for file_info in dgm5_files:
         local_path = file_info.get("local")
         if local_path and local_path.endswith(".zip"):
+            cached_ascii_path = cache_get_derived(local_path, "ascii_grid")
+            if cached_ascii_path is not None:
+                print(f"Skipping extraction for existing file: {cached_ascii_path}")
+                file_info["local"] = cached_ascii_path
+                continue
+
             with zipfile.ZipFile(local_path, 'r') as zip_ref:
                 zip_ref.extractall(output_dir)
                 print(f"Extracted {local_path} to {output_dir}")
                 dgm_ascii_path = os.path.join(output_dir, file_info["name"].replace(".zip", ".txt"))
+                for member in zip_ref.namelist():
+                    member_path = os.path.join(output_dir, member)
+                    if os.path.isfile(member_path):
+                        member_kind = "ascii_grid" if member_path == dgm_ascii_path else "extracted"
+                        cache_record_derived(local_path, member_path, member_kind)
                 file_info["local"] = dgm_ascii_path  # Update path to point to extracted ASCII grid
 
     return dgm5_files
\ No newline at end of file
@@ -0,0 +1,385 @@
+import bisect
+import re
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+import shapely
+
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# B-tree page types of the SQLite file format
+SQLITE_INTERIOR_TABLE_PAGE = 0x05
+SQLITE_LEAF_TABLE_PAGE = 0x0D
+
+
+class RemoteFile:
+    """
+    Read-only random access to a file on an HTTP server that supports Range requests.
+    Reads are served from a cache of fixed-size blocks (least recently used blocks are dropped);
+    missing blocks that are next to each other are fetched with a single Range request,
+    and prefetch() fetches many separate ranges in parallel.
+    """
+
+    def __init__(self, url, block_size=REMOTE_GPKG_BLOCK_SIZE, cache_blocks=REMOTE_GPKG_CACHE_BLOCKS):
+        self.url = url
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.blocks = OrderedDict()
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.session, self.semaphore = get_host_session(url)
+        self.max_connections = host_limit(url)
+
+        with self.semaphore:
+            response = self.session.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        if response.headers.get("Accept-Ranges", "").lower() == "none":
+            raise ValueError(f"{url} does not support Range requests.")
+        self.size = int(response.headers["Content-Length"])
+        # Identifies the version of the remote file, used as part of cache keys
+        self.version = response.headers.get("ETag") or response.headers.get("Last-Modified") or ""
+
+    def _fetch(self, first_block, last_block):
+        start = first_block * self.block_size
+        end = min((last_block + 1) * self.block_size, self.size) - 1
+        with self.semaphore:
+            response = self.session.get(self.url, headers={"Range": f"bytes={start}-{end}"}, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise ValueError(f"{self.url} ignored the Range request (HTTP {response.status_code}).")
+        return first_block, last_block, response.content
+
+    def _store(self, first_block, last_block, data):
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        for block in range(first_block, last_block + 1):
+            offset = (block - first_block) * self.block_size
+            self.blocks[block] = data[offset:offset + self.block_size]
+        while len(self.blocks) > self.cache_blocks:
+            self.blocks.popitem(last=False)
+
+    def _missing_runs(self, blocks):
+        """Groups the blocks that are not cached into runs of consecutive blocks."""
+        runs = []
+        for block in sorted(set(blocks)):
+            if block in self.blocks:
+                continue
+            if runs and runs[-1][1] == block - 1:
+                runs[-1][1] = block
+            else:
+                runs.append([block, block])
+        return runs
+
+    def _blocks(self, offset, length):
+        return range(offset // self.block_size, (offset + length - 1) // self.block_size + 1)
+
+    def prefetch(self, ranges):
+        """Fetches the blocks of many (offset, length) ranges at once, in parallel requests."""
+        runs = self._missing_runs([b for offset, length in ranges for b in self._blocks(offset, length)])
+        if len(runs) <= 1:
+            for first_block, last_block in runs:
+                self._store(*self._fetch(first_block, last_block))
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_connections, len(runs))) as pool:
+            for result in pool.map(lambda run: self._fetch(*run), runs):
+                self._store(*result)
+
+    def read(self, offset, length):
+        """Returns length bytes starting at offset."""
+        blocks = self._blocks(offset, length)
+        for first_block, last_block in self._missing_runs(blocks):
+            self._store(*self._fetch(first_block, last_block))
+        first_block = blocks[0]
+        last_block = blocks[-1]
+
+        chunks = []
+        for block in range(first_block, last_block + 1):
+            self.blocks.move_to_end(block)
+            chunks.append(self.blocks[block])
+        data = b"".join(chunks)
+        start = offset - first_block * self.block_size
+        return data[start:start + length]
+
+
+def _read_varint(buf, pos):
+    """Decodes a SQLite varint at pos, returns (value, position after it)."""
+    value = 0
+    for i in range(8):
+        byte = buf[pos + i]
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos + i + 1
+    return (value << 8) | buf[pos + 8], pos + 9
+
+
+def _parse_record(payload):
+    """Decodes a SQLite record into a list of Python values."""
+    header_size, pos = _read_varint(payload, 0)
+    serial_types = []
+    while pos < header_size:
+        serial_type, pos = _read_varint(payload, pos)
+        serial_types.append(serial_type)
+
+    values = []
+    pos = header_size
+    for serial_type in serial_types:
+        if serial_type == 0:
+            values.append(None)
+        elif 1 <= serial_type <= 6:
+            size = (1, 2, 3, 4, 6, 8)[serial_type - 1]
+            values.append(int.from_bytes(payload[pos:pos + size], "big", signed=True))
+            pos += size
+        elif serial_type == 7:
+            values.append(struct.unpack(">d", payload[pos:pos + 8])[0])
+            pos += 8
+        elif serial_type in (8, 9):
+            values.append(serial_type - 8)
+        else:
+            size = (serial_type - 12) // 2 if serial_type % 2 == 0 else (serial_type - 13) // 2
+            value = payload[pos:pos + size]
+            values.append(bytes(value) if serial_type % 2 == 0 else value.decode("utf-8"))
+            pos += size
+    return values
+
+
+def parse_create_table_columns(sql):
+    """Returns the column names of a CREATE TABLE statement, in storage order."""
+    body = sql[sql.index("(") + 1:sql.rindex(")")]
+    parts, depth, current = [], 0, ""
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+
+    columns = []
+    for part in parts:
+        part = part.strip()
+        if re.match(r"(CONSTRAINT|PRIMARY\s+KEY|UNIQUE|CHECK|FOREIGN\s+KEY)\b", part, re.IGNORECASE):
+            continue
+        match = re.match(r'"((?:[^"]|"")+)"|`([^`]+)`|\[([^\]]+)\]|(\S+)', part)
+        name = next(g for g in match.groups() if g is not None)
+        columns.append((name.replace('""', '"'), part))
+    return columns
+
+
+def gpkg_geometry_to_wkb(blob):
+    """Strips the GeoPackage binary header from a geometry blob and returns the plain WKB."""
+    if blob is None or blob[:2] != b"GP":
+        return None
+    flags = blob[3]
+    envelope_size = (0, 32, 48, 48, 64)[(flags >> 1) & 0x07]
+    return blob[8 + envelope_size:]
+
+
+class RemoteGeoPackage:
+    """
+    Reads features of a GeoPackage on an HTTP server without downloading it.
+    The SQLite file is parsed directly: table B-trees are searched by rowid and the
+    GeoPackage R-tree index is traversed with the bbox, so only the pages that lead to
+    the requested features are fetched (through the block cache of RemoteFile).
+    """
+
+    def __init__(self, url):
+        self.file = RemoteFile(url)
+        header = self.file.read(0, 100)
+        if header[:16] != SQLITE_MAGIC:
+            raise ValueError(f"{url} is not a SQLite database.")
+        self.page_size = struct.unpack(">H", header[16:18])[0]
+        if self.page_size == 1:
+            self.page_size = 65536
+        self.usable_size = self.page_size - header[20]
+
+        self.schema = {}
+        for _, row in self.table_rows(1):
+            object_type, name, _, root_page, sql = row[:5]
+            self.schema[name] = {"type": object_type, "root": root_page, "sql": sql}
+
+    def read_page(self, page_number):
+        return self.file.read((page_number - 1) * self.page_size, self.page_size)
+
+    def _cell_payload(self, page, pos, payload_size):
+        """Returns the payload of a leaf cell, following overflow pages if needed."""
+        usable = self.usable_size
+        max_local = usable - 35
+        if payload_size <= max_local:
+            return page[pos:pos + payload_size]
+
+        min_local = ((usable - 12) * 32 // 255) - 23
+        local = min_local + ((payload_size - min_local) % (usable - 4))
+        if local > max_local:
+            local = min_local
+
+        chunks = [page[pos:pos + local]]
+        remaining = payload_size - local
+        overflow_page = struct.unpack(">I", page[pos + local:pos + local + 4])[0]
+        while remaining > 0 and overflow_page:
+            data = self.read_page(overflow_page)
+            chunk = data[4:4 + min(remaining, usable - 4)]
+            chunks.append(chunk)
+            remaining -= len(chunk)
+            overflow_page = struct.unpack(">I", data[:4])[0]
+        return b"".join(chunks)
+
+    def table_rows(self, root_page, rowids=None):
+        """
+        Yields (rowid, values) of a table B-tree. If rowids (sorted) are given, only the
+        subtrees that can contain them are visited and only those rows are returned.
+        The tree is walked level by level and the pages of each level are prefetched together.
+        """
+        level = [(root_page, rowids)]
+        while level:
+            self.file.prefetch([((page_number - 1) * self.page_size, self.page_size) for page_number, _ in level])
+            next_level = []
+            for page_number, wanted in level:
+                yield from self._visit_table_page(page_number, wanted, next_level)
+            level = next_level
+
+    def _visit_table_page(self, page_number, wanted, next_level):
+        """Yields the wanted rows of a leaf page, or adds the children of an interior page to next_level."""
+        page = self.read_page(page_number)
+        offset = 100 if page_number == 1 else 0
+        page_type = page[offset]
+        cell_count = struct.unpack(">H", page[offset + 3:offset + 5])[0]
+
+        if page_type == SQLITE_LEAF_TABLE_PAGE:
+            pointers = struct.unpack(f">{cell_count}H", page[offset + 8:offset + 8 + 2 * cell_count])
+            wanted_set = set(wanted) if wanted is not None else None
+            for pointer in pointers:
+                payload_size, pos = _read_varint(page, pointer)
+                rowid, pos = _read_varint(page, pos)
+                if wanted_set is not None and rowid not in wanted_set:
+                    continue
+                yield rowid, _parse_record(self._cell_payload(page, pos, payload_size))
+
+        elif page_type == SQLITE_INTERIOR_TABLE_PAGE:
+            right_most = struct.unpack(">I", page[offset + 8:offset + 12])[0]
+            pointers = struct.unpack(f">{cell_count}H", page[offset + 12:offset + 12 + 2 * cell_count])
+            children = []
+            low = 0
+            for pointer in pointers:
+                child = struct.unpack(">I", page[pointer:pointer + 4])[0]
+                key, _ = _read_varint(page, pointer + 4)
+                # The left child holds all rowids <= key
+                if wanted is None:
+                    children.append((child, None))
+                else:
+                    high = bisect.bisect_right(wanted, key)
+                    if high > low:
+                        children.append((child, wanted[low:high]))
+                    low = high
+            if wanted is None:
+                children.append((right_most, None))
+            elif low < len(wanted):
+                children.append((right_most, wanted[low:]))
+            next_level.extend(children)
+
+        else:
+            raise ValueError(f"Unexpected page type {page_type} on page {page_number}.")
+
+    def table_columns(self, table):
+        return parse_create_table_columns(self.schema[table]["sql"])
+
+    def geometry_columns(self):
+        """Returns {feature table: geometry column} from gpkg_geometry_columns."""
+        columns = [name for name, _ in self.table_columns("gpkg_geometry_columns")]
+        result = {}
+        for _, row in self.table_rows(self.schema["gpkg_geometry_columns"]["root"]):
+            values = dict(zip(columns, row))
+            result[values["table_name"]] = values["column_name"]
+        return result
+
+    def rtree_query(self, table, geometry_column, bbox):
+        """Returns the sorted rowids of the features whose R-tree box intersects bbox (min_x, min_y, max_x, max_y)."""
+        node_table = self.schema[f"rtree_{table}_{geometry_column}_node"]["root"]
+        min_x, min_y, max_x, max_y = bbox
+
+        # The R-tree is read level by level, so the nodes of a level are fetched together
+        level_nodes = [1]
+        depth = None
+        level = 0
+        rowids = []
+        while level_nodes:
+            next_nodes = []
+            for _, (_, data) in self.table_rows(node_table, sorted(level_nodes)):
+                if depth is None:
+                    depth = struct.unpack(">H", data[:2])[0]
+                count = struct.unpack(">H", data[2:4])[0]
+                cells = np.frombuffer(data, dtype=[("id", ">i8"), ("box", ">f4", 4)], count=count, offset=4)
+                box = cells["box"]
+                hit = (box[:, 0] <= max_x) & (box[:, 1] >= min_x) & (box[:, 2] <= max_y) & (box[:, 3] >= min_y)
+                ids = cells["id"][hit].tolist()
+                if level == depth:
+                    rowids.extend(ids)
+                else:
+                    next_nodes.extend(ids)
+            level_nodes = next_nodes
+            level += 1
+        return sorted(rowids)
+
+    def read_features(self, table, bbox, columns):
+        """
+        Returns (geometries as shapely array, {column: values}) of the features of table inside bbox.
+        Features are selected with the R-tree and then by their exact envelope.
+        """
+        geometry_column = self.geometry_columns()[table]
+        table_columns = self.table_columns(table)
+        names = [name for name, _ in table_columns]
+        # An INTEGER PRIMARY KEY column is stored as NULL, its value is the rowid
+        rowid_column = next((name for name, definition in table_columns
+                             if re.search(r"\bINTEGER\s+PRIMARY\s+KEY\b", definition, re.IGNORECASE)), None)
+
+        rowids = self.rtree_query(table, geometry_column, bbox)
+        wkb = []
+        values = {column: [] for column in columns}
+        for rowid, row in self.table_rows(self.schema[table]["root"], rowids):
+            record = dict(zip(names, row + [None] * (len(names) - len(row))))
+            if rowid_column:
+                record[rowid_column] = rowid
+            wkb.append(gpkg_geometry_to_wkb(record[geometry_column]))
+            for column in columns:
+                values[column].append(record[column])
+
+        geometries = shapely.from_wkb(np.array(wkb, dtype=object))
+        inside = shapely.intersects(geometries, shapely.box(*bbox))
+        return geometries[inside], {column: np.asarray(v, dtype=np.float64)[inside] for column, v in values.items()}
+
+
+def read_remote_tree_layers(gpkg, bbox):
+    """
+    Reads the trees inside bbox from all layers of a RemoteGeoPackage.
+    Returns {layer name: tree point arrays} like load_tree_layers and prints the transferred volume.
+    """
+    start = time.perf_counter()
+    layers = list(gpkg.geometry_columns())
+    print("Layers found in remote GeoPackage:", layers)
+
+    result = {}
+    for layer in layers:
+        geometries, values = gpkg.read_features(layer, bbox, ["baumhoehe", "dgmhoehe"])
+        is_multipoint = shapely.get_type_id(geometries) == shapely.GeometryType.MULTIPOINT
+        geometries = geometries[is_multipoint]
+        counts = shapely.get_num_geometries(geometries)
+        coordinates = shapely.get_coordinates(geometries)
+        result[layer] = {
+            "x": coordinates[:, 0],
+            "y": coordinates[:, 1],
+            "dgm_height": np.repeat(values["dgmhoehe"][is_multipoint], counts),
+            "height": np.repeat(values["baumhoehe"][is_multipoint], counts)
+        }
+        print(f"Read {len(geometries)} features from layer {layer}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Fetched {gpkg.file.bytes_fetched / 1024**2:.1f} MB of {gpkg.file.size / 1024**2:.1f} MB "
+          f"in {gpkg.file.requests} requests ({elapsed:.1f} s)")
+    return result
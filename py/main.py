@@ -14,22 +14,7 @@ if __name__ == "__main__":
 
     if USE_CONFIGURATION_FILE:
         print("Loading configuration from file...")
-        with open(CONFIGURATION_FILEPATH, 'r') as config_file:
-            config = json.load(config_file)
-
-            PROJECT_NAME = config["meta"]["title"]
-            LATITUDE_FROM = config["area"]["ne"]["lat"]
-            LONGITUDE_FROM = config["area"]["ne"]["lng"]
-            LATITUDE_TO = config["area"]["sw"]["lat"]
-            LONGITUDE_TO = config["area"]["sw"]["lng"]
-            LATITUDE_SCENE_ORIGIN = config["origin"]["lat"]
-            LONGITUDE_SCENE_ORIGIN = config["origin"]["lng"]
-            IMPORT_TERRAIN = config["import"]["terrain"]
-            IMPORT_BUILDINGS = config["import"]["buildings"]
-            IMPORT_TREES = config["import"]["trees"]
-            TERRAIN_HIGH_RESOLUTION = False
-            REPLACE_EXISTING_FILES = config["import"]["replaceExistingFiles"]
-            CLEAN_BLENDER = config["import"]["cleanBlender"]
+        globals().update(read_configuration(CONFIGURATION_FILEPATH))
 
     print("Configuration:")
     print(f"  Project Name: {PROJECT_NAME}")
@@ -42,150 +27,125 @@ if __name__ == "__main__":
     print(f"  Clean Blender: {CLEAN_BLENDER}")
 
     print_header("RUNNING IMPORTER (PHASE 0: SETUP)...")
+    start_trace()
+    trace_phase("Phase 0: setup")
     
     print("Initializing folder structure...")
     dirs = setup_structure(TMP_PATH)
     print(dirs)
-    
+    open_tile_cache(dirs["manifest"])
+
+    # Output files are written next to the template, taken before a "fresh" clean_scene clears the file path
+    template_dir = os.path.dirname(bpy.data.filepath)
+
     if CLEAN_BLENDER:
         print("Cleaning blender-scene...")
         clean_scene()
         
     
     print_header("RUNNING IMPORTER (PHASE I: DOWNLOAD FILES)...")
+    trace_phase("Phase I: download files")
 
-    print("Downloading metalink files...")
-    EWKT_STR = f"SRID=4326;POLYGON(({LONGITUDE_FROM} {LATITUDE_FROM},{LONGITUDE_FROM} {LATITUDE_TO},{LONGITUDE_TO} {LATITUDE_TO},{LONGITUDE_TO} {LATITUDE_FROM},{LONGITUDE_FROM} {LATITUDE_FROM}))"
-    if IMPORT_BUILDINGS:
-        lod2_metalink_file = download_metalink(DOWNLOAD_LINKS["lod2"], EWKT_STR, dirs["base"], "lod2", PROJECT_NAME)
-    if IMPORT_TERRAIN and TERRAIN_HIGH_RESOLUTION:
-        dgm1_metalink_file = download_metalink(DOWNLOAD_LINKS["dgm1"], EWKT_STR, dirs["base"], "dgm1", PROJECT_NAME)
-    if IMPORT_TERRAIN and not TERRAIN_HIGH_RESOLUTION:
-        dgm5_metalink_file = download_metalink(DOWNLOAD_LINKS["dgm5"], EWKT_STR, dirs["base"], "dgm5", PROJECT_NAME)
-
-    print("Parsing metalink files...")
-    if IMPORT_BUILDINGS:
-        lod2_files = parse_metalink(lod2_metalink_file)
-        print("LoD2 Files:")
-        for file_info in lod2_files:
-            print(f"  {file_info['name']}: {file_info['url']}")
-    if IMPORT_TERRAIN and TERRAIN_HIGH_RESOLUTION:
-        dgm1_files = parse_metalink(dgm1_metalink_file)
-        print("DGM1 Files:")
-        for file_info in dgm1_files:
-            print(f"  {file_info['name']}: {file_info['url']}")
-    if IMPORT_TERRAIN and not TERRAIN_HIGH_RESOLUTION:
-        dgm5_files = parse_metalink(dgm5_metalink_file)
-        print("DGM5 Files:")
-        for file_info in dgm5_files:
-            print(f"  {file_info['name']}: {file_info['url']}")
-    if IMPORT_TREES:
-        tree_files = gen_tree_download_list(DOWNLOAD_LINK_TREES)
-        print("GEOPACKAGE Files:")
-        for file_info in tree_files:
-            print(f"  {file_info['name']}: {file_info['url']}")
-
-    print("Downloading files...")
-    if IMPORT_BUILDINGS:
-        lod2_files = download_meta_files(lod2_files, dirs["lod2_gml"])
-    if IMPORT_TERRAIN and TERRAIN_HIGH_RESOLUTION:
-        dgm1_files = download_meta_files(dgm1_files, dirs["dgm1"])
-    if IMPORT_TERRAIN and not TERRAIN_HIGH_RESOLUTION:
-        dgm5_files = download_meta_files(dgm5_files, dirs["dgm5"])
-        dgm5_files = extract_ascii_grids(dgm5_files, dirs["dgm5"])
-    if IMPORT_TREES:
-        tree_files = download_meta_files(tree_files, dirs["tree"])
-
-    print("\nSummary of downloaded files:")
-    if IMPORT_BUILDINGS:
-        print("LoD2 Files:")
-        for file_info in lod2_files:
-            if file_info["local"]:
-                print(f"  {file_info['name']}: {file_info['local']}")
-    if IMPORT_TERRAIN and TERRAIN_HIGH_RESOLUTION:
-        print("DGM1 Files:")
-        for file_info in dgm1_files:
-            if file_info["local"]:
-                print(f"  {file_info['name']}: {file_info['local']}")
-    if IMPORT_TERRAIN and not TERRAIN_HIGH_RESOLUTION:
-        print("DGM5 Files:")
-        for file_info in dgm5_files:
-            if file_info["local"]:
-                print(f"  {file_info['name']}: {file_info['local']}")
-    if IMPORT_TREES:
-        print("GEOPACKAGE Files:")
-        for file_info in tree_files:
-            if file_info["local"]:
-                print(f"  {file_info['name']}: {file_info['local']}")
-
-    print("All downloads completed.")
-    
-    if IMPORT_BUILDINGS:
-        print("Converting LoD2 GML files to CityJSON...")
-        lod2_files = convert_to_cityjson(lod2_files, dirs["lod2_json"])
+    if PIPELINED_IMPORT:
+        # Downloads and conversions run together with the building import in phase III
+        project_files = resolve_project_tiles(
+            dirs, LATITUDE_FROM, LONGITUDE_FROM, LATITUDE_TO, LONGITUDE_TO,
+            IMPORT_TERRAIN, IMPORT_BUILDINGS, IMPORT_TREES, TERRAIN_HIGH_RESOLUTION
+        )
+    else:
+        project_files = prefetch_project(
+            dirs, LATITUDE_FROM, LONGITUDE_FROM, LATITUDE_TO, LONGITUDE_TO,
+            IMPORT_TERRAIN, IMPORT_BUILDINGS, IMPORT_TREES, TERRAIN_HIGH_RESOLUTION
+        )
+    lod2_files = project_files["lod2"]
+    dgm1_files = project_files["dgm1"]
+    dgm5_files = project_files["dgm5"]
+    tree_files = project_files["tree"]
     
     
     print_header("RUNNING IMPORTER (PHASE II: SETUP SCENE)...")
+    trace_phase("Phase II: setup scene")
 
-    origin_utm32_x, origin_utm32_y = wgs84_to_utm32(LATITUDE_SCENE_ORIGIN, LONGITUDE_SCENE_ORIGIN)
-    print(f"Origin in UTM32: X={origin_utm32_x:.2f}, Y={origin_utm32_y:.2f}")
+    frame = CoordinateFrame.from_wgs84(LATITUDE_SCENE_ORIGIN, LONGITUDE_SCENE_ORIGIN)
+    print(f"Origin in UTM32: X={frame.origin_x:.2f}, Y={frame.origin_y:.2f}")
     
-    min_x, min_y = wgs84_to_utm32(LATITUDE_FROM, LONGITUDE_FROM)
-    max_x, max_y = wgs84_to_utm32(LATITUDE_TO, LONGITUDE_TO)
+    area_bbox = project_files["area_bbox"]
 
-    setup_blender_gis("EPSG:25832", LONGITUDE_SCENE_ORIGIN, LONGITUDE_SCENE_ORIGIN, origin_utm32_x, origin_utm32_y)
-    setup_city_json(origin_utm32_x, origin_utm32_y)
+    setup_blender_gis(frame)
+    setup_city_json(frame)
 
     print_header("RUNNING IMPORTER (PHASE III: LOAD BUILDINGS)...")
+    trace_phase("Phase III: load buildings")
     
+    if PIPELINED_IMPORT:
+        # Up3date's EMPTY objects are removed once after the stream, not once per tile
+        objs_before = set(bpy.data.objects)
+
+        def import_tile(dataset, file_info):
+            if dataset == "lod2":
+                batch_import_cityjson([file_info], frame, remove_empties=False)
+
+        stream_project_tiles(dirs, project_files, import_tile)
+        if IMPORT_BUILDINGS and lod2_files and CITYJSON_IMPORTER != "builtin":
+            remove_cityjson_empties(objs_before, f"{len(lod2_files)} file(s)")
+        enforce_cache_budget(CACHE_DISK_BUDGET_GB * 1024**3 if CACHE_DISK_BUDGET_GB else None,
+                             keep_paths=project_used_tiles(project_files))
+    elif IMPORT_BUILDINGS:
+        batch_import_cityjson(lod2_files, frame)
+
     if IMPORT_BUILDINGS:
-        batch_import_cityjson(lod2_files)
-        min_x_fromorigin = min_x - origin_utm32_x
-        min_y_fromorigin = min_y - origin_utm32_y
-        max_x_fromorigin = max_x - origin_utm32_x
-        max_y_fromorigin = max_y - origin_utm32_y
-        delete_all_objects_outside_range(min_x_fromorigin, max_x_fromorigin, min_y_fromorigin, max_y_fromorigin)
+        if not CLIP_BUILDINGS_TO_AREA:
+            min_x_fromorigin, min_y_fromorigin, max_x_fromorigin, max_y_fromorigin = frame.utm32_bbox_to_local(area_bbox)
+            delete_all_objects_outside_range(min_x_fromorigin, max_x_fromorigin, min_y_fromorigin, max_y_fromorigin)
 
     print_header("RUNNING IMPORTER (PHASE IV: LOAD GROUND)...")
+    trace_phase("Phase IV: load ground")
     
     if IMPORT_TERRAIN:
-        if TERRAIN_HIGH_RESOLUTION:
+        if TERRAIN_HIGH_RESOLUTION and TERRAIN_ENGINE == "mosaic":
+            batch_import_geotiff_mosaic(dgm1_files, frame)
+        elif TERRAIN_HIGH_RESOLUTION:
             batch_import_geotiff(dgm1_files)
-            fix_terrain_mesh()
+            with trace_span("fix terrain", "fix"):
+                fix_terrain_mesh()
         else:
-            batch_import_ascii_grid(dgm5_files, offset_x=origin_utm32_x, offset_y=origin_utm32_y)
+            batch_import_ascii_grid(dgm5_files, frame)
 
     print_header("RUNNING IMPORTER (PHASE V: LOAD TREES)...")
+    trace_phase("Phase V: load trees")
     
     if IMPORT_TREES:
-        import_trees(tree_files, min_x, min_y, max_x, max_y, origin_utm32_x, origin_utm32_y)
+        import_trees(tree_files, area_bbox, frame, cache_dir=dirs["tree_cache"])
 
     print_header("RUNNING IMPORTER (PHASE VI: FINALIZE SCENE)...")
+    trace_phase("Phase VI: finalize scene")
 
     
     
     assign_material_to_collection("DEMs", "itu_concrete", (0.6, 0.6, 0.6, 1))
     assign_material_to_collection("LoD2", "itu_brick", (0.7, 0.2, 0.2, 1))
     assign_material_to_collection("Trees", "itu_wood", (0.1, 0.7, 0.2, 1))
+    if IMPORT_TREES and TREE_REPRESENTATION == "instances":
+        assign_material_to_collection("TreePrototype", "itu_wood", (0.1, 0.7, 0.2, 1))
 
     print_header("IMPORTER FINISHED.")
+    trace_phase("Save and export")
 
     last_run_time = None
     blender_file_path = None
     mitsuba_export_path = None
 
-    template_path = bpy.data.filepath
-    template_dir = os.path.dirname(template_path)
-
     if SAVE_AS_COPY:
         print("Saving Blender file...")
         
         blender_file_path = os.path.join(template_dir, f"{PROJECT_NAME}.blend")
         print(f"  Output Path: {blender_file_path}")
-        bpy.ops.wm.save_as_mainfile(
-            filepath=blender_file_path,
-            copy=True
-        )
+        with trace_span("save", "export", file=os.path.basename(blender_file_path)) as span:
+            bpy.ops.wm.save_as_mainfile(
+                filepath=blender_file_path,
+                copy=True
+            )
+            span["bytes"] = os.path.getsize(blender_file_path)
         last_run_time = datetime.now().isoformat()
         print("Blender file saved.")
 
@@ -199,22 +159,33 @@ if __name__ == "__main__":
 
         # Output XML path
         mitsuba_export_path = os.path.join(mitsuba_dir, f"{PROJECT_NAME}.xml")
-        bpy.ops.export_scene.mitsuba(
-            filepath=mitsuba_export_path,
-            export_ids=True,
-            axis_forward='Y',
-            axis_up='Z'
-        )
+        if TREE_REALIZE_ON_EXPORT:
+            set_tree_instances_realized(True)
+        with trace_span("mitsuba", "export", file=os.path.basename(mitsuba_export_path)) as span:
+            bpy.ops.export_scene.mitsuba(
+                filepath=mitsuba_export_path,
+                export_ids=True,
+                axis_forward='Y',
+                axis_up='Z'
+            )
+            span["bytes"] = os.path.getsize(mitsuba_export_path)
+            span["vertices"], span["faces"] = count_mesh_elements(bpy.context.scene.objects)
+        set_tree_instances_realized(False)
         print("Mitsuba export written to:", mitsuba_export_path)
 
+    run_summary = None
+    if TRACE_REPORT:
+        run_summary, report_path, trace_path = write_trace_files(template_dir, PROJECT_NAME)
+        print(f"Run took {run_summary['totalSeconds']:.1f} s, peak memory {run_summary['peakRssMB']} MB")
+        print(f"  Report: {report_path}")
+        print(f"  Trace (chrome://tracing, ui.perfetto.dev): {trace_path}")
 
     if USE_CONFIGURATION_FILE:
         print("Writing back status to configuration file...")
-        with open(CONFIGURATION_FILEPATH, 'r+') as config_file:
-            config = json.load(config_file)
-            config["status"]["lastBlenderRun"] = last_run_time
-            config["status"]["blenderFile"] = blender_file_path
-            config["status"]["mitsubaFile"] = os.path.relpath(mitsuba_export_path, template_dir) if mitsuba_export_path else None
-            config_file.seek(0)
-            json.dump(config, config_file, indent=4)
-            config_file.truncate()
\ No newline at end of file
+        write_configuration_status(
+            CONFIGURATION_FILEPATH,
+            lastBlenderRun=last_run_time,
+            blenderFile=blender_file_path,
+            mitsubaFile=os.path.relpath(mitsuba_export_path, template_dir) if mitsuba_export_path else None,
+            lastRunSummary=run_summary
+        )
\ No newline at end of file
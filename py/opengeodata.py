@@ -1,42 +1,144 @@
 
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from urllib.parse import urlparse
+import hashlib
+import re
+import threading
+import time
 import requests
+import requests.adapters
+import urllib3
 import xml.etree.ElementTree as ET
 from tqdm import tqdm
 
 
-def download_metalink(url, optionstring, base_dir, datatype, projectname):
+_host_sessions = {}
+_host_semaphores = {}
+_host_lock = threading.Lock()
+_progress_lock = threading.Lock()
+
+# Metalink hash types supported by hashlib, strongest first
+METALINK_HASH_TYPES = ["sha-512", "sha-384", "sha-256", "sha-224", "sha-1", "md5"]
+# Hash recorded in the tile cache for files without a hash in their metalink
+DEFAULT_HASH_TYPE = "sha-256"
+
+
+def normalize_polygon(optionstring):
+    """
+    Returns a canonical form of an EWKT polygon string: whitespace collapsed and
+    coordinates rounded to 7 decimals (about 1 cm), so equivalent requests share one cache entry.
+    """
+    def round_number(match):
+        return f"{float(match.group(0)):.7f}"
+
+    compact = " ".join(optionstring.split()).upper()
+    return re.sub(r"-?\d+\.\d+", round_number, compact)
+
+
+def metalink_cache_path(url, optionstring, base_dir, datatype):
+    """Returns the path under which the metalink response for a dataset and polygon is cached."""
+    key = hashlib.sha1(f"{url}\n{normalize_polygon(optionstring)}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(base_dir, f"{datatype}_{key}.metalink")
+
+
+def download_metalink(url, optionstring, base_dir, datatype):
     """
     Downloads a metalink file via POST request and saves it to base_dir.
-    The filename is generated using projectname, date, and datatype.
+    The filename is generated from the datatype and a hash of the normalized polygon,
+    so a later request for the same area and dataset is answered from disk.
     """
-    # Generate filename
-    today = datetime.now().strftime("%Y%m%d")
-    filename = f"{projectname}_{today}_{datatype}.metalink"
-    filepath = os.path.join(base_dir, filename)
+    filepath = metalink_cache_path(url, optionstring, base_dir, datatype)
+    filename = os.path.basename(filepath)
 
-    # # Skip download if file already exists
-    # if os.path.exists(filepath):
-    #     print(f"Metalink already exists: {filename}")
-    #     return filepath
+    # Skip download if the response for this polygon is already cached
+    if os.path.exists(filepath) and not REPLACE_EXISTING_FILES:
+        print(f"Metalink already exists: {filename}")
+        return filepath
 
     # Send POST request
-    response = requests.post(url, data=optionstring)
+    response = requests.post(url, data=optionstring, timeout=DOWNLOAD_TIMEOUT)
     if response.status_code == 200:
-        with open(filepath, "wb") as f:
+        with open(filepath + ".part", "wb") as f:
             f.write(response.content)
+        os.replace(filepath + ".part", filepath)
         print(f"Metalink downloaded: {filename}")
         return filepath
     else:
         raise Exception(f"Failed to download metalink. Status code: {response.status_code}")
+
+
+def grid_tiles(datatype, min_x, min_y, max_x, max_y):
+    """
+    Computes the tiles of a dataset covering a UTM32 bounding box from the Bavarian tile grid in TILE_GRIDS.
+    Tiles are named after the kilometre coordinates of their lower left corner, e.g. 690_5334.
+    Returns a files_list like parse_metalink, but without size and hash.
+    """
+    grid = TILE_GRIDS[datatype]
+    tile_size = grid["tile_size"]
+
+    file_list = []
+    for north in range(int(min_y // tile_size), int(max_y // tile_size) + 1):
+        for east in range(int(min_x // tile_size), int(max_x // tile_size) + 1):
+            filename = grid["name"].format(east=east * tile_size // 1000, north=north * tile_size // 1000)
+            file_list.append({
+                "name": filename,
+                "url": grid["url"].format(name=filename),
+                "local": None,
+                "size": None,
+                "hash_type": None,
+                "hash": None
+            })
+
+    return file_list
+
+
+def gen_tree_download_list(raw_download_list):
+    file_list = []
+
+    for url in raw_download_list:
+        filename = os.path.basename(urlparse(url).path)
+        file_list.append({"name": filename, "url": url, "local": None})
+
+    return file_list
+
+
+def resolve_tiles(url, optionstring, bbox, base_dir, datatype, target_dir):
+    """
+    Returns the files_list of a dataset for the requested area without touching the network if possible:
+    1. a cached metalink response for the same polygon and dataset is parsed,
+    2. otherwise the tiles are computed from the tile grid; if all of them are already in the tile cache
+       (or OFFLINE_TILE_RESOLUTION is set) they are used directly,
+    3. otherwise the metalink is requested from geoservices.bayern.de.
+    bbox is (min_x, min_y, max_x, max_y) in UTM32.
+    """
+    cached_metalink = metalink_cache_path(url, optionstring, base_dir, datatype)
+    if os.path.exists(cached_metalink) and not REPLACE_EXISTING_FILES:
+        print(f"Using cached metalink for {datatype}")
+        return parse_metalink(cached_metalink)
+
+    if datatype in TILE_GRIDS:
+        tiles = grid_tiles(datatype, *bbox)
+        if OFFLINE_TILE_RESOLUTION or (
+            not REPLACE_EXISTING_FILES
+            and all(cache_get_source(os.path.join(target_dir, t["name"])) is not None for t in tiles)
+        ):
+            print(f"Resolved {len(tiles)} {datatype} tile(s) from the tile grid")
+            return tiles
+    elif OFFLINE_TILE_RESOLUTION:
+        raise Exception(f"No tile grid known for '{datatype}', cannot resolve tiles offline.")
+
+    return parse_metalink(download_metalink(url, optionstring, base_dir, datatype))
     
 
 def parse_metalink(metalink_path):
     """
     Parses a .metalink file and returns a list of dictionaries:
-    [{"name": filename, "url": download_url, "local": None}, ...]
+    [{"name": filename, "url": download_url, "local": None, "size": bytes, "hash_type": type, "hash": digest}, ...]
     Only takes the first URL for each file.
+    size, hash_type and hash are None if the metalink does not carry them.
+    If several hashes are given, the strongest one supported by hashlib is kept.
     """
     tree = ET.parse(metalink_path)
     root = tree.getroot()
@@ -49,45 +151,256 @@ def parse_metalink(metalink_path):
         filename = file_elem.get("name")
         url_elem = file_elem.find("ml:url", ns)
         if url_elem is not None and url_elem.text:
-            file_list.append({"name": filename, "url": url_elem.text, "local": None})
+            size_elem = file_elem.find("ml:size", ns)
+            size = int(size_elem.text) if size_elem is not None and size_elem.text else None
+
+            hash_type, hash_value = None, None
+            for hash_elem in file_elem.findall("ml:hash", ns):
+                candidate = (hash_elem.get("type") or "").lower()
+                if candidate not in METALINK_HASH_TYPES or not hash_elem.text:
+                    continue
+                if hash_type is None or METALINK_HASH_TYPES.index(candidate) < METALINK_HASH_TYPES.index(hash_type):
+                    hash_type, hash_value = candidate, hash_elem.text.strip().lower()
+
+            file_list.append({
+                "name": filename,
+                "url": url_elem.text,
+                "local": None,
+                "size": size,
+                "hash_type": hash_type,
+                "hash": hash_value
+            })
 
     return file_list
 
 
-def download_meta_files(files_list, target_dir):
+def new_hasher(hash_type):
+    """Returns a hashlib object for a metalink hash type (e.g. "sha-256")."""
+    return hashlib.new(hash_type.replace("-", ""))
+
+
+def hash_file(file_path, hash_type):
+    """Hashes a file that is already on disk. Only used for files that were not downloaded by this version."""
+    hasher = new_hasher(hash_type)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_MAX_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_valid_cached_file(file_info, file_path, kind):
+    """
+    Checks a cached file against the size and hash given in the metalink.
+    The size is compared with a stat call; the hash is compared with the digest recorded in the
+    tile cache manifest when the file was downloaded. Files that are not yet indexed are hashed once.
+    """
+    if not os.path.exists(file_path):
+        return False
+
+    expected_size = file_info.get("size")
+    if expected_size is not None and os.path.getsize(file_path) != expected_size:
+        print(f"Cached file has the wrong size: {file_info['name']}")
+        return False
+
+    hash_type = file_info.get("hash_type") or DEFAULT_HASH_TYPE
+    entry = cache_get_source(file_path)
+    if entry is None or entry["hash_type"] != hash_type or entry["size"] != os.path.getsize(file_path):
+        digest = hash_file(file_path, hash_type)
+        cache_record_source(file_path, kind, file_info["url"], hash_type, digest)
+        # Without an open manifest nothing is recorded, the file is checked against its digest directly
+        entry = cache_get_source(file_path) or {"hash": digest}
+
+    if file_info.get("hash") is not None and entry["hash"] != file_info["hash"]:
+        print(f"Cached file has the wrong {hash_type} checksum: {file_info['name']}")
+        return False
+    return True
+
+
+def host_limit(url):
+    """Returns the number of concurrent requests allowed for the host of url."""
+    return DOWNLOAD_HOST_LIMITS.get(urlparse(url).netloc, DOWNLOAD_MAX_PER_HOST)
+
+
+def get_host_session(url):
+    """
+    Returns the shared keep-alive session and the concurrency semaphore for the host of url.
+    Sessions are created on first use and reused for every later file from the same host.
+    """
+    host = urlparse(url).netloc
+    with _host_lock:
+        if host not in _host_sessions:
+            limit = host_limit(url)
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=limit, max_retries=3)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _host_sessions[host] = session
+            _host_semaphores[host] = threading.BoundedSemaphore(limit)
+        return _host_sessions[host], _host_semaphores[host]
+
+
+def download_file(file_info, target_dir, progress, kind=None):
+    """Downloads a single file of a files_list into target_dir (see _download_file), recorded as a trace span."""
+    with trace_span("download", "download", file=file_info["name"]) as span:
+        local_path = _download_file(file_info, target_dir, progress, kind)
+        span["bytes"] = os.path.getsize(local_path) if local_path else 0
+        span["failed"] = local_path is None
+    return local_path
+
+
+def _download_file(file_info, target_dir, progress, kind=None):
+    """
+    Downloads a single file of a files_list into target_dir.
+    The body is written to a ".part" file which is resumed with an HTTP Range request if a previous
+    attempt was interrupted. The hash is computed while streaming and the result is checked against
+    the size and hash from the metalink before the ".part" file is renamed to its final name
+    and recorded in the tile cache manifest.
+    Returns the local path or None if the download failed.
+    """
+    filename = file_info["name"]
+    url = file_info["url"]
+    file_path = os.path.join(target_dir, filename)
+    part_path = file_path + ".part"
+
+    # Hash while streaming; only the prefix of a .part file left by an earlier run is read back once
+    hash_type = file_info.get("hash_type") or DEFAULT_HASH_TYPE
+    hasher = new_hasher(hash_type)
+    if os.path.exists(part_path):
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_MAX_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+
+    reported_size = None
+    session, semaphore = get_host_session(url)
+    with semaphore:
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                response = session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT, headers=headers)
+                if response.status_code == 416:
+                    # Nothing left to fetch, the .part file is already complete
+                    response.close()
+                    break
+                if response.status_code not in (200, 206):
+                    response.close()
+                    progress.write(f"Failed to download {filename}, status code: {response.status_code}")
+                    return None
+                if response.status_code == 200 and offset:
+                    # Server ignored the Range header, start from scratch
+                    if attempt > 0:
+                        # The bytes written by earlier attempts are already counted in the progress bar
+                        with _progress_lock:
+                            progress.update(-offset)
+                    offset = 0
+                    hasher = new_hasher(hash_type)
+
+                total_size = offset + int(response.headers.get('content-length', 0))
+                if response.headers.get('content-encoding') in (None, 'identity'):
+                    reported_size = total_size
+                with _progress_lock:
+                    if attempt == 0:
+                        progress.total = (progress.total or 0) + (file_info.get("size") or total_size)
+                        progress.update(offset)
+                    progress.refresh()
+
+                # Grow the chunk size while reads return quickly, shrink it when they stall
+                chunk_size = DOWNLOAD_MIN_CHUNK_SIZE
+                with response, open(part_path, "ab" if offset else "wb") as f:
+                    while True:
+                        started = time.perf_counter()
+                        chunk = response.raw.read(chunk_size, decode_content=True)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        elapsed = time.perf_counter() - started
+                        if elapsed < 0.05 and len(chunk) == chunk_size:
+                            chunk_size = min(chunk_size * 2, DOWNLOAD_MAX_CHUNK_SIZE)
+                        elif elapsed > 0.5:
+                            chunk_size = max(chunk_size // 2, DOWNLOAD_MIN_CHUNK_SIZE)
+                        with _progress_lock:
+                            progress.update(len(chunk))
+                break
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    progress.write(f"Failed to download {filename}: {e}")
+                    return None
+                progress.write(f"Connection lost while downloading {filename}, resuming...")
+
+    expected_size = file_info.get("size") or reported_size
+    downloaded_size = os.path.getsize(part_path)
+    if expected_size is not None and downloaded_size != expected_size:
+        if downloaded_size > expected_size:
+            os.remove(part_path)
+        progress.write(f"Incomplete download of {filename}: {downloaded_size} of {expected_size} bytes")
+        return None
+    if file_info.get("hash") is not None and hasher.hexdigest() != file_info["hash"]:
+        os.remove(part_path)
+        progress.write(f"Checksum mismatch for {filename}, discarded the download")
+        return None
+
+    os.replace(part_path, file_path)
+    cache_record_source(file_path, kind or os.path.basename(os.path.normpath(target_dir)), url, hash_type, hasher.hexdigest())
+    return file_path
+
+
+def download_meta_files(files_list, target_dir, kind=None, progress=None):
     """
     Downloads files given a list of dictionaries [{"name": filename, "url": download_url}].
     Respects REPLACE_EXISTING_FILES flag.
-    Shows a progress bar for each file.
+    Cached files are only reused if they match the size and hash from the metalink,
+    interrupted downloads are resumed from their ".part" file.
+    Files are fetched by a pool of DOWNLOAD_WORKERS threads sharing one keep-alive session per host,
+    at most DOWNLOAD_MAX_PER_HOST (or DOWNLOAD_HOST_LIMITS[host]) at a time per host.
+    Shows one aggregate progress bar for all files; callers downloading file by file from several threads
+    (the download stage of stream_project_tiles) pass a shared tqdm bar as progress instead.
     """
+    kind = kind or os.path.basename(os.path.normpath(target_dir))
+    log = progress.write if progress is not None else print
+    pending = []
     for file_info in files_list:
         filename = file_info["name"]
-        url = file_info["url"]
         file_path = os.path.join(target_dir, filename)
 
-        if os.path.exists(file_path) and not REPLACE_EXISTING_FILES:
-            print(f"Skipping existing file: {filename}")
+        if REPLACE_EXISTING_FILES:
+            if cache_get_source(file_path) is not None:
+                cache_remove(file_path)
+            for stale_path in (file_path, file_path + ".part"):
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+        elif is_valid_cached_file(file_info, file_path, kind):
+            log(f"Skipping existing file: {filename}")
             file_info["local"] = file_path
+            cache_touch([file_path])
             continue
+        elif os.path.exists(file_path):
+            cache_remove(file_path)
+            if os.path.exists(file_path):
+                os.remove(file_path)
 
-        print(f"Downloading: {filename} from {url}")
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            total_size = int(response.headers.get('content-length', 0))
-            chunk_size = 8192
-
-            with open(file_path, "wb") as f, tqdm(
-                total=total_size, unit='B', unit_scale=True, desc=filename, ncols=80
-            ) as pbar:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        pbar.update(len(chunk))
+        pending.append(file_info)
 
-            print(f"Downloaded: {filename}\n")
-            file_info["local"] = file_path
-        else:
-            print(f"Failed to download {filename}, status code: {response.status_code}")
+    if not pending:
+        return files_list
+
+    if progress is None:
+        print(f"Downloading {len(pending)} file(s) with {DOWNLOAD_WORKERS} worker(s)...")
+    with (tqdm(total=0, unit='B', unit_scale=True, desc="Downloading", ncols=80) if progress is None
+          else nullcontext(progress)) as progress, \
+            ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(pending))) as pool:
+        futures = {pool.submit(download_file, file_info, target_dir, progress, kind): file_info for file_info in pending}
+        for future in as_completed(futures):
+            file_info = futures[future]
+            try:
+                local_path = future.result()
+            except Exception as e:
+                progress.write(f"Failed to download {file_info['name']}: {e}")
+                continue
+            if local_path:
+                file_info["local"] = local_path
+                progress.write(f"Downloaded: {file_info['name']}")
 
     return files_list
 
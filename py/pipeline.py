@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+
+
+# Marks the end of the items in a pipeline queue
+_PIPELINE_END = object()
+
+
+def _pipeline_worker(stage, stats, in_queue, out_queue, lock, remaining):
+    """
+    Takes batches of up to stage["batch_size"] items from in_queue, passes them to stage["function"]
+    and puts the items it returns into out_queue. The last worker of a stage to finish ends the next queue.
+    After the first item of a batch, the worker waits up to stage["batch_wait"] seconds for the batch to fill,
+    so a stage fed one item at a time (e.g. the conversion after the downloads) still gets full batches.
+    Every batch is a trace span holding the number of dropped items, a failed batch is recorded with its error.
+    """
+    while True:
+        item = in_queue.get()
+        if item is _PIPELINE_END:
+            # Let the other workers of this stage see the end as well
+            in_queue.put(_PIPELINE_END)
+            break
+
+        batch = [item]
+        deadline = time.perf_counter() + stage["batch_wait"]
+        while len(batch) < stage["batch_size"]:
+            try:
+                item = in_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is _PIPELINE_END:
+                in_queue.put(_PIPELINE_END)
+                break
+            batch.append(item)
+
+        with lock:
+            stats["busy"] += 1
+        started = time.perf_counter()
+        try:
+            with trace_span(stage["name"], "pipeline", file=f"{len(batch)} item(s)") as span:
+                span["dropped"] = len(batch)
+                results = stage["function"](batch) or []
+                span["dropped"] = len(batch) - len(results)
+        except Exception as e:
+            print(f"Pipeline stage '{stage['name']}' failed for {len(batch)} item(s): {e}")
+            results = []
+        with lock:
+            stats["busy"] -= 1
+            stats["items"] += len(batch)
+            stats["seconds"] += time.perf_counter() - started
+
+        for result in results:
+            out_queue.put(result)
+
+    with lock:
+        remaining[stage["name"]] -= 1
+        last_worker = remaining[stage["name"]] == 0
+    if last_worker:
+        out_queue.put(_PIPELINE_END)
+
+
+def pipeline_stage(name, function, workers=1, batch_size=1, batch_wait=PIPELINE_BATCH_WAIT):
+    """
+    Describes a stage of run_pipeline. function gets a list of up to batch_size items
+    and returns the list of items handed on to the next stage (dropped items are left out).
+    A batch is started with fewer items if no more arrive within batch_wait seconds of its first item.
+    """
+    return {"name": name, "function": function, "workers": max(1, workers), "batch_size": max(1, batch_size),
+            "batch_wait": batch_wait}
+
+
+def run_pipeline(items, stages, consume=None, queue_size=PIPELINE_QUEUE_SIZE, log_interval=PIPELINE_LOG_INTERVAL):
+    """
+    Runs items through stages of worker threads connected by queues holding at most queue_size items,
+    so a fast stage waits for a slow one instead of piling up files on disk or in memory.
+    The items leaving the last stage are passed to consume(item) on the calling thread, which keeps
+    Blender's operators on the main thread while later items are still downloaded and converted.
+    Every log_interval seconds the queue depths are printed; the stage whose input queue stays full
+    is the bottleneck. Returns the list of items that passed all stages.
+    """
+    items = list(items)
+    lock = threading.Lock()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stats = {stage["name"]: {"items": 0, "busy": 0, "seconds": 0.0} for stage in stages}
+    remaining = {stage["name"]: stage["workers"] for stage in stages}
+
+    def feed():
+        for item in items:
+            queues[0].put(item)
+        queues[0].put(_PIPELINE_END)
+
+    print(f"Pipeline: {len(items)} item(s) through {' -> '.join(stage['name'] for stage in stages)}")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for i, stage in enumerate(stages):
+        for n in range(stage["workers"]):
+            threads.append(threading.Thread(
+                target=_pipeline_worker, name=f"pipeline-{stage['name']}-{n}", daemon=True,
+                args=(stage, stats[stage["name"]], queues[i], queues[i + 1], lock, remaining)
+            ))
+    for thread in threads:
+        thread.start()
+
+    finished = []
+
+    def log_queues():
+        with lock:
+            depths = " | ".join(
+                f"{stage['name']}: {queues[i].qsize()} queued, {stats[stage['name']]['busy']} busy"
+                for i, stage in enumerate(stages)
+            )
+        print(f"Pipeline: {depths} | done: {queues[-1].qsize()} queued, {len(finished)} finished")
+
+    next_log = started + log_interval
+    while True:
+        try:
+            item = queues[-1].get(timeout=max(0.0, next_log - time.perf_counter()))
+        except queue.Empty:
+            log_queues()
+            next_log = time.perf_counter() + log_interval
+            continue
+        if item is _PIPELINE_END:
+            break
+
+        if consume is not None:
+            consume_started = time.perf_counter()
+            try:
+                with trace_span("consume", "pipeline"):
+                    consume(item)
+            except Exception as e:
+                print(f"Pipeline consumer failed: {e}")
+            consume_stats = stats.setdefault("consume", {"items": 0, "busy": 0, "seconds": 0.0})
+            consume_stats["items"] += 1
+            consume_stats["seconds"] += time.perf_counter() - consume_started
+        finished.append(item)
+
+        if time.perf_counter() >= next_log:
+            log_queues()
+            next_log = time.perf_counter() + log_interval
+
+    elapsed = time.perf_counter() - started
+    print(f"Pipeline finished {len(finished)} of {len(items)} item(s) in {elapsed:.1f} s:")
+    for name, stage_stats in stats.items():
+        print(f"  {name}: {stage_stats['items']} item(s), {stage_stats['seconds']:.1f} s of work")
+    return finished
@@ -0,0 +1,286 @@
+import json
+import os
+from datetime import datetime
+
+
+def read_configuration(config_path):
+    """
+    Reads a project configuration file written by the map web app (map_edit_webapp).
+    Returns the settings it overrides as a dict of setting name -> value.
+    """
+    with open(config_path, 'r') as config_file:
+        config = json.load(config_file)
+
+    return {
+        "PROJECT_NAME": config["meta"]["title"],
+        "LATITUDE_FROM": config["area"]["ne"]["lat"],
+        "LONGITUDE_FROM": config["area"]["ne"]["lng"],
+        "LATITUDE_TO": config["area"]["sw"]["lat"],
+        "LONGITUDE_TO": config["area"]["sw"]["lng"],
+        "LATITUDE_SCENE_ORIGIN": config["origin"]["lat"],
+        "LONGITUDE_SCENE_ORIGIN": config["origin"]["lng"],
+        "IMPORT_TERRAIN": config["import"]["terrain"],
+        "IMPORT_BUILDINGS": config["import"]["buildings"],
+        "IMPORT_TREES": config["import"]["trees"],
+        "TERRAIN_HIGH_RESOLUTION": False,
+        "REPLACE_EXISTING_FILES": config["import"]["replaceExistingFiles"],
+        "CLEAN_BLENDER": config["import"]["cleanBlender"]
+    }
+
+
+def write_configuration_status(config_path, **status):
+    """Writes the given values into the "status" section of a configuration file, e.g. lastPrefetch=..."""
+    with open(config_path, 'r+') as config_file:
+        config = json.load(config_file)
+        config.setdefault("status", {}).update(status)
+        config_file.seek(0)
+        json.dump(config, config_file, indent=4)
+        config_file.truncate()
+
+
+def project_area(lat_from, lon_from, lat_to, lon_to):
+    """
+    Returns the EWKT polygon of an area, as it is sent to the metalink service,
+    and its UTM32 bounding box (min_x, min_y, max_x, max_y).
+    """
+    ewkt_str = f"SRID=4326;POLYGON(({lon_from} {lat_from},{lon_from} {lat_to},{lon_to} {lat_to},{lon_to} {lat_from},{lon_from} {lat_from}))"
+    return ewkt_str, wgs84_area_to_utm32(lat_from, lon_from, lat_to, lon_to)
+
+
+def print_file_list(title, files, key):
+    print(f"{title}:")
+    for file_info in files:
+        if file_info[key]:
+            print(f"  {file_info['name']}: {file_info[key]}")
+
+
+# Folder of dirs (setup_structure) each dataset is downloaded to
+PROJECT_TILE_DIRS = {"lod2": "lod2_gml", "dgm1": "dgm1", "dgm5": "dgm5", "tree": "tree"}
+
+
+def resolve_project_tiles(dirs, lat_from, lon_from, lat_to, lon_to, import_terrain, import_buildings, import_trees,
+                          terrain_high_resolution):
+    """
+    Resolves the tiles of all datasets needed for an area, without downloading them.
+    Returns a dict with the files lists "lod2", "dgm1", "dgm5" and "tree" and the "area_bbox" in UTM32.
+    """
+    print("Resolving tiles...")
+    ewkt_str, area_bbox = project_area(lat_from, lon_from, lat_to, lon_to)
+
+    lod2_files, dgm1_files, dgm5_files, tree_files = [], [], [], []
+    if import_buildings:
+        lod2_files = resolve_tiles(DOWNLOAD_LINKS["lod2"], ewkt_str, area_bbox, dirs["metalink"], "lod2", dirs["lod2_gml"])
+        print_file_list("LoD2 Files", lod2_files, "url")
+    if import_terrain and terrain_high_resolution:
+        dgm1_files = resolve_tiles(DOWNLOAD_LINKS["dgm1"], ewkt_str, area_bbox, dirs["metalink"], "dgm1", dirs["dgm1"])
+        print_file_list("DGM1 Files", dgm1_files, "url")
+    if import_terrain and not terrain_high_resolution:
+        dgm5_files = resolve_tiles(DOWNLOAD_LINKS["dgm5"], ewkt_str, area_bbox, dirs["metalink"], "dgm5", dirs["dgm5"])
+        print_file_list("DGM5 Files", dgm5_files, "url")
+    if import_trees:
+        tree_files = gen_tree_download_list(DOWNLOAD_LINK_TREES)
+        print_file_list("GEOPACKAGE Files", tree_files, "url")
+
+    return {"lod2": lod2_files, "dgm1": dgm1_files, "dgm5": dgm5_files, "tree": tree_files, "area_bbox": area_bbox}
+
+
+def project_used_tiles(project_files):
+    """Returns the local files of all datasets of a project, as passed to enforce_cache_budget."""
+    used_tiles = []
+    for dataset in PROJECT_TILE_DIRS:
+        used_tiles.extend(file_info["local"] for file_info in project_files[dataset] if file_info["local"])
+    return used_tiles
+
+
+def download_project_tiles(batch, dirs, progress=None):
+    """
+    Pipeline stage: downloads (dataset, file_info) items and extracts DGM5 grids. Failed downloads are dropped.
+    The workers of the stage share the tqdm bar progress.
+    """
+    downloaded = []
+    for dataset, file_info in batch:
+        if dataset == "tree" and TREE_REMOTE_READ:
+            downloaded.append((dataset, file_info))
+            continue
+        download_meta_files([file_info], dirs[PROJECT_TILE_DIRS[dataset]], progress=progress)
+        if dataset == "dgm5":
+            extract_ascii_grids([file_info], dirs["dgm5"])
+        if file_info["local"]:
+            downloaded.append((dataset, file_info))
+    return downloaded
+
+
+def convert_project_tiles(batch, dirs, area_bbox):
+    """
+    Pipeline stage: converts (and clips) the LoD2 tiles of a batch to CityJSON. Other datasets are passed on.
+    With area_bbox None the tiles are not clipped.
+    """
+    lod2_files = [file_info for dataset, file_info in batch if dataset == "lod2"]
+    if lod2_files:
+        convert_to_cityjson(lod2_files, dirs["lod2_json"])
+        if CLIP_BUILDINGS_TO_AREA and area_bbox is not None:
+            clip_cityjson_files(lod2_files, *area_bbox, dirs["lod2_clipped"])
+    return [(dataset, file_info) for dataset, file_info in batch if dataset != "lod2" or file_info["local"].endswith(".json")]
+
+
+def stream_project_tiles(dirs, project_files, import_tile=None):
+    """
+    Downloads and converts the tiles of a project in a pipeline (pipeline.py) instead of one phase after the other:
+    download workers feed the conversion, which feeds import_tile(dataset, file_info) on the calling thread.
+    The LoD2 tiles go first, so the building import starts while the terrain and trees are still downloading.
+    The file_info dicts in project_files are updated in place.
+    """
+    items = [(dataset, file_info) for dataset in PROJECT_TILE_DIRS for file_info in project_files[dataset]]
+    with tqdm(total=0, unit='B', unit_scale=True, desc="Downloading", ncols=80) as progress:
+        stages = [
+            pipeline_stage("download", lambda batch: download_project_tiles(batch, dirs, progress), workers=DOWNLOAD_WORKERS),
+            pipeline_stage("convert", lambda batch: convert_project_tiles(batch, dirs, project_files["area_bbox"]),
+                           batch_size=(CITYGML_WORKERS or os.cpu_count() or 1) * CITYGML_BATCH_SIZE)
+        ]
+        run_pipeline(items, stages, consume=(lambda item: import_tile(*item)) if import_tile else None)
+
+
+def prefetch_project(dirs, lat_from, lon_from, lat_to, lon_to, import_terrain, import_buildings, import_trees,
+                     terrain_high_resolution, keep_paths=()):
+    """
+    Phase I of the importer, which needs no Blender: resolves and downloads all tiles of an area,
+    extracts the DGM5 grids and converts (and clips) the LoD2 tiles to CityJSON.
+    Everything ends up in the tile cache, so running this ahead of time (see __prefetch.py)
+    lets the Blender side go straight to the import.
+    With PIPELINED_IMPORT the downloads and conversions overlap (see stream_project_tiles).
+    keep_paths are protected from cache eviction in addition to the tiles of this area.
+    Returns the dict of resolve_project_tiles plus the list of cached files the area uses ("used_tiles").
+    """
+    project_files = resolve_project_tiles(
+        dirs, lat_from, lon_from, lat_to, lon_to, import_terrain, import_buildings, import_trees, terrain_high_resolution
+    )
+
+    if PIPELINED_IMPORT:
+        stream_project_tiles(dirs, project_files)
+        project_files["used_tiles"] = project_used_tiles(project_files)
+        enforce_cache_budget(CACHE_DISK_BUDGET_GB * 1024**3 if CACHE_DISK_BUDGET_GB else None,
+                             keep_paths=list(keep_paths) + project_files["used_tiles"])
+        return project_files
+
+    lod2_files = project_files["lod2"]
+    dgm1_files = project_files["dgm1"]
+    dgm5_files = project_files["dgm5"]
+    tree_files = project_files["tree"]
+
+    print("Downloading files...")
+    if import_buildings:
+        lod2_files = download_meta_files(lod2_files, dirs["lod2_gml"])
+    if import_terrain and terrain_high_resolution:
+        dgm1_files = download_meta_files(dgm1_files, dirs["dgm1"])
+    if import_terrain and not terrain_high_resolution:
+        dgm5_files = download_meta_files(dgm5_files, dirs["dgm5"])
+        dgm5_files = extract_ascii_grids(dgm5_files, dirs["dgm5"])
+    if import_trees and not TREE_REMOTE_READ:
+        tree_files = download_meta_files(tree_files, dirs["tree"])
+
+    print("\nSummary of downloaded files:")
+    if import_buildings:
+        print_file_list("LoD2 Files", lod2_files, "local")
+    if import_terrain and terrain_high_resolution:
+        print_file_list("DGM1 Files", dgm1_files, "local")
+    if import_terrain and not terrain_high_resolution:
+        print_file_list("DGM5 Files", dgm5_files, "local")
+    if import_trees:
+        print_file_list("GEOPACKAGE Files", tree_files, "local")
+
+    print("All downloads completed.")
+
+    project_files["used_tiles"] = project_used_tiles(project_files)
+    enforce_cache_budget(CACHE_DISK_BUDGET_GB * 1024**3 if CACHE_DISK_BUDGET_GB else None,
+                         keep_paths=list(keep_paths) + project_files["used_tiles"])
+
+    if import_buildings:
+        print("Converting LoD2 GML files to CityJSON...")
+        convert_to_cityjson(lod2_files, dirs["lod2_json"])
+        if CLIP_BUILDINGS_TO_AREA:
+            print("Clipping CityJSON files to the requested area...")
+            clip_cityjson_files(lod2_files, *project_files["area_bbox"], dirs["lod2_clipped"])
+
+    return project_files
+
+
+def prefetch_projects(dirs, projects):
+    """
+    Phase I for several projects at once (see __batch.py): the tiles of all areas are resolved first
+    and their union is downloaded, extracted and converted, so a tile shared by several projects is
+    processed only once. Only the clipping to each area is done per project.
+    projects is a list of read_configuration dicts. Returns one dict per project, as prefetch_project does.
+    REPLACE_EXISTING_FILES is applied per project: only the tiles of projects that set it are fetched again.
+    """
+    global REPLACE_EXISTING_FILES
+    replace_default = REPLACE_EXISTING_FILES
+
+    def process_tiles(items):
+        if PIPELINED_IMPORT:
+            with tqdm(total=0, unit='B', unit_scale=True, desc="Downloading", ncols=80) as progress:
+                stages = [
+                    pipeline_stage("download", lambda batch: download_project_tiles(batch, dirs, progress), workers=DOWNLOAD_WORKERS),
+                    pipeline_stage("convert", lambda batch: convert_project_tiles(batch, dirs, None),
+                                   batch_size=(CITYGML_WORKERS or os.cpu_count() or 1) * CITYGML_BATCH_SIZE)
+                ]
+                run_pipeline(items, stages)
+        else:
+            files = {dataset: [file_info for d, file_info in items if d == dataset] for dataset in PROJECT_TILE_DIRS}
+            print("Downloading files...")
+            for dataset, folder in PROJECT_TILE_DIRS.items():
+                if files[dataset] and not (dataset == "tree" and TREE_REMOTE_READ):
+                    download_meta_files(files[dataset], dirs[folder])
+            extract_ascii_grids(files["dgm5"], dirs["dgm5"])
+            if files["lod2"]:
+                print("Converting LoD2 GML files to CityJSON...")
+                convert_to_cityjson(files["lod2"], dirs["lod2_json"])
+
+    try:
+        # Functions read REPLACE_EXISTING_FILES as a global, it is switched to the flag of the project or tiles at hand
+        all_project_files = []
+        for project in projects:
+            REPLACE_EXISTING_FILES = project["REPLACE_EXISTING_FILES"]
+            all_project_files.append(resolve_project_tiles(
+                dirs, project["LATITUDE_FROM"], project["LONGITUDE_FROM"], project["LATITUDE_TO"], project["LONGITUDE_TO"],
+                project["IMPORT_TERRAIN"], project["IMPORT_BUILDINGS"], project["IMPORT_TREES"], project["TERRAIN_HIGH_RESOLUTION"]
+            ))
+
+        # One file_info per tile URL, shared by all projects using the tile.
+        # A tile is fetched again if any project using it sets REPLACE_EXISTING_FILES.
+        shared = {}
+        replaced = set()
+        total = 0
+        for project, project_files in zip(projects, all_project_files):
+            for dataset in PROJECT_TILE_DIRS:
+                total += len(project_files[dataset])
+                project_files[dataset] = [
+                    shared.setdefault((dataset, file_info["url"]), file_info) for file_info in project_files[dataset]
+                ]
+                if project["REPLACE_EXISTING_FILES"]:
+                    replaced.update((dataset, file_info["url"]) for file_info in project_files[dataset])
+        print(f"{len(shared)} unique tile(s) for {len(projects)} project(s), {total - len(shared)} shared tile(s) are processed once.")
+
+        for replace in (True, False):
+            items = [(dataset, file_info) for (dataset, url), file_info in shared.items()
+                     if ((dataset, url) in replaced) == replace]
+            if items:
+                REPLACE_EXISTING_FILES = replace
+                process_tiles(items)
+
+        used_tiles = []
+        for project, project_files in zip(projects, all_project_files):
+            REPLACE_EXISTING_FILES = project["REPLACE_EXISTING_FILES"]
+            # Clipping repoints "local" to the clipped file, so each project clips its own copies
+            project_files["lod2"] = [
+                dict(file_info) for file_info in project_files["lod2"]
+                if file_info["local"] and file_info["local"].endswith(".json")
+            ]
+            if CLIP_BUILDINGS_TO_AREA and project_files["lod2"]:
+                clip_cityjson_files(project_files["lod2"], *project_files["area_bbox"], dirs["lod2_clipped"])
+            project_files["used_tiles"] = project_used_tiles(project_files)
+            used_tiles.extend(project_files["used_tiles"])
+    finally:
+        REPLACE_EXISTING_FILES = replace_default
+
+    enforce_cache_budget(CACHE_DISK_BUDGET_GB * 1024**3 if CACHE_DISK_BUDGET_GB else None, keep_paths=used_tiles)
+    return all_project_files
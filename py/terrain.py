@@ -0,0 +1,310 @@
+import numpy as np
+import tifffile
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# GeoTIFF tags used to place a DGM1 tile (see the GeoTIFF specification)
+GEOTIFF_MODEL_PIXEL_SCALE = 33550
+GEOTIFF_MODEL_TIEPOINT = 33922
+GEOTIFF_GEO_KEY_DIRECTORY = 34735
+GDAL_NODATA = 42113
+GEOKEY_RASTER_TYPE = 1025
+RASTER_PIXEL_IS_POINT = 2
+
+# Largest triangle leg (in grid cells) of the adaptive terrain mesh
+RTIN_BLOCK_SIZE = 1024
+
+
+def read_geotiff_dem(path):
+    """
+    Reads a single band GeoTIFF DEM tile into a NumPy height grid.
+    The grid is flipped so row 0 is the southern row, nodata values are set to NaN.
+    Returns (heights, x, y, dx, dy) where x/y are the UTM32 coordinates of the vertex at row 0, column 0.
+    """
+    with tifffile.TiffFile(path) as tif:
+        page = tif.pages[0]
+        heights = page.asarray().astype(np.float32)
+        tags = page.tags
+
+        scale_x, scale_y = tags[GEOTIFF_MODEL_PIXEL_SCALE].value[:2]
+        tie_i, tie_j, _, tie_x, tie_y, _ = tags[GEOTIFF_MODEL_TIEPOINT].value[:6]
+
+        pixel_is_point = False
+        if GEOTIFF_GEO_KEY_DIRECTORY in tags:
+            keys = tags[GEOTIFF_GEO_KEY_DIRECTORY].value
+            for i in range(4, len(keys) - 3, 4):
+                if keys[i] == GEOKEY_RASTER_TYPE:
+                    pixel_is_point = keys[i + 3] == RASTER_PIXEL_IS_POINT
+
+        if GDAL_NODATA in tags:
+            nodata = float(str(tags[GDAL_NODATA].value).strip("\x00 "))
+            heights[heights == nodata] = np.nan
+
+    if heights.ndim > 2:
+        heights = heights[..., 0]
+
+    # Vertices are placed on the pixel centers, like the BlenderGIS DEM_RAW import
+    offset = 0.0 if pixel_is_point else 0.5
+    x = tie_x + (offset - tie_i) * scale_x
+    y_top = tie_y - (offset - tie_j) * scale_y
+    y = y_top - (heights.shape[0] - 1) * scale_y
+
+    return np.ascontiguousarray(heights[::-1]), x, y, scale_x, scale_y
+
+
+def mosaic_dem_tiles(tiles):
+    """
+    Pastes DEM tiles (as returned by read_geotiff_dem) into one height grid.
+    Tile positions are converted to row/column offsets, so shared edges line up by index.
+    Where tiles overlap, the first valid height wins. Cells not covered by any tile are NaN.
+    Returns (heights, x, y, dx, dy) of the mosaic.
+    """
+    dx, dy = tiles[0][3], tiles[0][4]
+    min_x = min(t[1] for t in tiles)
+    min_y = min(t[2] for t in tiles)
+
+    placements = []
+    rows, cols = 0, 0
+    for heights, x, y, tile_dx, tile_dy in tiles:
+        if not (np.isclose(tile_dx, dx) and np.isclose(tile_dy, dy)):
+            raise ValueError(f"DEM tiles have different resolutions ({tile_dx} x {tile_dy} and {dx} x {dy}).")
+        row = int(round((y - min_y) / dy))
+        col = int(round((x - min_x) / dx))
+        placements.append((heights, row, col))
+        rows = max(rows, row + heights.shape[0])
+        cols = max(cols, col + heights.shape[1])
+
+    mosaic = np.full((rows, cols), np.nan, dtype=np.float32)
+    for heights, row, col in placements:
+        target = mosaic[row:row + heights.shape[0], col:col + heights.shape[1]]
+        empty = np.isnan(target)
+        target[empty] = heights[empty]
+
+    return mosaic, min_x, min_y, dx, dy
+
+
+def read_ascii_grid_points(path):
+    """Reads an 'x y z' ASCII grid file (DGM5) into an (n, 3) array in one bulk parse."""
+    values = np.fromfile(path, dtype=np.float64, sep=" ")
+    if len(values) % 3:
+        raise ValueError(f"{path} is not an 'x y z' point list.")
+    return values.reshape(-1, 3)
+
+
+def grid_spacing(values):
+    """Returns the smallest non-zero step between the distinct values of a grid axis."""
+    steps = np.diff(np.unique(values))
+    steps = steps[steps > 1e-6]
+    return float(steps.min()) if len(steps) else 1.0
+
+
+def load_ascii_grids(paths):
+    """
+    Loads ASCII grid files into one height grid (row 0 = southern row).
+    Grid spacing is detected from the point coordinates; grid points without a height are NaN.
+    Returns (heights, x, y, dx, dy) where x/y are the coordinates of the point at row 0, column 0.
+    """
+    points = np.concatenate([read_ascii_grid_points(path) for path in paths])
+    print("Total points loaded:", len(points))
+
+    dx = grid_spacing(points[:, 0])
+    dy = grid_spacing(points[:, 1])
+    print("Detected dx =", dx, " dy =", dy)
+
+    min_x = points[:, 0].min()
+    min_y = points[:, 1].min()
+    cols = np.rint((points[:, 0] - min_x) / dx).astype(np.int64)
+    rows = np.rint((points[:, 1] - min_y) / dy).astype(np.int64)
+
+    heights = np.full((rows.max() + 1, cols.max() + 1), np.nan, dtype=np.float32)
+    heights[rows, cols] = points[:, 2]
+
+    return heights, min_x, min_y, dx, dy
+
+
+def _gather(values, rows, cols, fill):
+    """values[rows, cols], with fill for indices outside the grid."""
+    inside = (rows >= 0) & (rows < values.shape[0]) & (cols >= 0) & (cols < values.shape[1])
+    out = np.full(rows.shape, fill, dtype=values.dtype)
+    out[inside] = values[rows[inside], cols[inside]]
+    return out
+
+
+def _plane(p, q, r, zp, zq, zr, u, v):
+    """Heights at local grid positions (u, v) on the plane through three points p, q, r given in local (u, v)."""
+    det = (q[0] - p[0]) * (r[1] - p[1]) - (r[0] - p[0]) * (q[1] - p[1])
+    wq = ((u - p[0]) * (r[1] - p[1]) - (r[0] - p[0]) * (v - p[1])) / det
+    wr = ((q[0] - p[0]) * (v - p[1]) - (u - p[0]) * (q[1] - p[1])) / det
+    return zp + wq * (zq - zp) + wr * (zr - zp)
+
+
+def _square_errors(z, valid, s, chunk_points=1 << 22):
+    """
+    Measures, for every square of size 2s (squares share their border rows/columns), the largest height
+    error of its grid points against
+      - the two triangles of the square's checkerboard diagonal ("center"), and
+      - the four triangles from the square's corners to its center ("south", "north", "west", "east",
+        the triangles on the side at the lowest row, highest row, lowest column, highest column).
+    Squares are processed in chunks of rows to bound memory. Returns a dict of (rows, cols) arrays.
+    """
+    w = 2 * s
+    windows = sliding_window_view(z, (w + 1, w + 1))[::w, ::w]
+    valid_windows = sliding_window_view(valid, (w + 1, w + 1))[::w, ::w]
+    square_rows, square_cols = windows.shape[:2]
+
+    u = np.arange(w + 1, dtype=np.float64)[:, None]
+    v = np.arange(w + 1, dtype=np.float64)[None, :]
+    regions = {
+        "south": (u <= v) & (u <= w - v),
+        "north": (u >= v) & (u >= w - v),
+        "west": (v <= u) & (v <= w - u),
+        "east": (v >= u) & (v >= w - u)
+    }
+    sides = {"south": ((0, 0), (0, w)), "north": ((w, 0), (w, w)), "west": ((0, 0), (w, 0)), "east": ((0, w), (w, w))}
+
+    result = {name: np.zeros((square_rows, square_cols)) for name in ("center", *regions)}
+    step = max(1, chunk_points // ((w + 1) ** 2 * square_cols))
+    for start in range(0, square_rows, step):
+        win = windows[start:start + step]
+        ok = valid_windows[start:start + step]
+        corner = {(0, 0): win[..., :1, :1], (0, w): win[..., :1, -1:], (w, 0): win[..., -1:, :1], (w, w): win[..., -1:, -1:]}
+        center = win[..., s:s + 1, s:s + 1]
+
+        def max_error(interpolated, region=True):
+            return np.where(ok & region, np.abs(interpolated - win), 0.0).max(axis=(-2, -1))
+
+        a, b = np.meshgrid(np.arange(start, start + len(win)), np.arange(square_cols), indexing="ij")
+        main = ((a + b) % 2 == 0)[..., None, None]
+        main_plane = np.where(u >= v,
+                              _plane((0, 0), (w, 0), (w, w), corner[(0, 0)], corner[(w, 0)], corner[(w, w)], u, v),
+                              _plane((0, 0), (0, w), (w, w), corner[(0, 0)], corner[(0, w)], corner[(w, w)], u, v))
+        anti_plane = np.where(u + v >= w,
+                              _plane((0, w), (w, 0), (w, w), corner[(0, w)], corner[(w, 0)], corner[(w, w)], u, v),
+                              _plane((0, 0), (0, w), (w, 0), corner[(0, 0)], corner[(0, w)], corner[(w, 0)], u, v))
+        result["center"][start:start + len(win)] = max_error(np.where(main, main_plane, anti_plane))
+
+        for name, region in regions.items():
+            p, q = sides[name]
+            interpolated = _plane(p, q, (s, s), corner[p], corner[q], center, u, v)
+            result[name][start:start + len(win)] = max_error(interpolated, region)
+
+    return result
+
+
+def rtin_errors(heights, block_size):
+    """
+    Computes the error of every grid point for a right-triangulated irregular network (RTIN) over
+    a grid of (block_size + 1) squares sharing their borders, level by level from the smallest triangles up.
+    The error of a point is the largest height error of any grid point inside its diamond (the two triangles
+    whose hypotenuse it splits) when the diamond is not split, raised to the errors of its child diamonds
+    so splitting is always propagated to neighbours. Leaving out a point therefore never moves the mesh
+    further than its error away from any grid height.
+    Diamonds that cover both valid and NaN heights get an infinite error, so they are refined down to
+    single cells; diamonds without any valid height get no error.
+    """
+    rows, cols = heights.shape
+    valid = ~np.isnan(heights)
+    z = np.where(valid, heights, 0.0).astype(np.float64)
+
+    errors = np.zeros((rows, cols), dtype=np.float64)
+    has_valid = valid.copy()
+    has_invalid = ~valid
+
+    def diamond(i, j, ends, apexes, children, error):
+        (i1, j1), (i2, j2) = ends
+        any_valid = valid[i, j] | valid[i1, j1] | valid[i2, j2]
+        any_invalid = ~(valid[i, j] & valid[i1, j1] & valid[i2, j2])
+        for ai, aj in apexes:
+            any_valid |= _gather(valid, ai, aj, False)
+            any_invalid |= _gather(~valid, ai, aj, False)
+        for ci, cj in children:
+            error = np.maximum(error, _gather(errors, ci, cj, 0.0))
+            any_valid |= _gather(has_valid, ci, cj, False)
+            any_invalid |= _gather(has_invalid, ci, cj, False)
+        errors[i, j] = np.where(any_valid & any_invalid, np.inf, np.where(any_valid, error, 0.0))
+        has_valid[i, j] = any_valid
+        has_invalid[i, j] = any_invalid
+
+    s = 1
+    while s <= block_size // 2:
+        h = s // 2
+        square = _square_errors(z, valid, s)
+
+        # Midpoints of axis-aligned hypotenuses of length 2s, the diamond is made of the
+        # triangles on both sides of the hypotenuse in the neighbouring squares
+        i, j = np.meshgrid(np.arange(0, rows, 2 * s), np.arange(s, cols, 2 * s), indexing="ij")
+        error = np.zeros(i.shape)
+        error[:-1] = np.maximum(error[:-1], square["south"])
+        error[1:] = np.maximum(error[1:], square["north"])
+        children = [(i + di, j + dj) for di in (-h, h) for dj in (-h, h)] if h else []
+        diamond(i, j, [(i, j - s), (i, j + s)], [(i - s, j), (i + s, j)], children, error)
+
+        i, j = np.meshgrid(np.arange(s, rows, 2 * s), np.arange(0, cols, 2 * s), indexing="ij")
+        error = np.zeros(i.shape)
+        error[:, :-1] = np.maximum(error[:, :-1], square["west"])
+        error[:, 1:] = np.maximum(error[:, 1:], square["east"])
+        children = [(i + di, j + dj) for di in (-h, h) for dj in (-h, h)] if h else []
+        diamond(i, j, [(i - s, j), (i + s, j)], [(i, j - s), (i, j + s)], children, error)
+
+        # Centers of squares of size 2s, the diagonal alternates in a checkerboard pattern
+        i, j = np.meshgrid(np.arange(s, rows, 2 * s), np.arange(s, cols, 2 * s), indexing="ij")
+        main = ((i // (2 * s) + j // (2 * s)) % 2) == 0
+        ends = [(i - s, np.where(main, j - s, j + s)), (i + s, np.where(main, j + s, j - s))]
+        apexes = [(i - s, np.where(main, j + s, j - s)), (i + s, np.where(main, j - s, j + s))]
+        diamond(i, j, ends, apexes, [(i - s, j), (i + s, j), (i, j - s), (i, j + s)], square["center"])
+
+        s *= 2
+
+    return errors
+
+
+def rtin_triangulate(heights, max_error, block_size=RTIN_BLOCK_SIZE):
+    """
+    Triangulates a height grid (NaN = no data) adaptively, so that no grid point deviates
+    more than max_error from the mesh. The grid is padded to squares of block_size + 1 points
+    that are refined together, so the mesh has no cracks, also across the original tile borders.
+    Triangles touching a NaN height are dropped and the remaining ones wound counter-clockwise
+    (row 0 = southern row).
+    Returns (vertex rows, vertex columns, (n, 3) triangle vertex indices), vertices in row-major order.
+    """
+    rows, cols = heights.shape
+    block_size = min(block_size, 1 << max(1, int(np.ceil(np.log2(max(rows, cols, 2) - 1)))))
+    padded_rows = -(-(rows - 1) // block_size) * block_size + 1
+    padded_cols = -(-(cols - 1) // block_size) * block_size + 1
+
+    padded = np.full((padded_rows, padded_cols), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = heights
+    errors = rtin_errors(padded, block_size)
+
+    # Two triangles (a, b, c) per block, hypotenuse a-b, right angle at c
+    bi, bj = np.meshgrid(np.arange(0, padded_rows - 1, block_size), np.arange(0, padded_cols - 1, block_size), indexing="ij")
+    bi, bj = bi.ravel(), bj.ravel()
+    n = block_size
+    main = ((bi // n + bj // n) % 2) == 0
+    a = np.stack([bi, np.where(main, bj, bj + n)], axis=1)
+    b = np.stack([bi + n, np.where(main, bj + n, bj)], axis=1)
+    c1 = np.stack([bi, np.where(main, bj + n, bj)], axis=1)
+    c2 = np.stack([bi + n, np.where(main, bj, bj + n)], axis=1)
+    triangles = np.concatenate([np.stack([a, b, c1], axis=1), np.stack([b, a, c2], axis=1)])
+
+    done = []
+    while len(triangles):
+        a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        m = (a + b) // 2
+        split = (np.abs(a - c).sum(axis=1) > 1) & (errors[m[:, 0], m[:, 1]] > max_error)
+        done.append(triangles[~split])
+        a, b, c, m = a[split], b[split], c[split], m[split]
+        triangles = np.concatenate([np.stack([c, a, m], axis=1), np.stack([b, c, m], axis=1)])
+
+    triangles = np.concatenate(done)
+    valid = ~np.isnan(padded)
+    triangles = triangles[valid[triangles[..., 0], triangles[..., 1]].all(axis=1)]
+
+    # Counter-clockwise in (column, row) = (x, y)
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    area = (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) - (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+    triangles[area < 0] = triangles[area < 0][:, [0, 2, 1]]
+
+    linear = triangles[..., 0] * padded_cols + triangles[..., 1]
+    used, faces = np.unique(linear, return_inverse=True)
+    return used // padded_cols, used % padded_cols, faces.reshape(-1, 3)
@@ -0,0 +1,210 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+_tile_cache_conn = None
+_tile_cache_lock = threading.RLock()
+
+
+def open_tile_cache(manifest_path):
+    """
+    Opens (or creates) the SQLite manifest that indexes all cached tiles in TMP_PATH.
+    Every downloaded source file is a row in 'tiles'; files generated from it
+    (CityJSON from a GML, the ASCII grid from a DGM5 ZIP, ...) are rows in 'derived'.
+    """
+    global _tile_cache_conn
+
+    with _tile_cache_lock:
+        if _tile_cache_conn is not None:
+            _tile_cache_conn.close()
+
+        # Several Blender processes of a batch (BATCH_WORKERS > 1) write the same manifest; WAL lets readers
+        # go on while one of them writes, and writers wait up to a minute for the lock instead of 5 seconds
+        conn = sqlite3.connect(manifest_path, timeout=60, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tiles (
+                path TEXT PRIMARY KEY,
+                kind TEXT,
+                url TEXT,
+                size INTEGER,
+                hash_type TEXT,
+                hash TEXT,
+                created REAL,
+                last_access REAL
+            );
+            CREATE TABLE IF NOT EXISTS derived (
+                path TEXT PRIMARY KEY,
+                source TEXT NOT NULL REFERENCES tiles(path) ON DELETE CASCADE,
+                kind TEXT,
+                size INTEGER,
+                created REAL
+            );
+            CREATE INDEX IF NOT EXISTS tiles_last_access ON tiles(last_access);
+            CREATE INDEX IF NOT EXISTS derived_source ON derived(source, kind);
+        """)
+        conn.commit()
+        _tile_cache_conn = conn
+
+    return conn
+
+
+def _cache_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def cache_get_source(path):
+    """Returns the manifest row of a cached source file as a dict, or None if it is not indexed."""
+    if _tile_cache_conn is None:
+        return None
+    with _tile_cache_lock:
+        row = _tile_cache_conn.execute("SELECT * FROM tiles WHERE path = ?", (_cache_key(path),)).fetchone()
+    return dict(row) if row else None
+
+
+def cache_record_source(path, kind, url, hash_type=None, hash_value=None):
+    """Adds or replaces a downloaded source file in the manifest. Files derived from an older version are deleted."""
+    if _tile_cache_conn is None:
+        return
+    now = time.time()
+    key = _cache_key(path)
+    with _tile_cache_lock:
+        for row in _tile_cache_conn.execute("SELECT path FROM derived WHERE source = ?", (key,)).fetchall():
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+        _tile_cache_conn.execute("DELETE FROM tiles WHERE path = ?", (key,))
+        _tile_cache_conn.execute(
+            "INSERT INTO tiles (path, kind, url, size, hash_type, hash, created, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, url, os.path.getsize(path), hash_type, hash_value, now, now)
+        )
+        _tile_cache_conn.commit()
+
+
+def cache_record_derived(source_path, path, kind):
+    """Registers a file generated from a cached source file, so both are evicted together."""
+    if _tile_cache_conn is None:
+        return
+    with _tile_cache_lock:
+        if cache_get_source(source_path) is None:
+            return
+        _tile_cache_conn.execute(
+            "INSERT OR REPLACE INTO derived (path, source, kind, size, created) VALUES (?, ?, ?, ?, ?)",
+            (_cache_key(path), _cache_key(source_path), kind, os.path.getsize(path), time.time())
+        )
+        _tile_cache_conn.commit()
+
+
+def cache_get_derived(source_path, kind):
+    """
+    Returns the path of a file of the given kind derived from source_path, or None.
+    Entries whose file has disappeared from disk are removed from the manifest.
+    """
+    if _tile_cache_conn is None:
+        return None
+    with _tile_cache_lock:
+        row = _tile_cache_conn.execute(
+            "SELECT path FROM derived WHERE source = ? AND kind = ?", (_cache_key(source_path), kind)
+        ).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(row["path"]):
+            _tile_cache_conn.execute("DELETE FROM derived WHERE path = ?", (row["path"],))
+            _tile_cache_conn.commit()
+            return None
+    return row["path"]
+
+
+def cache_find_source(path):
+    """Returns the source file a derived file was made from, the path itself if it is a source, or None."""
+    if _tile_cache_conn is None:
+        return None
+    key = _cache_key(path)
+    with _tile_cache_lock:
+        row = _tile_cache_conn.execute("SELECT source FROM derived WHERE path = ?", (key,)).fetchone()
+        if row is not None:
+            return row["source"]
+        row = _tile_cache_conn.execute("SELECT path FROM tiles WHERE path = ?", (key,)).fetchone()
+    return row["path"] if row else None
+
+
+def cache_touch(paths):
+    """Marks source files as used now, which moves them to the back of the eviction order."""
+    if _tile_cache_conn is None:
+        return
+    now = time.time()
+    with _tile_cache_lock:
+        _tile_cache_conn.executemany(
+            "UPDATE tiles SET last_access = ? WHERE path = ?", [(now, _cache_key(p)) for p in paths]
+        )
+        _tile_cache_conn.commit()
+
+
+def cache_remove(path):
+    """
+    Deletes a source file together with all its derived files from disk and from the manifest.
+    Returns the number of bytes freed.
+    """
+    if _tile_cache_conn is None:
+        return 0
+    key = _cache_key(path)
+    freed = 0
+    with _tile_cache_lock:
+        derived = _tile_cache_conn.execute("SELECT path, size FROM derived WHERE source = ?", (key,)).fetchall()
+        source = _tile_cache_conn.execute("SELECT path, size FROM tiles WHERE path = ?", (key,)).fetchone()
+        for row in list(derived) + ([source] if source else []):
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+            freed += row["size"] or 0
+        _tile_cache_conn.execute("DELETE FROM tiles WHERE path = ?", (key,))
+        _tile_cache_conn.commit()
+    return freed
+
+
+def cache_total_size():
+    """Returns the bytes used by all indexed source and derived files."""
+    if _tile_cache_conn is None:
+        return 0
+    with _tile_cache_lock:
+        tiles = _tile_cache_conn.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        derived = _tile_cache_conn.execute("SELECT COALESCE(SUM(size), 0) FROM derived").fetchone()[0]
+    return tiles + derived
+
+
+def enforce_cache_budget(budget_bytes, keep_paths=()):
+    """
+    Evicts the least recently used tiles (with their derived files) until the cache fits into budget_bytes.
+    Files in keep_paths (source or derived) are never evicted, so the tiles of the current run stay available.
+    """
+    if _tile_cache_conn is None or not budget_bytes:
+        return
+
+    total = cache_total_size()
+    if total <= budget_bytes:
+        return
+
+    keep = {_cache_key(p) for p in keep_paths if p}
+    with _tile_cache_lock:
+        # Derived files in keep_paths protect the source file they were made from
+        for key in list(keep):
+            row = _tile_cache_conn.execute("SELECT source FROM derived WHERE path = ?", (key,)).fetchone()
+            if row is not None:
+                keep.add(row["source"])
+    print(f"Tile cache uses {total / 1024**3:.2f} GB, budget is {budget_bytes / 1024**3:.2f} GB. Evicting...")
+
+    with _tile_cache_lock:
+        rows = _tile_cache_conn.execute("SELECT path FROM tiles ORDER BY last_access ASC").fetchall()
+
+    evicted = 0
+    for row in rows:
+        if total <= budget_bytes:
+            break
+        if row["path"] in keep:
+            continue
+        total -= cache_remove(row["path"])
+        evicted += 1
+
+    print(f"Evicted {evicted} tile(s), cache now uses {total / 1024**3:.2f} GB.")
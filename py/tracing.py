@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+_trace_spans = []
+_trace_lock = threading.Lock()
+_trace_started = time.perf_counter()
+_trace_phase = None
+
+
+def process_rss():
+    """Returns the resident memory of this process in bytes, or None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def start_trace():
+    """Discards all recorded spans and restarts the trace clock, called once at the start of a run."""
+    global _trace_started, _trace_phase
+    with _trace_lock:
+        _trace_spans.clear()
+        _trace_started = time.perf_counter()
+        _trace_phase = None
+
+
+@contextmanager
+def trace_span(name, category="file", **args):
+    """
+    Records the wall time and the memory (RSS) after a block of work:
+
+        with trace_span("download", "download", file=name) as span:
+            ...
+            span["bytes"] = size
+
+    Values put into the yielded dict (bytes, vertices, faces, ...) are stored with the span.
+    Spans of all threads are collected; exceptions are recorded and re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        ended = time.perf_counter()
+        thread = threading.current_thread()
+        span = {
+            "name": name,
+            "category": category,
+            "start": started - _trace_started,
+            "seconds": ended - started,
+            "thread": thread.name,
+            "thread_id": thread.ident,
+            "rss": process_rss(),
+            "args": args
+        }
+        with _trace_lock:
+            _trace_spans.append(span)
+
+
+def trace_phase(name):
+    """
+    Ends the current phase span of main.py and starts a new one called name (None only ends it).
+    Phases follow each other, so this fits between the print_header banners without indenting them.
+    """
+    global _trace_phase
+    now = time.perf_counter()
+    with _trace_lock:
+        if _trace_phase is not None:
+            phase_name, started = _trace_phase
+            _trace_spans.append({
+                "name": phase_name,
+                "category": "phase",
+                "start": started - _trace_started,
+                "seconds": now - started,
+                "thread": threading.main_thread().name,
+                "thread_id": threading.main_thread().ident,
+                "rss": process_rss(),
+                "args": {}
+            })
+        _trace_phase = (name, now) if name is not None else None
+
+
+def trace_summary():
+    """
+    Returns the seconds per phase, the seconds and counts per category, the total time and the peak RSS of the run.
+    errors counts the spans that raised or failed (e.g. downloads), droppedItems the items pipeline stages left out.
+    """
+    with _trace_lock:
+        spans = list(_trace_spans)
+
+    categories = {}
+    for span in spans:
+        if span["category"] == "phase":
+            continue
+        category = categories.setdefault(span["category"], {"count": 0, "seconds": 0.0, "bytes": 0, "vertices": 0, "faces": 0})
+        category["count"] += 1
+        category["seconds"] = round(category["seconds"] + span["seconds"], 3)
+        for key in ("bytes", "vertices", "faces"):
+            category[key] += span["args"].get(key) or 0
+
+    rss_values = [span["rss"] for span in spans if span["rss"] is not None]
+    return {
+        "totalSeconds": round(time.perf_counter() - _trace_started, 3),
+        "peakRssMB": round(max(rss_values) / 1024**2, 1) if rss_values else None,
+        "phases": {span["name"]: round(span["seconds"], 3) for span in spans if span["category"] == "phase"},
+        "operations": categories,
+        "errors": sum(1 for span in spans if "error" in span["args"] or span["args"].get("failed")),
+        "droppedItems": sum(span["args"].get("dropped") or 0 for span in spans)
+    }
+
+
+def write_trace_files(output_dir, name):
+    """
+    Writes the recorded spans of the run to output_dir:
+    {name}_report.json with every span and the trace_summary, and {name}_trace.json in the
+    Chrome trace event format, which can be opened in chrome://tracing or ui.perfetto.dev.
+    Returns (summary, report path, trace path).
+    """
+    trace_phase(None)
+    summary = trace_summary()
+    with _trace_lock:
+        spans = sorted(_trace_spans, key=lambda span: span["start"])
+
+    report_path = os.path.join(output_dir, f"{name}_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "spans": spans}, f, indent=2, default=str)
+
+    pid = os.getpid()
+    events = []
+    for thread_id, thread_name in {span["thread_id"]: span["thread"] for span in spans}.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    for span in spans:
+        events.append({
+            "name": span["name"] if span["category"] == "phase" else f"{span['name']} {span['args'].get('file', '')}".strip(),
+            "cat": span["category"],
+            "ph": "X",
+            "ts": round(span["start"] * 1e6),
+            "dur": round(span["seconds"] * 1e6),
+            "pid": pid,
+            "tid": span["thread_id"],
+            "args": span["args"]
+        })
+        if span["rss"] is not None:
+            events.append({
+                "name": "RSS (MB)",
+                "ph": "C",
+                "ts": round((span["start"] + span["seconds"]) * 1e6),
+                "pid": pid,
+                "args": {"rss": round(span["rss"] / 1024**2, 1)}
+            })
+
+    trace_path = os.path.join(output_dir, f"{name}_trace.json")
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    return summary, report_path, trace_path
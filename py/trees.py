@@ -1,100 +1,311 @@
 
 from urllib.parse import urlparse
-import geopandas as gpd
-import fiona
-from tqdm import tqdm
-import mathutils
+import hashlib
+import time
+import numpy as np
+import shapely
+
+
+# Unit cube used for every tree: x/y in [-1, 1] (scaled by half the crown width), z in [0, 1] (scaled by the height)
+TREE_CUBE_VERTICES = np.array([
+    (-1, -1, 0),
+    ( 1, -1, 0),
+    ( 1,  1, 0),
+    (-1,  1, 0),
+    (-1, -1, 1),
+    ( 1, -1, 1),
+    ( 1,  1, 1),
+    (-1,  1, 1),
+], dtype=np.float64)
+TREE_CUBE_FACES = np.array([
+    (0, 1, 2, 3),
+    (4, 5, 6, 7),
+    (0, 1, 5, 4),
+    (2, 3, 7, 6),
+    (1, 2, 6, 5),
+    (3, 0, 4, 7)
+], dtype=np.int32)
+TREE_CROWN_RATIO = 0.6  # width-to-height ratio of the tree cubes
+
+
+def read_tree_layer(path, layer, bbox):
+    """
+    Reads the trees of one GeoPackage layer inside bbox as flat arrays, one entry per tree point.
+    The MultiPoints are exploded with shapely in one call, the attributes repeated per point.
+    Returns a dict with "x", "y", "dgm_height" and "height".
+    """
+    # geopandas is only needed when the tree cache has to be filled
+    import geopandas as gpd
 
+    gdf = gpd.read_file(path, layer=layer, bbox=bbox)
+    gdf = gdf[gdf.geom_type == "MultiPoint"]
 
-def gen_tree_download_list(raw_download_list):
-    file_list = []
+    geometries = gdf.geometry.values
+    counts = shapely.get_num_geometries(geometries)
+    coordinates = shapely.get_coordinates(geometries)
 
-    for url in raw_download_list:
-        filename = os.path.basename(urlparse(url).path)
-        file_list.append({"name": filename, "url": url, "local": None})
+    return {
+        "x": coordinates[:, 0],
+        "y": coordinates[:, 1],
+        "dgm_height": np.repeat(gdf["dgmhoehe"].to_numpy(dtype=np.float64), counts),
+        "height": np.repeat(gdf["baumhoehe"].to_numpy(dtype=np.float64), counts)
+    }
 
-    return file_list
 
-def parse_metalink(metalink_path):
+def read_tree_layer_arrow(path, layer, bbox, batch_size=TREE_BATCH_SIZE):
+    """
+    Streaming variant of read_tree_layer: reads the features inside bbox in batches of batch_size
+    through pyogrio's Arrow interface. Each batch is decoded from WKB and its points are written
+    into one buffer of point columns right away (grown by doubling), so no GeoDataFrame and no list
+    of per-batch arrays is built. Peak memory is the point columns of the result plus one batch.
+    Prints the throughput in features per second.
     """
-    Parses a .metalink file and returns a list of dictionaries:
-    [{"name": filename, "url": download_url, "local": None}, ...]
-    Only takes the first URL for each file.
+    import pyogrio
+
+    # Rows x, y, dgm_height, height; each row is contiguous, so the returned columns are views
+    points = np.empty((4, batch_size), dtype=np.float64)
+    count = 0
+    features = 0
+    start = time.perf_counter()
+
+    with pyogrio.open_arrow(path, layer=layer, bbox=bbox, columns=["baumhoehe", "dgmhoehe"],
+                            batch_size=batch_size, use_pyarrow=True) as source:
+        meta, reader = source
+        for batch in reader:
+            features += batch.num_rows
+            geometries = shapely.from_wkb(batch.column(meta["geometry_name"] or "wkb_geometry").to_numpy(zero_copy_only=False))
+            is_multipoint = shapely.get_type_id(geometries) == shapely.GeometryType.MULTIPOINT
+            geometries = geometries[is_multipoint]
+
+            counts = shapely.get_num_geometries(geometries)
+            coordinates = shapely.get_coordinates(geometries)
+            end = count + len(coordinates)
+            if end > points.shape[1]:
+                grown = np.empty((4, max(end, 2 * points.shape[1])), dtype=np.float64)
+                grown[:, :count] = points[:, :count]
+                points = grown
+            points[0, count:end] = coordinates[:, 0]
+            points[1, count:end] = coordinates[:, 1]
+            points[2, count:end] = np.repeat(batch.column("dgmhoehe").to_numpy(zero_copy_only=False)[is_multipoint], counts)
+            points[3, count:end] = np.repeat(batch.column("baumhoehe").to_numpy(zero_copy_only=False)[is_multipoint], counts)
+            count = end
+
+    elapsed = time.perf_counter() - start
+    print(f"Read {features} features from layer {layer} in {elapsed:.1f} s ({features / max(elapsed, 1e-9):.0f} features/s)")
+
+    return {name: points[i, :count] for i, name in enumerate(("x", "y", "dgm_height", "height"))}
+
+
+def tree_cache_path(path, bbox, cache_dir, version=None):
     """
-    tree = ET.parse(metalink_path)
-    root = tree.getroot()
-    
-    # Metalink namespace
-    ns = {"ml": "urn:ietf:params:xml:ns:metalink"}
+    Returns the path of the cached tree points of a GeoPackage and bbox.
+    The key contains the size and modification time of the GeoPackage (or the given version of a
+    remote GeoPackage), so a changed file gets a new cache entry.
+    """
+    if version is None:
+        stat = os.stat(path)
+        version = f"{stat.st_size}:{stat.st_mtime_ns}"
+    key = f"{version}:" + ",".join(f"{v:.2f}" for v in bbox)
+    name = os.path.splitext(os.path.basename(urlparse(path).path))[0]
+    return os.path.join(cache_dir, f"{name}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.npz")
 
-    file_list = []
-    for file_elem in root.findall("ml:file", ns):
-        filename = file_elem.get("name")
-        url_elem = file_elem.find("ml:url", ns)
-        if url_elem is not None and url_elem.text:
-            file_list.append({"name": filename, "url": url_elem.text, "local": None})
 
-    return file_list
+def load_tree_layers(path, bbox, cache_dir=None):
+    """
+    Returns {layer name: tree point arrays (see read_tree_layer)} for all layers of a GeoPackage inside bbox.
+    If cache_dir is set, the points are stored there as a compressed .npz file (one column per attribute
+    plus a layer index) and loaded from it on the next run with the same file and bbox, without geopandas.
+    The cache file is registered in the tile cache as derived from the GeoPackage; the cache file of a remote
+    GeoPackage, which has no entry of its own, is recorded as a source file with the URL of the GeoPackage.
+    If path is an http(s) URL, the GeoPackage is read remotely with Range requests (see gpkg_remote.py).
+    """
+    remote = RemoteGeoPackage(path) if path.startswith(("http://", "https://")) else None
+    version = f"{remote.file.size}:{remote.file.version}" if remote else None
+
+    cache_file = tree_cache_path(path, bbox, cache_dir, version) if cache_dir else None
+    if cache_file and os.path.exists(cache_file) and not REPLACE_EXISTING_FILES:
+        print(f"Loading trees from cache: {cache_file}")
+        if remote and cache_get_source(cache_file) is None:
+            cache_record_source(cache_file, "tree_points", path)
+        cache_touch([cache_file if remote else path])
+        with np.load(cache_file) as data:
+            layer_names = data["layer_names"].tolist()
+            layer_index = data["layer"]
+            return {
+                layer: {column: data[column][layer_index == i] for column in ("x", "y", "dgm_height", "height")}
+                for i, layer in enumerate(layer_names)
+            }
+
+    if remote:
+        result = read_remote_tree_layers(remote, bbox)
+    else:
+        # List all layers
+        if TREE_READER == "arrow":
+            import pyogrio
+            layers = pyogrio.list_layers(path)[:, 0].tolist()
+        else:
+            import fiona
+            layers = fiona.listlayers(path)
+        print("Layers found in GeoPackage:", layers)
 
+        result = {}
+        for layer in layers:
+            print(f"\nReading layer: {layer}")
+            if TREE_READER == "arrow":
+                result[layer] = read_tree_layer_arrow(path, layer, bbox)
+            else:
+                result[layer] = read_tree_layer(path, layer, bbox)
+    layers = list(result)
+
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file + ".part", "wb") as f:
+            np.savez_compressed(
+                f,
+                layer_names=np.array(layers, dtype=str),
+                layer=np.concatenate([np.full(len(result[layer]["x"]), i, dtype=np.int32) for i, layer in enumerate(layers)] or [np.zeros(0, dtype=np.int32)]),
+                **{column: np.concatenate([result[layer][column] for layer in layers] or [np.zeros(0)])
+                   for column in ("x", "y", "dgm_height", "height")}
+            )
+        os.replace(cache_file + ".part", cache_file)
+        if remote:
+            cache_record_source(cache_file, "tree_points", path)
+        else:
+            cache_record_derived(path, cache_file, "tree_points")
+
+    return result
+
+
+def tree_cube_arrays(x, y, z, height, ratio=TREE_CROWN_RATIO):
+    """
+    Builds one cube per tree from the template cube with NumPy broadcasting.
+    The cube stands on z and is height tall and height * ratio wide.
+    Returns ((n * 8, 3) vertices, (n * 6, 4) face vertex indices).
+    """
+    half_width = (height * ratio / 2)[:, None]
+    vertices = np.empty((len(x), 8, 3), dtype=np.float64)
+    vertices[:, :, 0] = x[:, None] + TREE_CUBE_VERTICES[:, 0] * half_width
+    vertices[:, :, 1] = y[:, None] + TREE_CUBE_VERTICES[:, 1] * half_width
+    vertices[:, :, 2] = z[:, None] + TREE_CUBE_VERTICES[:, 2] * height[:, None]
+
+    faces = TREE_CUBE_FACES[None, :, :] + (np.arange(len(x), dtype=np.int32) * 8)[:, None, None]
+    return vertices.reshape(-1, 3), faces.reshape(-1, 4)
+
+
+def create_tree_prototype(collection_name="TreePrototype"):
+    """
+    Returns the object that is instanced for every tree, creating it from the template cube if needed.
+    It lives in its own collection, which is hidden in the viewport and in renders;
+    replace the mesh of this object to change the look of all trees at once.
+    """
+    if "TreePrototype" in bpy.data.objects:
+        return bpy.data.objects["TreePrototype"]
+
+    collection = get_or_create_collection(collection_name)
+    collection.hide_viewport = True
+    collection.hide_render = True
+
+    mesh = create_mesh_from_arrays("TreePrototype_mesh", TREE_CUBE_VERTICES, TREE_CUBE_FACES.ravel(), np.full(len(TREE_CUBE_FACES), 4))
+    prototype = bpy.data.objects.new("TreePrototype", mesh)
+    collection.objects.link(prototype)
+    return prototype
 
-def create_cube(x, y, z, height, ratio, name, collection_name):
-    if collection_name in bpy.data.collections:
-        collection = bpy.data.collections[collection_name]
-    else:
-        collection = bpy.data.collections.new(collection_name)
-        bpy.context.scene.collection.children.link(collection)
 
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.ops.mesh.primitive_cube_add(location=(x, y, z + height/2))
-    cube = bpy.context.active_object
-    cube.name = "MyCube"
-    cube.scale = ((height*ratio)/2, (height*ratio)/2, height/2)
+def create_tree_instance_nodes(prototype, name="TreeInstances"):
+    """
+    Returns the geometry nodes group that puts one instance of prototype on every tree point.
+    The instances are scaled by the "height" and "crown_ratio" point attributes. The group ends in a
+    muted Realize Instances node that is switched on by set_tree_instances_realized() when exporting.
+    """
+    if name in bpy.data.node_groups:
+        return bpy.data.node_groups[name]
+
+    group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    if bpy.app.version >= (4, 0, 0):
+        group.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        group.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    else:
+        # Blender 3.x declares the group sockets on the node group itself
+        group.inputs.new('NodeSocketGeometry', "Geometry")
+        group.outputs.new('NodeSocketGeometry', "Geometry")
+    nodes, links = group.nodes, group.links
+
+    group_input = nodes.new('NodeGroupInput')
+    group_output = nodes.new('NodeGroupOutput')
+
+    object_info = nodes.new('GeometryNodeObjectInfo')
+    object_info.inputs["Object"].default_value = prototype
+    object_info.inputs["As Instance"].default_value = True
+
+    height = nodes.new('GeometryNodeInputNamedAttribute')
+    height.data_type = 'FLOAT'
+    height.inputs["Name"].default_value = "height"
+    crown_ratio = nodes.new('GeometryNodeInputNamedAttribute')
+    crown_ratio.data_type = 'FLOAT'
+    crown_ratio.inputs["Name"].default_value = "crown_ratio"
+
+    # The prototype is 2 wide and 1 tall, so the x/y scale is half the crown width
+    crown_width = nodes.new('ShaderNodeMath')
+    crown_width.operation = 'MULTIPLY'
+    links.new(height.outputs["Attribute"], crown_width.inputs[0])
+    links.new(crown_ratio.outputs["Attribute"], crown_width.inputs[1])
+    half_width = nodes.new('ShaderNodeMath')
+    half_width.operation = 'MULTIPLY'
+    half_width.inputs[1].default_value = 0.5
+    links.new(crown_width.outputs["Value"], half_width.inputs[0])
+
+    scale = nodes.new('ShaderNodeCombineXYZ')
+    links.new(half_width.outputs["Value"], scale.inputs["X"])
+    links.new(half_width.outputs["Value"], scale.inputs["Y"])
+    links.new(height.outputs["Attribute"], scale.inputs["Z"])
+
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+    links.new(group_input.outputs["Geometry"], instance.inputs["Points"])
+    links.new(object_info.outputs["Geometry"], instance.inputs["Instance"])
+    links.new(scale.outputs["Vector"], instance.inputs["Scale"])
+
+    realize = nodes.new('GeometryNodeRealizeInstances')
+    realize.name = "Realize Trees"
+    realize.mute = True
+    links.new(instance.outputs["Instances"], realize.inputs["Geometry"])
+    links.new(realize.outputs["Geometry"], group_output.inputs["Geometry"])
+
+    return group
+
+
+def set_tree_instances_realized(realized, name="TreeInstances"):
+    """Switches the Realize Instances node of the tree instancing nodes on (e.g. for exporting) or off."""
+    group = bpy.data.node_groups.get(name)
+    if group is None:
+        return
+    group.nodes["Realize Trees"].mute = not realized
 
-    for coll in cube.users_collection:
-        coll.objects.unlink(cube)
-    collection.objects.link(cube)
 
-def create_cube_fast(x, y, z, height, ratio, name, collection):
-    # Create mesh and object directly (avoids bpy.ops)
+def create_tree_points(name, x, y, z, height, ratio, collection):
+    """
+    Creates an object with one vertex per tree at its base, carrying "height", "crown_ratio" and
+    "dgm_height" as point attributes, and instances the tree prototype on it with geometry nodes.
+    """
     mesh = bpy.data.meshes.new(name + "_mesh")
-    cube = bpy.data.objects.new(name, mesh)
-
-    # Link to collection
-    collection.objects.link(cube)
-
-    # Define geometry (8 vertices of a cube)
-    hw = (height * ratio) / 2
-    hh = height / 2
-    verts = [
-        (-hw, -hw, -hh),
-        ( hw, -hw, -hh),
-        ( hw,  hw, -hh),
-        (-hw,  hw, -hh),
-        (-hw, -hw,  hh),
-        ( hw, -hw,  hh),
-        ( hw,  hw,  hh),
-        (-hw,  hw,  hh),
-    ]
-    faces = [
-        (0, 1, 2, 3),
-        (4, 5, 6, 7),
-        (0, 1, 5, 4),
-        (2, 3, 7, 6),
-        (1, 2, 6, 5),
-        (3, 0, 4, 7)
-    ]
-
-    # Create mesh geometry
-    mesh.from_pydata(verts, [], faces)
+    mesh.vertices.add(len(x))
+    mesh.vertices.foreach_set("co", np.column_stack([x, y, z]).astype(np.float32).ravel())
+    for attribute, values in (("height", height), ("crown_ratio", np.full(len(x), ratio)), ("dgm_height", z)):
+        mesh.attributes.new(attribute, 'FLOAT', 'POINT').data.foreach_set("value", np.asarray(values, dtype=np.float32))
     mesh.update()
 
-    # Set cube location
-    cube.location = mathutils.Vector((x, y, z + hh))
+    obj = bpy.data.objects.new(name, mesh)
+    collection.objects.link(obj)
 
-    return cube
+    modifier = obj.modifiers.new("TreeInstances", 'NODES')
+    modifier.node_group = create_tree_instance_nodes(create_tree_prototype())
+    return obj
 
 
-def import_trees(files, min_x, min_y, max_x, max_y, origin_utm32_x, origin_utm32_y, collection_name="Trees"):
+def import_trees(files, bbox, frame, collection_name="Trees", cache_dir=None):
+    """
+    Imports the trees inside bbox (UTM32 min_x, min_y, max_x, max_y) of the given GeoPackages,
+    one object per layer, placed in the local coordinates of frame.
+    """
     if collection_name in bpy.data.collections:
         collection = bpy.data.collections[collection_name]
     else:
@@ -108,65 +319,42 @@ def import_trees(files, min_x, min_y, max_x, max_y, origin_utm32_x, origin_utm32
     for file_info in files:
         print(f"Importing GPKG: {file_info['name']}")
 
-        # List all layers
-        layers = fiona.listlayers(file_info['local'])
-        print("Layers found in GeoPackage:", layers)
+        # With TREE_REMOTE_READ the GeoPackage is not downloaded and read from its URL instead
+        source = file_info['url'] if TREE_REMOTE_READ else file_info['local']
+        with trace_span("read", "import", file=file_info['name']) as span:
+            layers = load_tree_layers(source, bbox, cache_dir)
+            span["trees"] = sum(len(trees["x"]) for trees in layers.values())
 
         # Iterate over all layers
-        for layer in layers:
+        for layer, trees in layers.items():
             print(f"\nProcessing layer: {layer}")
-            gdf = gpd.read_file(file_info['local'], layer=layer, bbox=(min_x, min_y, max_x, max_y))
-            total_trees = len(gdf)
+            total_trees = len(trees["x"])
             print(f"Total number of trees in this layer: {total_trees}")
 
-            # Create trees object
-            mesh = bpy.data.meshes.new(f"trees_{layer}" + "_mesh")
-            cube = bpy.data.objects.new(f"trees_{layer}", mesh)
-            collection.objects.link(cube)
-
-            faces = []
-            verts = []
-            i = 0
-            ratio = 0.6  # width-to-height ratio of the tree cubes
-
-            for idx, row in tqdm(gdf.iterrows()):
-                geom = row.geometry
-                if geom.geom_type != "MultiPoint":
+            with trace_span("mesh", "import", file=f"trees_{layer}") as span:
+                span["trees"] = total_trees
+                local_x, local_y = frame.utm32_to_local(trees["x"], trees["y"])
+                if TREE_REPRESENTATION == "instances":
+                    create_tree_points(
+                        f"trees_{layer}",
+                        local_x,
+                        local_y,
+                        trees["dgm_height"],
+                        trees["height"],
+                        TREE_CROWN_RATIO,
+                        collection
+                    )
                     continue
 
-                height = row.baumhoehe
-                z = row.dgmhoehe
-
-                for point in geom.geoms:
-                    x, y = point.x, point.y
-
-                    x -= origin_utm32_x
-                    y -= origin_utm32_y
-
-                    # Add geometry (8 vertices of a cube)
-                    hw = (height * ratio) / 2
-                    hh = height / 2
-                    z = z + hh  # center the cube vertically
-                    i = len(verts)
-                    verts.append((x-hw, y-hw, z-hh) )
-                    verts.append(( x+hw, y-hw, z-hh))
-                    verts.append(( x+hw, y+hw, z-hh))
-                    verts.append(( x-hw, y+hw, z-hh))
-                    verts.append(( x-hw, y-hw, z+hh))
-                    verts.append(( x+hw, y-hw, z+hh))
-                    verts.append(( x+hw, y+hw, z+hh))
-                    verts.append(( x-hw, y+hw, z+hh))
-
-                    faces.append((i+0, i+1, i+2, i+3))
-                    faces.append((i+4, i+5, i+6, i+7))
-                    faces.append((i+0, i+1, i+5, i+4))
-                    faces.append((i+2, i+3, i+7, i+6))
-                    faces.append((i+1, i+2, i+6, i+5))
-                    faces.append((i+3, i+0, i+4, i+7))
-
-            # Create mesh geometry
-            mesh.from_pydata(verts, [], faces)
-            mesh.update()
-
-                    #create_cube_fast(x-origin_utm32_x, y-origin_utm32_y, z, height, 0.6, f"tree_{layer}_{idx + 1}", collection)
-                    #print(f"Tree {idx + 1}: Location=({x:.2f}, {y:.2f}, {z:.2f}), Height={height}m")
\ No newline at end of file
+                verts, faces = tree_cube_arrays(
+                    local_x,
+                    local_y,
+                    trees["dgm_height"],
+                    trees["height"]
+                )
+
+                # Create trees object
+                span["vertices"], span["faces"] = len(verts), len(faces)
+                mesh = create_mesh_from_arrays(f"trees_{layer}" + "_mesh", verts, faces.ravel(), np.full(len(faces), 4))
+                cube = bpy.data.objects.new(f"trees_{layer}", mesh)
+                collection.objects.link(cube)
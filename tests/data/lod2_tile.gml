@@ -0,0 +1,40 @@
+<?xml version="1.0" encoding="UTF-8"?>
+<core:CityModel xmlns:core="http://www.opengis.net/citygml/2.0" xmlns:bldg="http://www.opengis.net/citygml/building/2.0" xmlns:gml="http://www.opengis.net/gml" xmlns:gen="http://www.opengis.net/citygml/generics/2.0" xmlns:xlink="http://www.w3.org/1999/xlink">
+<core:cityObjectMember>
+<bldg:Building gml:id="B1">
+<gen:stringAttribute name="Gemeindeschluessel"><gen:value>09663000</gen:value></gen:stringAttribute>
+<bldg:function>31001_1000</bldg:function>
+<bldg:roofType>1000</bldg:roofType>
+<bldg:measuredHeight uom="m">7.5</bldg:measuredHeight>
+<bldg:lod2Solid><gml:Solid><gml:exterior><gml:CompositeSurface><gml:surfaceMember xlink:href="#B1_P0"/><gml:surfaceMember xlink:href="#B1_P1"/><gml:surfaceMember xlink:href="#B1_P2"/><gml:surfaceMember xlink:href="#B1_P3"/><gml:surfaceMember xlink:href="#B1_P4"/><gml:surfaceMember xlink:href="#B1_P5"/></gml:CompositeSurface></gml:exterior></gml:Solid></bldg:lod2Solid>
+<bldg:boundedBy><bldg:GroundSurface gml:id="B1_S0"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P0"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690100.0 5334100.0 100.0 690100.0 5334110.0 100.0 690110.0 5334110.0 100.0 690110.0 5334100.0 100.0 690100.0 5334100.0 100.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:GroundSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:RoofSurface gml:id="B1_S1"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P1"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690100.0 5334100.0 107.5 690110.0 5334100.0 107.5 690110.0 5334110.0 107.5 690100.0 5334110.0 107.5 690100.0 5334100.0 107.5</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:RoofSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B1_S2"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P2"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690100.0 5334100.0 100.0 690110.0 5334100.0 100.0 690110.0 5334100.0 107.5 690100.0 5334100.0 107.5 690100.0 5334100.0 100.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B1_S3"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P3"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690110.0 5334100.0 100.0 690110.0 5334110.0 100.0 690110.0 5334110.0 107.5 690110.0 5334100.0 107.5 690110.0 5334100.0 100.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B1_S4"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P4"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690110.0 5334110.0 100.0 690100.0 5334110.0 100.0 690100.0 5334110.0 107.5 690110.0 5334110.0 107.5 690110.0 5334110.0 100.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B1_S5"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B1_P5"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690100.0 5334110.0 100.0 690100.0 5334100.0 100.0 690100.0 5334100.0 107.5 690100.0 5334110.0 107.5 690100.0 5334110.0 100.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+</bldg:Building>
+</core:cityObjectMember>
+<core:cityObjectMember>
+<bldg:Building gml:id="B2">
+<bldg:function>31001_2000</bldg:function>
+<bldg:consistsOfBuildingPart><bldg:BuildingPart gml:id="B2_1">
+<bldg:roofType>1000</bldg:roofType>
+<bldg:measuredHeight uom="m">5.0</bldg:measuredHeight>
+<bldg:lod2Solid><gml:Solid><gml:exterior><gml:CompositeSurface><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 101.0 690200.0 5334206.0 101.0 690208.0 5334206.0 101.0 690208.0 5334200.0 101.0 690200.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 106.0 690208.0 5334200.0 106.0 690208.0 5334206.0 106.0 690200.0 5334206.0 106.0 690200.0 5334200.0 106.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 101.0 690208.0 5334200.0 101.0 690208.0 5334200.0 106.0 690200.0 5334200.0 106.0 690200.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690208.0 5334200.0 101.0 690208.0 5334206.0 101.0 690208.0 5334206.0 106.0 690208.0 5334200.0 106.0 690208.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690208.0 5334206.0 101.0 690200.0 5334206.0 101.0 690200.0 5334206.0 106.0 690208.0 5334206.0 106.0 690208.0 5334206.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334206.0 101.0 690200.0 5334200.0 101.0 690200.0 5334200.0 106.0 690200.0 5334206.0 106.0 690200.0 5334206.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:CompositeSurface></gml:exterior></gml:Solid></bldg:lod2Solid>
+<bldg:boundedBy><bldg:GroundSurface gml:id="B2_1_S0"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P0"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 101.0 690200.0 5334206.0 101.0 690208.0 5334206.0 101.0 690208.0 5334200.0 101.0 690200.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:GroundSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:RoofSurface gml:id="B2_1_S1"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P1"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 106.0 690208.0 5334200.0 106.0 690208.0 5334206.0 106.0 690200.0 5334206.0 106.0 690200.0 5334200.0 106.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:RoofSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B2_1_S2"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P2"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334200.0 101.0 690208.0 5334200.0 101.0 690208.0 5334200.0 106.0 690200.0 5334200.0 106.0 690200.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B2_1_S3"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P3"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690208.0 5334200.0 101.0 690208.0 5334206.0 101.0 690208.0 5334206.0 106.0 690208.0 5334200.0 106.0 690208.0 5334200.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B2_1_S4"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P4"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690208.0 5334206.0 101.0 690200.0 5334206.0 101.0 690200.0 5334206.0 106.0 690208.0 5334206.0 106.0 690208.0 5334206.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+<bldg:boundedBy><bldg:WallSurface gml:id="B2_1_S5"><bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon gml:id="B2_1_P5"><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690200.0 5334206.0 101.0 690200.0 5334200.0 101.0 690200.0 5334200.0 106.0 690200.0 5334206.0 106.0 690200.0 5334206.0 101.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface></bldg:WallSurface></bldg:boundedBy>
+</bldg:BuildingPart></bldg:consistsOfBuildingPart>
+</bldg:Building>
+</core:cityObjectMember>
+<core:cityObjectMember>
+<bldg:Building gml:id="B3">
+<bldg:function>31001_2463</bldg:function>
+<bldg:lod2MultiSurface><gml:MultiSurface><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690300.0 5334300.0 102.0 690300.0 5334305.0 102.0 690305.0 5334305.0 102.0 690305.0 5334300.0 102.0 690300.0 5334300.0 102.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690300.0 5334300.0 105.0 690305.0 5334300.0 105.0 690305.0 5334305.0 105.0 690300.0 5334305.0 105.0 690300.0 5334300.0 105.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690300.0 5334300.0 102.0 690305.0 5334300.0 102.0 690305.0 5334300.0 105.0 690300.0 5334300.0 105.0 690300.0 5334300.0 102.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690305.0 5334300.0 102.0 690305.0 5334305.0 102.0 690305.0 5334305.0 105.0 690305.0 5334300.0 105.0 690305.0 5334300.0 102.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690305.0 5334305.0 102.0 690300.0 5334305.0 102.0 690300.0 5334305.0 105.0 690305.0 5334305.0 105.0 690305.0 5334305.0 102.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember><gml:surfaceMember><gml:Polygon><gml:exterior><gml:LinearRing><gml:posList srsDimension="3">690300.0 5334305.0 102.0 690300.0 5334300.0 102.0 690300.0 5334300.0 105.0 690300.0 5334305.0 105.0 690300.0 5334305.0 102.0</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon></gml:surfaceMember></gml:MultiSurface></bldg:lod2MultiSurface>
+</bldg:Building>
+</core:cityObjectMember>
+</core:CityModel>
@@ -0,0 +1,111 @@
+"""
+Compares the native CityGML converter (py/citygml_stream.py) with citygml-tools for the same LoD2 tile
+(tests/data/lod2_tile.gml): city objects and their hierarchy, attributes, geometry types,
+the semantic surface of every polygon and the vertices of every building.
+The reference CityJSON is written by citygml-tools when the tests run. The comparisons with it are
+skipped if citygml-tools is not available: set CITYGMLTOOLS_PATH (and JAVA_HOME) or put citygml-tools on PATH.
+Vertices are compared as coordinates, as the two converters number and share them differently.
+"""
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, "tests", "data")
+sys.path.insert(0, ROOT_DIR)
+
+from __prefetch import _scripts_folder, load_scripts
+
+CITYGMLTOOLS_PATH = os.environ.get("CITYGMLTOOLS_PATH") or shutil.which("citygml-tools")
+
+
+@pytest.fixture(scope="module")
+def scripts():
+    settings = {"JAVA_PATH": os.environ.get("JAVA_HOME", ""), "CITYGMLTOOLS_PATH": CITYGMLTOOLS_PATH}
+    return load_scripts(settings, os.path.join(ROOT_DIR, _scripts_folder), ("tracing.py", "citygml_stream.py", "cityjson.py"))
+
+
+@pytest.fixture(scope="module")
+def converted(scripts, tmp_path_factory):
+    output_path = str(tmp_path_factory.mktemp("native") / "lod2_tile.json")
+    assert scripts["convert_gml_native"](os.path.join(DATA_DIR, "lod2_tile.gml"), output_path) == 4
+    assert not os.path.exists(output_path + ".part")
+    assert not os.path.exists(output_path + ".vertices.part")
+    with open(output_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def reference(scripts, tmp_path_factory):
+    if not CITYGMLTOOLS_PATH:
+        pytest.skip("citygml-tools is not available (set CITYGMLTOOLS_PATH)")
+    gml_path = str(tmp_path_factory.mktemp("citygml-tools") / "lod2_tile.gml")
+    shutil.copyfile(os.path.join(DATA_DIR, "lod2_tile.gml"), gml_path)
+    result = scripts["run_citygml_tools"]([gml_path], scripts["JAVA_PATH"], CITYGMLTOOLS_PATH)
+    assert result.returncode == 0, result.stderr
+    with open(os.path.splitext(gml_path)[0] + ".json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def polygons(document, object_id):
+    """Returns the geometry types and the (semantic type, exterior ring coordinates) of every polygon of a city object."""
+    scale = document["transform"]["scale"]
+    translate = document["transform"]["translate"]
+
+    def coordinates(index):
+        return tuple(round(v * s + t, 3) for v, s, t in zip(document["vertices"][index], scale, translate))
+
+    types, result = [], []
+    for geometry in document["CityObjects"][object_id].get("geometry", []):
+        types.append(geometry["type"])
+        semantics = geometry.get("semantics") or {}
+        surfaces = semantics.get("surfaces", [])
+        boundaries, values = geometry["boundaries"], semantics.get("values")
+        if geometry["type"] == "Solid":
+            # Exterior shell only
+            boundaries, values = boundaries[0], values[0] if values else None
+        for i, surface in enumerate(boundaries):
+            value = values[i] if values else None
+            surface_type = surfaces[value]["type"] if value is not None else None
+            result.append((surface_type, frozenset(coordinates(index) for index in surface[0])))
+    return types, sorted(result, key=lambda p: (str(p[0]), sorted(p[1])))
+
+
+def test_city_objects(converted, reference):
+    assert converted["CityObjects"].keys() == reference["CityObjects"].keys()
+    for object_id, expected in reference["CityObjects"].items():
+        city_object = converted["CityObjects"][object_id]
+        assert city_object["type"] == expected["type"]
+        assert city_object.get("attributes") == expected.get("attributes"), object_id
+        assert city_object.get("parents") == expected.get("parents")
+        assert sorted(city_object.get("children", [])) == sorted(expected.get("children", []))
+
+
+def test_geometry_and_semantics(converted, reference):
+    for object_id in reference["CityObjects"]:
+        assert polygons(converted, object_id) == polygons(reference, object_id), object_id
+
+
+def test_vertices_per_building(converted, reference):
+    for object_id in reference["CityObjects"]:
+        expected = set().union(*(ring for _, ring in polygons(reference, object_id)[1]))
+        actual = set().union(*(ring for _, ring in polygons(converted, object_id)[1]))
+        assert actual == expected, object_id
+
+
+def test_solid_polygons_are_not_repeated(converted):
+    # B2_1 has its polygons both inline in lod2Solid and under boundedBy
+    types, object_polygons = polygons(converted, "B2_1")
+    assert types == ["Solid"]
+    assert len(object_polygons) == 6
+    assert all(surface_type is not None for surface_type, _ in object_polygons)
+
+
+def test_every_vertex_is_used(converted):
+    # Vertices are de-duplicated within each building member, none is left over
+    used = {i for city_object in converted["CityObjects"].values() for geometry in city_object.get("geometry", [])
+            for i in json.dumps(geometry["boundaries"]).replace("[", " ").replace("]", " ").replace(",", " ").split()}
+    assert len(used) == len(converted["vertices"])
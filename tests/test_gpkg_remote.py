@@ -0,0 +1,75 @@
+"""
+Reads a generated tree GeoPackage through the Range-serving geoservices stub of the benchmark suite
+with the remote reader (py/gpkg_remote.py) and compares the trees inside a bbox with pyogrio.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pyogrio = pytest.importorskip("pyogrio")
+pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "bench"))
+
+from __prefetch import _scripts_folder, load_scripts, read_runner_settings
+from geoservices_stub import GeoservicesStub
+from synthetic import TILE_SIZE, write_tree_geopackage
+
+# 4×4 tiles of trees with two points each; the bbox covers about one tile in the middle
+TILES = [(510 + i, 5535 + j) for i in range(4) for j in range(4)]
+BBOX = (511.5 * TILE_SIZE, 5536.5 * TILE_SIZE, 512.5 * TILE_SIZE, 5537.5 * TILE_SIZE)
+
+
+@pytest.fixture(scope="module")
+def stub(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("geoservices")
+    os.makedirs(data_dir / "tree")
+    write_tree_geopackage(str(data_dir / "tree" / "trees.gpkg"), TILES, trees_per_tile=2000, points_per_tree=2)
+    with GeoservicesStub(str(data_dir)) as stub:
+        yield stub
+
+
+@pytest.fixture(scope="module")
+def scripts():
+    settings = read_runner_settings(os.path.join(ROOT_DIR, "__runner.py"))
+    return load_scripts(settings, os.path.join(ROOT_DIR, _scripts_folder),
+                        ("global_helpers.py", "tile_cache.py", "tracing.py", "opengeodata.py", "gpkg_remote.py"))
+
+
+def pyogrio_trees(path, bbox):
+    """Returns the tree points inside bbox as rows of x, y, dgm_height, height, sorted."""
+    gdf = pyogrio.read_dataframe(path, layer="baeume", bbox=bbox)
+    gdf = gdf[gdf.geom_type == "MultiPoint"]
+    counts = shapely.get_num_geometries(gdf.geometry.values)
+    coordinates = shapely.get_coordinates(gdf.geometry.values)
+    rows = np.column_stack([
+        coordinates[:, 0], coordinates[:, 1],
+        np.repeat(gdf["dgmhoehe"].to_numpy(dtype=np.float64), counts),
+        np.repeat(gdf["baumhoehe"].to_numpy(dtype=np.float64), counts)
+    ])
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def test_remote_trees_match_pyogrio(stub, scripts):
+    gpkg = scripts["RemoteGeoPackage"](stub.file_url("tree", "trees.gpkg"))
+    layers = scripts["read_remote_tree_layers"](gpkg, BBOX)
+    assert list(layers) == ["baeume"]
+
+    trees = layers["baeume"]
+    rows = np.column_stack([trees["x"], trees["y"], trees["dgm_height"], trees["height"]])
+    rows = rows[np.lexsort(rows.T[::-1])]
+    expected = pyogrio_trees(stub.file_path("/files/tree/trees.gpkg"), BBOX)
+    assert len(expected) > 0
+    np.testing.assert_allclose(rows, expected)
+
+
+def test_remote_read_fetches_part_of_the_file(stub, scripts):
+    gpkg = scripts["RemoteGeoPackage"](stub.file_url("tree", "trees.gpkg"))
+    scripts["read_remote_tree_layers"](gpkg, BBOX)
+    assert 0 < gpkg.file.bytes_fetched < gpkg.file.size
+    assert gpkg.file.size == os.path.getsize(stub.file_path("/files/tree/trees.gpkg"))
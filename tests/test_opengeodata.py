@@ -0,0 +1,148 @@
+"""
+Tests of the download engine (py/opengeodata.py) against the local geoservices stub of the benchmark suite:
+resuming a ".part" file with a Range request, servers that ignore Range, the hash check and the per-host limit.
+"""
+import hashlib
+import os
+import sys
+import threading
+
+import pytest
+from tqdm import tqdm
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "bench"))
+
+from __prefetch import _scripts_folder, load_scripts, read_runner_settings
+from geoservices_stub import GeoservicesStub
+
+FILE_SIZE = 300_000
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    os.makedirs(tmp_path / "data" / "lod2")
+    for i in range(6):
+        with open(tmp_path / "data" / "lod2" / f"tile{i}.gml", "wb") as f:
+            f.write(os.urandom(FILE_SIZE))
+    return str(tmp_path / "data")
+
+
+@pytest.fixture
+def target_dir(tmp_path):
+    os.makedirs(tmp_path / "target")
+    return str(tmp_path / "target")
+
+
+def load_opengeodata(**settings):
+    runner_settings = read_runner_settings(os.path.join(ROOT_DIR, "__runner.py"))
+    runner_settings.update({"REPLACE_EXISTING_FILES": False, "DOWNLOAD_RETRIES": 2}, **settings)
+    return load_scripts(runner_settings, os.path.join(ROOT_DIR, _scripts_folder),
+                        ("global_helpers.py", "tile_cache.py", "tracing.py", "opengeodata.py"))
+
+
+def file_info(stub, data_dir, name, hash_value=None):
+    with open(os.path.join(data_dir, "lod2", name), "rb") as f:
+        data = f.read()
+    return {
+        "name": name,
+        "url": stub.file_url("lod2", name),
+        "size": len(data),
+        "hash_type": "sha-256",
+        "hash": hash_value or hashlib.sha256(data).hexdigest(),
+        "local": None
+    }
+
+
+def sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_truncated_part_file_is_resumed(data_dir, target_dir):
+    ns = load_opengeodata()
+    with GeoservicesStub(data_dir) as stub:
+        info = file_info(stub, data_dir, "tile0.gml")
+        with open(os.path.join(data_dir, "lod2", "tile0.gml"), "rb") as f, \
+                open(os.path.join(target_dir, "tile0.gml.part"), "wb") as part:
+            part.write(f.read(FILE_SIZE // 3))
+
+        ns["download_meta_files"]([info], target_dir)
+
+        assert info["local"] == os.path.join(target_dir, "tile0.gml")
+        assert sha256(info["local"]) == info["hash"]
+        assert not os.path.exists(info["local"] + ".part")
+        # Only the missing part was transferred
+        assert stub.bytes_sent == FILE_SIZE - FILE_SIZE // 3
+
+
+def test_server_ignoring_range_restarts_without_counting_twice(data_dir, target_dir):
+    ns = load_opengeodata()
+    with GeoservicesStub(data_dir, ignore_range=True, drop_after=FILE_SIZE // 2) as stub:
+        info = file_info(stub, data_dir, "tile1.gml")
+        with open(os.devnull, "w") as devnull, tqdm(total=0, file=devnull) as progress:
+            local_path = ns["download_file"](info, target_dir, progress)
+            assert progress.n == FILE_SIZE
+            assert progress.total == FILE_SIZE
+
+        assert local_path == os.path.join(target_dir, "tile1.gml")
+        assert sha256(local_path) == info["hash"]
+        # The cut-off first response and the full second one
+        assert stub.bytes_sent == FILE_SIZE // 2 + FILE_SIZE
+
+
+def test_wrong_hash_is_rejected(data_dir, target_dir):
+    ns = load_opengeodata()
+    with GeoservicesStub(data_dir) as stub:
+        info = file_info(stub, data_dir, "tile2.gml", hash_value="0" * 64)
+        ns["download_meta_files"]([info], target_dir)
+
+    assert info["local"] is None
+    assert os.listdir(target_dir) == []
+
+
+def test_per_host_limit(data_dir, target_dir):
+    # Slow responses, so downloads overlap if the limit is not applied
+    with GeoservicesStub(data_dir, bandwidth=2_000_000) as stub:
+        host = stub.url.split("://", 1)[1]
+        ns = load_opengeodata(DOWNLOAD_WORKERS=6, DOWNLOAD_MAX_PER_HOST=4, DOWNLOAD_HOST_LIMITS={host: 2})
+        infos = [file_info(stub, data_dir, f"tile{i}.gml") for i in range(6)]
+        ns["download_meta_files"](infos, target_dir)
+
+    assert all(info["local"] for info in infos)
+    assert stub.max_active == 2
+
+
+def test_threads_share_a_progress_bar(data_dir, target_dir):
+    ns = load_opengeodata()
+    with GeoservicesStub(data_dir) as stub:
+        infos = [file_info(stub, data_dir, f"tile{i}.gml") for i in range(3, 6)]
+        with open(os.devnull, "w") as devnull, tqdm(total=0, file=devnull) as progress:
+            threads = [
+                threading.Thread(target=ns["download_meta_files"], args=([info], target_dir), kwargs={"progress": progress})
+                for info in infos
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert progress.n == progress.total == 3 * FILE_SIZE
+
+    assert all(info["local"] for info in infos)
+
+
+def test_cached_file_is_checked_without_manifest(data_dir, target_dir):
+    ns = load_opengeodata()
+    with GeoservicesStub(data_dir) as stub:
+        ns["download_meta_files"]([file_info(stub, data_dir, "tile0.gml")], target_dir)
+        requests = stub.requests
+
+        info = file_info(stub, data_dir, "tile0.gml")
+        ns["download_meta_files"]([info], target_dir)
+        assert info["local"] == os.path.join(target_dir, "tile0.gml")
+        assert stub.requests == requests
+
+        info = file_info(stub, data_dir, "tile0.gml", hash_value="0" * 64)
+        ns["download_meta_files"]([info], target_dir)
+        assert info["local"] is None